@@ -0,0 +1,141 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from app.lib.job_store import Job, JobStatus, JobStore
+from app.lib.result_cache import RESULT_CACHE, make_cache_key
+from app.lib.whisper_pool import TranscriptionPoolFullError
+from app.pipeline import (
+    PIPELINE_LLM_CLIENTS,
+    PipelineOptions,
+    build_summary_graph,
+    summarize_url,
+)
+
+# How long a job waits before trying again when every transcription worker is busy
+TRANSCRIPTION_RETRY_DELAY_SECONDS = float(
+    os.environ.get("SMRZ_JOB_RETRY_DELAY_SECONDS", "10")
+)
+
+
+class SummaryJobRunner:
+    """
+    Runs summary pipelines in the background for the /jobs endpoints. Jobs are persisted in a
+    JobStore, so unfinished jobs are picked up again after a restart, and a submission for a
+    URL that already has an unfinished job returns that job instead of starting another one.
+    Jobs wait for a free transcription worker instead of failing when the pool is full.
+    """
+
+    def __init__(self, store: JobStore, max_workers: int):
+        self.store = store
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._executor: ThreadPoolExecutor | None = None
+        self._closed = threading.Event()
+
+    @classmethod
+    def from_env(cls) -> "SummaryJobRunner":
+        """
+        Build a runner configured through the SMRZ_JOB_WORKERS environment variable, storing
+        its jobs in the store configured by JobStore.from_env.
+        """
+        return cls(
+            store=JobStore.from_env("SMRZ"),
+            max_workers=int(os.environ.get("SMRZ_JOB_WORKERS", "4")),
+        )
+
+    def start(self):
+        """
+        Resume the jobs that were queued or running when the process last stopped.
+        """
+        self._closed.clear()
+        for job in self.store.active():
+            self._get_executor().submit(self._run, job)
+
+    def close(self):
+        self._closed.set()
+        with self._lock:
+            if self._executor:
+                # Unstarted jobs stay queued in the store and are resumed on the next start
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def submit(
+        self, url: str, options: PipelineOptions, refresh: bool = False
+    ) -> tuple[Job, bool]:
+        """
+        Submit a summary job, or join the unfinished job for the same URL and options.
+        Cached results complete the job right away. The second value tells whether a new job
+        was created.
+        """
+        options_data = options.model_dump(mode="json")
+        key = make_cache_key(url, PIPELINE_LLM_CLIENTS, options_data)
+        job, created = self.store.get_or_create(
+            key, url, params={"options": options_data, "refresh": refresh}
+        )
+        if not created:
+            return job, False
+
+        cached_result = None if refresh else RESULT_CACHE.get(key)
+        if cached_result is not None:
+            return self.store.update(
+                job.id, status=JobStatus.SUCCEEDED, progress=1.0, result=cached_result
+            ), True
+
+        self._get_executor().submit(self._run, job)
+        return job, True
+
+    def get(self, job_id: str) -> Job | None:
+        return self.store.get(job_id)
+
+    def _run(self, job: Job):
+        while True:
+            try:
+                self._run_once(job)
+                return
+            except TranscriptionPoolFullError:
+                self.store.update(job.id, status=JobStatus.QUEUED)
+                # Stop waiting on close; the job stays queued and is resumed on the next start
+                if self._closed.wait(TRANSCRIPTION_RETRY_DELAY_SECONDS):
+                    return
+            except Exception as e:
+                self.store.update(job.id, status=JobStatus.FAILED, error=str(e))
+                return
+
+    def _run_once(self, job: Job):
+        options = PipelineOptions.model_validate(job.params["options"])
+        completed_stages: list[str] = []
+        stage_count = len(build_summary_graph(job.url, options).stages)
+        self.store.update(
+            job.id, status=JobStatus.RUNNING, completed_stages=[], progress=0.0
+        )
+
+        def on_stage_complete(name: str, _: Any):
+            completed_stages.append(name)
+            self.store.update(
+                job.id,
+                completed_stages=list(completed_stages),
+                progress=len(completed_stages) / stage_count,
+            )
+
+        # Goes through the result cache and joins a /smrz request already running for the URL
+        result = summarize_url(
+            job.url,
+            options,
+            refresh=job.params.get("refresh", False),
+            on_stage_complete=on_stage_complete,
+        )
+        self.store.update(
+            job.id, status=JobStatus.SUCCEEDED, progress=1.0, result=result
+        )
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+
+# Process-wide job runner, started by the FastAPI lifespan hook in app.main
+SUMMARY_JOB_RUNNER = SummaryJobRunner.from_env()
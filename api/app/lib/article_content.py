@@ -1,20 +1,45 @@
 import datetime
-from newspaper import Article
-from pydantic import BaseModel
-from app.lib.llm_client import LLMClient
-from app.utils import clean_markdown, get_clean_html, parse_date
+from typing import Any
 
+from lxml import html as lxml_html
+from pydantic import BaseModel, create_model
 
-def article_to_markdown(llm_client: LLMClient, url: str) -> str:
+from app.lib.html_to_markdown import convert_article_locally
+from app.lib.llm_client import LLMClient, count_tokens, truncate_to_tokens
+from app.lib.web_document import WebDocument
+from app.utils import clean_markdown, parse_date
+
+
+def article_to_markdown(
+    llm_client: LLMClient, document: WebDocument, allow_local_conversion: bool = True
+) -> str:
     """
-    Uses an LLM to convert an article HTML to Markdown.
+    Converts an article HTML to Markdown. Well-structured articles are converted locally;
+    everything else (or everything, if `allow_local_conversion` is off) goes through an LLM.
     """
     try:
-        html = get_clean_html(url)
+        reduction = document.reduced_html
+        html = reduction.html
         if not html:
             raise RuntimeError("Failed to clean HTML content")
+
+        if allow_local_conversion:
+            conversion = convert_article_locally(
+                html, document.clean_html, base_url=document.url
+            )
+            if llm_client.log_key:
+                print(
+                    f"[{llm_client.log_key}]: Local conversion {'accepted' if conversion.accepted else 'rejected'} (coverage {conversion.coverage:.2f}, precision {conversion.precision:.2f})"
+                )
+            if conversion.accepted:
+                return conversion.markdown
+
+        if llm_client.log_key:
+            print(
+                f"[{llm_client.log_key}]: Reduced article HTML from ~{reduction.input_tokens} to ~{reduction.output_tokens} tokens"
+            )
         response = llm_client.generate_response(
-            user_prompt=f"Convert the following article HTML (found at {url}) to Markdown: {html}",
+            user_prompt=_article_to_markdown_prompt(llm_client, document.url, html),
             temp=585 / 1000,
         )
         return clean_markdown(response.content)
@@ -22,6 +47,46 @@ def article_to_markdown(llm_client: LLMClient, url: str) -> str:
         raise RuntimeError(f"Failed to convert HTML to Markdown: {e}") from e
 
 
+def _article_to_markdown_prompt(llm_client: LLMClient, url: str, html: str) -> str:
+    """
+    Build the conversion prompt, truncating the article when the model couldn't take it in
+    or couldn't write all of its Markdown (which is about as long as the article's text).
+    """
+    prompt = f"Convert the following article HTML (found at {url}) to Markdown: "
+    text_tokens = count_tokens(lxml_html.fromstring(html).text_content())
+    plan = llm_client.plan_request(prompt + html, expected_output_tokens=text_tokens)
+    if llm_client.log_key:
+        print(
+            f"[{llm_client.log_key}]: Planned {plan.input_tokens} input and ~{plan.output_tokens} output tokens on {plan.model}, costing ~${plan.cost / 100:.4f} USD"
+        )
+    if plan.fits:
+        return prompt + html
+
+    html_tokens = plan.input_tokens - llm_client.system_prompt_tokens
+    output_tokens = min(text_tokens, llm_client.max_output_tokens)
+    keep = min(
+        output_tokens / text_tokens if text_tokens else 1,
+        (llm_client.max_prompt_tokens(output_tokens) - count_tokens(prompt))
+        / html_tokens,
+    )
+    if llm_client.log_key:
+        print(
+            f"[{llm_client.log_key}]: Article is too large for {plan.model}, keeping its first {keep:.0%}"
+        )
+    return prompt + truncate_to_tokens(html, int(html_tokens * keep))
+
+
+# How much of the page's body text the metadata LLM fallback gets to see, after the <head>
+METADATA_FALLBACK_BODY_CHARS = 4000
+
+# The fields the metadata LLM fallback can fill in, with the types it should output them as
+METADATA_FALLBACK_FIELDS: dict[str, Any] = {
+    "title": (str, ...),
+    "author": (str | None, None),
+    "published_date": (datetime.date | None, None),
+}
+
+
 class ArticleMetadata(BaseModel):
     title: str
     author: str | None = None
@@ -31,61 +96,113 @@ class ArticleMetadata(BaseModel):
 
 
 def extract_article_metadata(
-    url: str, content: str, fallback_llm_client: LLMClient
+    document: WebDocument, fallback_llm_client: LLMClient
 ) -> ArticleMetadata:
     """
-    Extract metadata from an article using Newspaper3k.
+    Extract metadata from an article. The page's own structured metadata (JSON-LD, OpenGraph
+    and meta tags) comes first, Newspaper3k fills in what it lacks, and the LLM is only asked
+    for the fields neither of them could find.
     """
-    article = Article(url)
-    article.download()
-    article.parse()
+    structured = document.structured_metadata
+
+    title = structured.title
+    author = structured.author
+    published_date = structured.published_date
+    meta_image = structured.image
+
+    # Newspaper3k parses the whole page, so only run it when something is still missing
+    if not (title and author and published_date and meta_image):
+        article = document.article
+        title = title or article.title
+        author = author or (", ".join(article.authors) if article.authors else None)
+        published_date = published_date or _newspaper_publish_date(article.publish_date)
+        meta_image = meta_image or article.meta_img or None
+
+    missing_fields = [
+        field
+        for field, value in {
+            "title": title,
+            "author": author,
+            "published_date": published_date,
+        }.items()
+        if not value
+    ]
+
+    # Most well-formed pages need no LLM call at all
+    if missing_fields:
+        try:
+            llm_parsed_metadata = _extract_missing_metadata(
+                document, fallback_llm_client, missing_fields
+            )
+        except Exception as e:
+            if "title" in missing_fields:
+                raise RuntimeError(f"Failed to extract article metadata: {e}") from e
+            print(f"Warning: Failed to extract {', '.join(missing_fields)}: {e}")
+            llm_parsed_metadata = {}
+
+        title = title or llm_parsed_metadata.get("title")
+        author = author or llm_parsed_metadata.get("author")
+        published_date = published_date or llm_parsed_metadata.get("published_date")
+
+    return ArticleMetadata(
+        title=title,  # type: ignore
+        author=author,
+        published_date=published_date,
+        favicon=structured.favicon or f"https://{document.domain}/favicon.ico",
+        meta_image=meta_image,
+    )
 
-    published_date = article.publish_date
-    if isinstance(published_date, str):
+
+def _newspaper_publish_date(publish_date: Any) -> datetime.date | None:
+    if isinstance(publish_date, str):
         try:
-            published_date = parse_date(published_date)
+            return parse_date(publish_date)
         except ValueError:
-            published_date = None
-    elif isinstance(published_date, datetime.datetime):
-        published_date = published_date.date()
-    elif not isinstance(published_date, datetime.datetime):
-        published_date = None
-
-    llm_parsed_metadata: ArticleMetadata = (
-        fallback_llm_client.generate_structured_response(
-            OutputSchema=ArticleMetadata,
-            user_prompt=f"Extract metadata from this article content:\n{content}",
-        ).content
-    )  # type: ignore
-
-    if not article.title:
-        article.title = llm_parsed_metadata.title
-
-    if not article.authors:
-        article.authors = (
-            [llm_parsed_metadata.author] if llm_parsed_metadata.author else []
-        )
+            return None
+    if isinstance(publish_date, datetime.datetime):
+        return publish_date.date()
+    return None
+
+
+def _extract_missing_metadata(
+    document: WebDocument, llm_client: LLMClient, fields: list[str]
+) -> dict[str, Any]:
+    """
+    Ask the LLM for just the given metadata fields, from the page's <head> and the start of
+    its body rather than the entire page.
+    """
+    OutputSchema = create_model(
+        "ArticleMetadataFallback",
+        **{field: METADATA_FALLBACK_FIELDS[field] for field in fields},
+    )
+    response = llm_client.generate_structured_response(
+        OutputSchema=OutputSchema,
+        user_prompt=f"Extract the {', '.join(fields)} of this article from its HTML head and the start of its content:\n{_metadata_excerpt(document)}",
+    )
+    return response.content.model_dump()
 
-    if not published_date:
-        published_date = llm_parsed_metadata.published_date
 
-    # If the published date is still None, attempt to use an LLM to extract it
-    # if published_date is None:
-    #     try:
-    #         published_date = fallback_llm_client.generate_response(
-    #             user_prompt=f"Extract the publish date from this article. Output the publish date in YYYY-MM-DD format.\n{content}"
-    #         ).content
-    #         published_date = parse_date(published_date)
-    #     except Exception as e:
-    #         print(f"Failed to extract published date using LLM: {e}")
+def _metadata_excerpt(document: WebDocument) -> str:
+    """
+    The <title>, <meta> and JSON-LD tags of the page, followed by the first
+    METADATA_FALLBACK_BODY_CHARS characters of its cleaned body text.
+    """
+    page = lxml_html.fromstring(document.raw_html)
+    head_tags = page.xpath(
+        "//head/title | //meta[@content] | //script[@type='application/ld+json']"
+    )
+    head = "\n".join(
+        lxml_html.tostring(tag, encoding="unicode", with_tail=False).strip()
+        for tag in head_tags
+    )
 
-    return ArticleMetadata(
-        title=article.title,
-        author=", ".join(article.authors) if article.authors else None,
-        published_date=published_date,  # type: ignore
-        favicon=f"https://{url.split('/')[2]}/favicon.ico",
-        meta_image=article.meta_img,
+    clean_page = lxml_html.fromstring(document.clean_html)
+    body = clean_page.find("body")
+    body_text = " ".join(
+        " ".join((body if body is not None else clean_page).itertext()).split()
     )
+    return f"{head}\n\n{body_text[:METADATA_FALLBACK_BODY_CHARS]}"
+
 
 ARTICLE_TO_MARKDOWN_PROMPT_4 = """
 ## Role & Identity
@@ -0,0 +1,119 @@
+# Shared by api (app/lib) and orion (app/features): keep the copies identical apart from
+# their app.lib / app.features imports. api/test_shared_modules.py checks that they are.
+import subprocess
+import tempfile
+
+import numpy as np
+
+from app.lib.http_client import HTTP_CLIENT
+
+# Whisper models expect 16 kHz mono audio
+SAMPLE_RATE = 16000
+
+READ_CHUNK_SIZE = 1 << 20
+
+
+def load_audio_from_url(url: str) -> np.ndarray:
+    """
+    Decode a direct audio or video URL into 16 kHz mono float32 PCM. ffmpeg reads the URL
+    itself (using range requests when the container needs seeking), so the file never
+    touches the disk.
+    """
+    # Give up on an origin that stops sending data, rather than hanging the worker
+    read_timeout_us = int(HTTP_CLIENT.timeout[1] * 1_000_000)
+    return _decode_to_pcm(
+        ["-rw_timeout", str(read_timeout_us), "-i", url], description="audio"
+    )
+
+
+def load_youtube_audio(url: str) -> np.ndarray:
+    """
+    Decode a YouTube video's audio track into 16 kHz mono float32 PCM by piping yt-dlp's
+    best audio stream straight into ffmpeg, without writing anything to disk.
+    """
+    # fmt: off
+    downloader_cmd = [
+        'yt-dlp',
+        '--format', 'bestaudio/best',
+        '--no-playlist',
+        '--quiet',
+        '--no-warnings',
+        '--socket-timeout', str(HTTP_CLIENT.timeout[1]),
+        '--output', '-',  # Write the stream to stdout
+        url
+    ]
+    # fmt: on
+
+    with tempfile.TemporaryFile() as downloader_stderr:
+        downloader = subprocess.Popen(
+            downloader_cmd, stdout=subprocess.PIPE, stderr=downloader_stderr
+        )
+        decode_error = None
+        try:
+            audio = _decode_to_pcm(
+                ["-i", "pipe:0"],
+                description="YouTube audio",
+                stdin=downloader.stdout,
+            )
+        except RuntimeError as e:
+            decode_error = e
+        finally:
+            # Only ffmpeg reads the pipe; closing our copy lets yt-dlp see a broken pipe
+            # if ffmpeg exits early instead of blocking forever
+            if downloader.stdout:
+                downloader.stdout.close()
+            downloader.wait()
+
+        # A failed download also makes ffmpeg fail, so report the download error first
+        if downloader.returncode != 0:
+            downloader_stderr.seek(0)
+            raise RuntimeError(
+                f"Failed to download YouTube audio: {downloader_stderr.read().decode(errors='replace').strip()}"
+            )
+        if decode_error:
+            raise decode_error
+
+    return audio
+
+
+def _decode_to_pcm(input_args: list[str], description: str, stdin=None) -> np.ndarray:
+    # fmt: off
+    cmd = [
+        'ffmpeg',
+        '-hide_banner',
+        '-loglevel', 'error',
+        *input_args,
+        '-vn',  # No video
+        '-f', 'f32le',  # Raw float32 samples
+        '-acodec', 'pcm_f32le',
+        '-ar', str(SAMPLE_RATE),  # 16kHz sample rate
+        '-ac', '1',  # Mono audio
+        'pipe:1'
+    ]
+    # fmt: on
+
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(
+            cmd,
+            stdin=stdin if stdin is not None else subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=stderr,
+        )
+
+        # Read into a bytearray so the resulting array is writable, as torch expects
+        buffer = bytearray()
+        with process.stdout:
+            while chunk := process.stdout.read(READ_CHUNK_SIZE):
+                buffer += chunk
+        process.wait()
+
+        if process.returncode != 0:
+            stderr.seek(0)
+            raise RuntimeError(
+                f"Failed to decode {description}: {stderr.read().decode(errors='replace').strip()}"
+            )
+
+    if not buffer:
+        raise RuntimeError(f"Failed to decode {description}: no audio stream found")
+
+    return np.frombuffer(buffer, dtype=np.float32)
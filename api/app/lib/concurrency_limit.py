@@ -0,0 +1,41 @@
+import asyncio
+import threading
+
+
+class ConcurrencyLimit:
+    """
+    A limit on the number of operations running at once, usable both from threads
+    (`with limit:`) and from coroutines (`async with limit:`), so sync and async callers
+    of the same resource share a single budget.
+    """
+
+    def __init__(self, max_concurrency: int):
+        if max_concurrency < 1:
+            raise ValueError("Concurrency limit must be at least 1")
+
+        self.max_concurrency = max_concurrency
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+
+    def __enter__(self):
+        self._semaphore.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._semaphore.release()
+
+    async def __aenter__(self):
+        if self._semaphore.acquire(blocking=False):
+            return self
+
+        # Wait in a worker thread so the event loop keeps running
+        acquire = asyncio.ensure_future(asyncio.to_thread(self._semaphore.acquire))
+        try:
+            await asyncio.shield(acquire)
+        except asyncio.CancelledError:
+            # The thread still acquires the semaphore eventually; give it straight back
+            acquire.add_done_callback(lambda _: self._semaphore.release())
+            raise
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._semaphore.release()
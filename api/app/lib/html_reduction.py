@@ -0,0 +1,128 @@
+import re
+
+from lxml import html as lxml_html
+from pydantic import BaseModel
+from readability import Document
+
+from app.lib.llm_client import count_tokens
+
+# Attributes that carry meaning for the article content; everything else (class, style, id,
+# data-*, aria-*, event handlers...) is presentational noise as far as the LLM is concerned.
+KEPT_ATTRIBUTES = {"href", "src", "alt", "title", "colspan", "rowspan", "start"}
+
+# Elements that never contain article content
+REMOVED_TAGS = ["svg", "button", "form", "input", "select", "textarea", "nav", "iframe"]
+
+# Elements that only exist to group or style other elements
+WRAPPER_TAGS = {"div", "span", "section", "main", "article", "font", "center"}
+
+# Elements that are meaningful even without any text inside them
+VOID_CONTENT_TAGS = {"img", "br", "hr", "td", "th", "source", "video", "audio"}
+
+# Line number gutters added by syntax highlighters
+LINE_NUMBER_CLASS_PATTERN = re.compile(r"line-?numbers?", re.IGNORECASE)
+
+# Readability sometimes picks a sidebar or a teaser; if the extract keeps less than this share
+# of the page's text, we fall back to reducing the whole page instead.
+MIN_EXTRACT_TEXT_RATIO = 0.2
+
+# Indentation and blank lines in the markup, which carry no meaning outside of <pre>
+LINE_BREAK_WHITESPACE_PATTERN = re.compile(r"\s*\n\s*")
+
+LANGUAGE_CLASS_PATTERN = re.compile(r"(?:^|\s)(?:language|lang)-([\w+#-]+)")
+
+
+class HTMLReduction(BaseModel):
+    html: str
+    input_tokens: int
+    output_tokens: int
+
+
+def reduce_article_html(html: str) -> HTMLReduction:
+    """
+    Deterministically reduce a page's HTML to its article body before sending it to an LLM.
+    Extracts the main content node with readability, removes non-content elements, strips
+    presentational attributes and collapses wrapper elements.
+    """
+    page = lxml_html.fromstring(html)
+    page_text_length = len(_normalized_text(page))
+
+    readability_document = Document(html)
+    content = lxml_html.fromstring(readability_document.summary(html_partial=True))
+    if len(_normalized_text(content)) < page_text_length * MIN_EXTRACT_TEXT_RATIO:
+        content = page.find("body") if page.find("body") is not None else page
+
+    # Readability drops the page title, which the conversion prompts rely on
+    title = readability_document.short_title()
+    if title and not content.xpath(".//h1"):
+        heading = lxml_html.Element("h1")
+        heading.text = title
+        content.insert(0, heading)
+
+    _strip_presentation(content)
+    _collapse_whitespace(content)
+    reduced_html = lxml_html.tostring(content, encoding="unicode").strip()
+
+    return HTMLReduction(
+        html=reduced_html,
+        input_tokens=count_tokens(html),
+        output_tokens=count_tokens(reduced_html),
+    )
+
+
+def _strip_presentation(root: lxml_html.HtmlElement):
+    for element in root.xpath(
+        " | ".join(f".//*[local-name()='{tag}']" for tag in REMOVED_TAGS)
+    ):
+        element.drop_tree()
+
+    for element in root.xpath(".//*[@class]"):
+        if LINE_NUMBER_CLASS_PATTERN.search(element.get("class", "")):
+            element.drop_tree()
+
+    for element in root.iter():
+        if not isinstance(element.tag, str):
+            continue
+
+        # Keep the code language hint, which is the only class we care about
+        language = None
+        if element.tag in {"pre", "code"}:
+            match = LANGUAGE_CLASS_PATTERN.search(element.get("class", ""))
+            language = match.group(1) if match else None
+
+        for attribute in list(element.attrib):
+            if attribute not in KEPT_ATTRIBUTES:
+                del element.attrib[attribute]
+
+        if language:
+            element.set("class", f"language-{language}")
+
+    # Walk bottom-up so that nested empty elements and wrappers disappear in a single pass
+    for element in reversed(list(root.iter())):
+        if element is root or not isinstance(element.tag, str):
+            continue
+        if (
+            element.tag not in VOID_CONTENT_TAGS
+            and not element.xpath(" | ".join(f".//{tag}" for tag in VOID_CONTENT_TAGS))
+            and not _normalized_text(element)
+        ):
+            element.drop_tree()
+        elif element.tag in WRAPPER_TAGS and (
+            element.tag == "span"
+            or (len(element) == 1 and not (element.text or "").strip())
+        ):
+            element.drop_tag()
+
+
+def _collapse_whitespace(root: lxml_html.HtmlElement):
+    # Code blocks keep their whitespace, including the tails of the elements inside them
+    for element in root.iter():
+        in_pre = any(True for _ in element.iterancestors("pre"))
+        if element.text and not (in_pre or element.tag == "pre"):
+            element.text = LINE_BREAK_WHITESPACE_PATTERN.sub("\n", element.text)
+        if element.tail and not in_pre:
+            element.tail = LINE_BREAK_WHITESPACE_PATTERN.sub("\n", element.tail)
+
+
+def _normalized_text(element: lxml_html.HtmlElement) -> str:
+    return " ".join(element.text_content().split())
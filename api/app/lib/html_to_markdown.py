@@ -0,0 +1,318 @@
+import re
+import urllib.parse
+from collections import Counter
+
+from lxml import html as lxml_html
+from pydantic import BaseModel
+
+from app.lib.html_reduction import LANGUAGE_CLASS_PATTERN
+
+HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+
+BLOCK_TAGS = HEADING_TAGS | {
+    "p",
+    "pre",
+    "ul",
+    "ol",
+    "blockquote",
+    "hr",
+    "table",
+    "figure",
+    "figcaption",
+    "div",
+    "section",
+    "article",
+    "main",
+    "header",
+    "footer",
+    "aside",
+    "dl",
+    "dt",
+    "dd",
+    "li",
+}
+
+# Minimum agreement between the readability extract and the page's semantic article element
+MIN_COVERAGE = 0.9
+MIN_PRECISION = 0.85
+
+# Pages shorter than this, or with fewer paragraphs, are too small to judge reliably
+MIN_WORDS = 150
+MIN_PARAGRAPHS = 3
+
+
+class LocalMarkdownConversion(BaseModel):
+    markdown: str
+    # Share of the semantic article text found in the readability extract
+    coverage: float
+    # Share of the readability extract found in the semantic article text
+    precision: float
+    accepted: bool
+
+
+def convert_html_to_markdown(html: str, base_url: str | None = None) -> str:
+    """
+    Deterministically convert semantic article HTML (headings, paragraphs, lists, code blocks,
+    quotes, tables, links and images) to Markdown. Unknown elements are rendered through their
+    children, so no text is dropped.
+    """
+    root = lxml_html.fromstring(html)
+    return "\n\n".join(_render_blocks(root, base_url)).strip()
+
+
+def convert_article_locally(
+    reduced_html: str, page_html: str, base_url: str | None = None
+) -> LocalMarkdownConversion:
+    """
+    Convert the reduced article HTML to Markdown without an LLM, and decide whether the result
+    is good enough to use. It is accepted when the page has a semantic article element whose
+    text closely matches the readability extract, i.e. two independent ways of finding the
+    article body agree, and the extract is long and structured enough to judge.
+    """
+    markdown = convert_html_to_markdown(reduced_html, base_url=base_url)
+
+    reduced = lxml_html.fromstring(reduced_html)
+    reference_text = _semantic_article_text(lxml_html.fromstring(page_html))
+    coverage, precision = _text_overlap(reduced.text_content(), reference_text or "")
+
+    accepted = (
+        reference_text is not None
+        and coverage >= MIN_COVERAGE
+        and precision >= MIN_PRECISION
+        and len(_words(reduced.text_content())) >= MIN_WORDS
+        and len(reduced.xpath("//p")) >= MIN_PARAGRAPHS
+        and bool(markdown)
+    )
+
+    return LocalMarkdownConversion(
+        markdown=markdown,
+        coverage=coverage,
+        precision=precision,
+        accepted=accepted,
+    )
+
+
+def _render_blocks(element: lxml_html.HtmlElement, base_url: str | None) -> list[str]:
+    """
+    Render the children of a container element as a list of Markdown blocks. Loose text and
+    inline elements between block elements are gathered into paragraphs.
+    """
+    blocks: list[str] = []
+    inline_parts: list[str] = [_text(element.text)]
+
+    def flush_inline():
+        paragraph = _finish_inline("".join(inline_parts))
+        if paragraph:
+            blocks.append(paragraph)
+        inline_parts.clear()
+
+    for child in element:
+        if isinstance(child.tag, str) and child.tag in BLOCK_TAGS:
+            flush_inline()
+            block = _render_block(child, base_url)
+            if isinstance(block, list):
+                blocks.extend(block)
+            elif block:
+                blocks.append(block)
+        elif isinstance(child.tag, str):
+            inline_parts.append(_render_inline(child, base_url))
+        inline_parts.append(_text(child.tail))
+
+    flush_inline()
+    return blocks
+
+
+def _render_block(
+    element: lxml_html.HtmlElement, base_url: str | None
+) -> str | list[str]:
+    tag = element.tag
+
+    if tag in HEADING_TAGS:
+        text = _finish_inline(_render_inline_children(element, base_url))
+        return f"{'#' * int(tag[1])} {text}" if text else ""
+    if tag == "p":
+        return _finish_inline(_render_inline_children(element, base_url))
+    if tag == "pre":
+        return _render_code_block(element)
+    if tag in {"ul", "ol"}:
+        return _render_list(element, base_url)
+    if tag == "blockquote":
+        quote = "\n\n".join(_render_blocks(element, base_url))
+        return "\n".join(f"> {line}".rstrip() for line in quote.splitlines())
+    if tag == "hr":
+        return "---"
+    if tag == "table":
+        return _render_table(element, base_url)
+    if tag == "figcaption":
+        text = _finish_inline(_render_inline_children(element, base_url))
+        return f"*{text}*" if text else ""
+    if tag == "dt":
+        text = _finish_inline(_render_inline_children(element, base_url))
+        return f"**{text}**" if text else ""
+
+    # Containers (div, section, figure, dd, ...) are rendered through their children
+    return _render_blocks(element, base_url)
+
+
+def _render_code_block(element: lxml_html.HtmlElement) -> str:
+    language = ""
+    for candidate in [element, *element.iter("code")]:
+        match = LANGUAGE_CLASS_PATTERN.search(candidate.get("class", ""))
+        if match:
+            language = match.group(1).lower()
+            break
+
+    code = element.text_content().strip("\n")
+    fence = "````" if "```" in code else "```"
+    return f"{fence}{language}\n{code}\n{fence}"
+
+
+def _render_list(element: lxml_html.HtmlElement, base_url: str | None) -> str:
+    ordered = element.tag == "ol"
+    try:
+        number = int(element.get("start", "1"))
+    except ValueError:
+        number = 1
+
+    items: list[str] = []
+    for item in element:
+        if not isinstance(item.tag, str) or item.tag != "li":
+            continue
+
+        marker = f"{number}." if ordered else "-"
+        number += 1
+
+        blocks = _render_blocks(item, base_url)
+        if not blocks:
+            continue
+
+        indent = " " * (len(marker) + 1)
+        lines = "\n".join(blocks).splitlines()
+        items.append(
+            "\n".join(
+                [f"{marker} {lines[0]}"]
+                + [f"{indent}{line}" if line else "" for line in lines[1:]]
+            )
+        )
+
+    return "\n".join(items)
+
+
+def _render_table(element: lxml_html.HtmlElement, base_url: str | None) -> str:
+    rows = [
+        [
+            _finish_inline(_render_inline_children(cell, base_url)).replace("|", "\\|")
+            for cell in row
+            if isinstance(cell.tag, str) and cell.tag in {"td", "th"}
+        ]
+        for row in element.iter("tr")
+    ]
+    rows = [row for row in rows if row]
+    if not rows:
+        return ""
+
+    width = max(len(row) for row in rows)
+    rows = [row + [""] * (width - len(row)) for row in rows]
+    lines = [
+        "| " + " | ".join(rows[0]) + " |",
+        "| " + " | ".join(["---"] * width) + " |",
+    ]
+    lines += ["| " + " | ".join(row) + " |" for row in rows[1:]]
+    return "\n".join(lines)
+
+
+def _render_inline(element: lxml_html.HtmlElement, base_url: str | None) -> str:
+    tag = element.tag
+
+    if tag == "br":
+        return "\n"
+    if tag == "img":
+        src = element.get("src")
+        if not src:
+            return ""
+        return f"![{element.get('alt', '').strip()}]({_absolute_url(src, base_url)})"
+    if tag == "code":
+        code = element.text_content()
+        return f"`{code}`" if code.strip() else code
+
+    text = _render_inline_children(element, base_url)
+    if not text.strip():
+        return text
+
+    if tag == "a" and element.get("href"):
+        href = element.get("href", "")
+        if href.startswith("#"):
+            return text
+        return f"[{text.strip()}]({_absolute_url(href, base_url)})"
+    if tag in {"strong", "b"}:
+        return _wrap_inline(text, "**")
+    if tag in {"em", "i", "cite"}:
+        return _wrap_inline(text, "*")
+    if tag in {"del", "s", "strike"}:
+        return _wrap_inline(text, "~~")
+    return text
+
+
+def _render_inline_children(
+    element: lxml_html.HtmlElement, base_url: str | None
+) -> str:
+    parts = [_text(element.text)]
+    for child in element:
+        if isinstance(child.tag, str):
+            # Block elements nested in inline context are flattened to their text
+            if child.tag in BLOCK_TAGS:
+                parts.append(" " + " ".join(_render_blocks(child, base_url)) + " ")
+            else:
+                parts.append(_render_inline(child, base_url))
+        parts.append(_text(child.tail))
+    return "".join(parts)
+
+
+def _wrap_inline(text: str, marker: str) -> str:
+    # Keep surrounding whitespace outside of the markers, otherwise Markdown ignores them
+    stripped = text.strip()
+    leading = text[: len(text) - len(text.lstrip())]
+    trailing = text[len(text.rstrip()) :]
+    return f"{leading}{marker}{stripped}{marker}{trailing}"
+
+
+def _finish_inline(text: str) -> str:
+    return "\n".join(
+        re.sub(r" {2,}", " ", line).strip() for line in text.split("\n")
+    ).strip()
+
+
+def _text(text: str | None) -> str:
+    return re.sub(r"\s+", " ", text) if text else ""
+
+
+def _absolute_url(url: str, base_url: str | None) -> str:
+    return urllib.parse.urljoin(base_url, url) if base_url else url
+
+
+def _semantic_article_text(page: lxml_html.HtmlElement) -> str | None:
+    """
+    Returns the text of the page's semantic article element, if it has one.
+    """
+    for xpath in ("//article", "//*[@itemprop='articleBody']", "//main"):
+        candidates = page.xpath(xpath)
+        if candidates:
+            return max((candidate.text_content() for candidate in candidates), key=len)
+    return None
+
+
+def _words(text: str) -> list[str]:
+    return re.findall(r"\w+", text.lower())
+
+
+def _text_overlap(candidate: str, reference: str) -> tuple[float, float]:
+    """
+    Returns the (coverage, precision) of the candidate's words against the reference's words.
+    """
+    candidate_words = Counter(_words(candidate))
+    reference_words = Counter(_words(reference))
+    common = sum((candidate_words & reference_words).values())
+
+    coverage = common / sum(reference_words.values()) if reference_words else 0.0
+    precision = common / sum(candidate_words.values()) if candidate_words else 0.0
+    return coverage, precision
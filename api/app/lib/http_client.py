@@ -0,0 +1,312 @@
+# Shared by api (app/lib) and orion (app/features): keep the copies identical apart from
+# their app.lib / app.features imports. api/test_shared_modules.py checks that they are.
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+from urllib3.util.retry import Retry
+
+DEFAULT_USER_AGENT = "Mozilla/5.0"
+
+# Transient statuses worth retrying (honoring a bounded Retry-After when the origin sends one)
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# The headers of a cached response that are replayed when the origin answers 304
+REVALIDATION_HEADERS = ("content-type", "etag", "last-modified")
+
+
+class ResponseTooLargeError(RuntimeError):
+    pass
+
+
+class BoundedRetry(Retry):
+    """
+    A Retry that honors Retry-After for at most `max_retry_after` seconds, so an origin asking
+    for a long (or absurd) wait cannot hold a worker thread for that long.
+    """
+
+    def __init__(self, *args: Any, max_retry_after: float = 0, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.max_retry_after = max_retry_after
+
+    def new(self, **kwargs: Any) -> "BoundedRetry":
+        # urllib3 builds a new Retry for every attempt; carry the cap over
+        kwargs.setdefault("max_retry_after", self.max_retry_after)
+        return super().new(**kwargs)
+
+    def get_retry_after(self, response) -> float | None:
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, self.max_retry_after)
+
+
+@dataclass
+class HTTPResponse:
+    url: str
+    status_code: int
+    # Only the headers in REVALIDATION_HEADERS, with lowercase names
+    headers: dict[str, str]
+    content: bytes
+    encoding: str | None = None
+    # Whether the body was served from the revalidation store after a 304
+    revalidated: bool = field(default=False)
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code} from {self.url}")
+
+
+class RevalidationStore:
+    """
+    A SQLite-backed store of GET responses that carried an ETag or Last-Modified header, so
+    the next fetch of the same URL can be a conditional request and a 304 can be answered from
+    here. The least recently used responses are evicted once their total size goes over
+    `max_size_bytes`.
+    """
+
+    def __init__(self, path: str, max_size_bytes: int):
+        self.path = path
+        self.max_size_bytes = max_size_bytes
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                headers TEXT NOT NULL,
+                encoding TEXT,
+                content BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._connection.commit()
+
+    def get(self, url: str) -> HTTPResponse | None:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT headers, encoding, content FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            self._connection.execute(
+                "UPDATE responses SET last_accessed_at = ? WHERE url = ?",
+                (time.time(), url),
+            )
+            self._connection.commit()
+
+        headers, encoding, content = row
+        return HTTPResponse(
+            url=url,
+            status_code=200,
+            headers=json.loads(headers),
+            content=content,
+            encoding=encoding,
+        )
+
+    def set(self, response: HTTPResponse):
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (url, headers, encoding, content, size, last_accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    response.url,
+                    json.dumps(response.headers),
+                    response.encoding,
+                    response.content,
+                    len(response.content),
+                    time.time(),
+                ),
+            )
+            # Keep the most recently used responses that fit in the size budget
+            self._connection.execute(
+                """
+                DELETE FROM responses WHERE url IN (
+                    SELECT url FROM (
+                        SELECT url, SUM(size) OVER (
+                            ORDER BY last_accessed_at DESC
+                        ) AS total_size
+                        FROM responses
+                    )
+                    WHERE total_size > ?
+                )
+                """,
+                (self.max_size_bytes,),
+            )
+            self._connection.commit()
+
+
+class HTTPClient:
+    """
+    The client for every outbound HTTP fetch: one pooled session with connect and read
+    timeouts, bounded retries with exponential backoff, compressed transfers (gzip and
+    deflate, plus br/zstd when their decoders are installed), a cap on the response size and,
+    when given a RevalidationStore, ETag/Last-Modified revalidation of repeated GETs.
+    """
+
+    def __init__(
+        self,
+        connect_timeout: float,
+        read_timeout: float,
+        max_retries: int,
+        backoff_factor: float,
+        max_response_bytes: int,
+        pool_size: int,
+        max_retry_after: float = 10,
+        revalidation_store: RevalidationStore | None = None,
+    ):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_response_bytes = max_response_bytes
+        self.revalidation_store = revalidation_store
+        # Conditional requests answered with 304 (hits) or with a new body (misses)
+        self.revalidation_hits = 0
+        self.revalidation_misses = 0
+
+        retry = BoundedRetry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset({"GET", "HEAD"}),
+            respect_retry_after_header=True,
+            max_retry_after=max_retry_after,
+            # Give the last response back instead of raising, so callers see its status
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+        )
+
+        self._session = requests.Session()
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._session.headers.update(
+            {"User-Agent": DEFAULT_USER_AGENT, "Accept-Encoding": ACCEPT_ENCODING}
+        )
+
+    @classmethod
+    def from_env(cls) -> "HTTPClient":
+        """
+        Build a client configured through the HTTP_CONNECT_TIMEOUT_SECONDS,
+        HTTP_READ_TIMEOUT_SECONDS, HTTP_MAX_RETRIES, HTTP_BACKOFF_FACTOR,
+        HTTP_MAX_RETRY_AFTER_SECONDS, HTTP_MAX_RESPONSE_MB and HTTP_POOL_SIZE environment
+        variables. Revalidated responses
+        are stored at HTTP_CACHE_PATH (up to HTTP_CACHE_MAX_SIZE_MB), unless
+        HTTP_CACHE_ENABLED is set to a false value.
+        """
+        revalidation_store = None
+        if os.environ.get("HTTP_CACHE_ENABLED", "true").lower() in {"1", "true", "yes"}:
+            revalidation_store = RevalidationStore(
+                path=os.environ.get(
+                    "HTTP_CACHE_PATH", os.path.join("cache", "http.db")
+                ),
+                max_size_bytes=int(os.environ.get("HTTP_CACHE_MAX_SIZE_MB", "200"))
+                * 1024
+                * 1024,
+            )
+
+        return cls(
+            connect_timeout=float(os.environ.get("HTTP_CONNECT_TIMEOUT_SECONDS", "5")),
+            read_timeout=float(os.environ.get("HTTP_READ_TIMEOUT_SECONDS", "30")),
+            max_retries=int(os.environ.get("HTTP_MAX_RETRIES", "3")),
+            backoff_factor=float(os.environ.get("HTTP_BACKOFF_FACTOR", "0.5")),
+            max_retry_after=float(os.environ.get("HTTP_MAX_RETRY_AFTER_SECONDS", "10")),
+            max_response_bytes=int(os.environ.get("HTTP_MAX_RESPONSE_MB", "20"))
+            * 1024
+            * 1024,
+            pool_size=int(os.environ.get("HTTP_POOL_SIZE", "32")),
+            revalidation_store=revalidation_store,
+        )
+
+    def get(
+        self,
+        url: str,
+        headers: dict[str, str] | None = None,
+        revalidate: bool = True,
+    ) -> HTTPResponse:
+        """
+        GET a URL and return the response, whatever its status. With `revalidate` on (and a
+        revalidation store configured), a response stored for the URL is revalidated with a
+        conditional request and served from the store if the origin answers 304.
+        """
+        headers = dict(headers or {})
+        store = self.revalidation_store if revalidate else None
+
+        stored = store.get(url) if store else None
+        if stored is not None:
+            if etag := stored.headers.get("etag"):
+                headers["If-None-Match"] = etag
+            if last_modified := stored.headers.get("last-modified"):
+                headers["If-Modified-Since"] = last_modified
+
+        response = self._get(url, headers)
+
+        if stored is not None:
+            if response.status_code == 304:
+                self.revalidation_hits += 1
+                stored.revalidated = True
+                return stored
+            self.revalidation_misses += 1
+
+        if (
+            store
+            and response.status_code == 200
+            and ("etag" in response.headers or "last-modified" in response.headers)
+        ):
+            store.set(response)
+
+        return response
+
+    def _get(self, url: str, headers: dict[str, str]) -> HTTPResponse:
+        with self._session.get(
+            url, headers=headers, timeout=self.timeout, stream=True
+        ) as response:
+            content_length = response.headers.get("Content-Length")
+            if content_length and int(content_length) > self.max_response_bytes:
+                raise ResponseTooLargeError(
+                    f"Response from {url} is {content_length} bytes, over the limit of {self.max_response_bytes}"
+                )
+
+            # Content-Length can be missing (or describe the compressed body), so count too
+            content = bytearray()
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                content.extend(chunk)
+                if len(content) > self.max_response_bytes:
+                    raise ResponseTooLargeError(
+                        f"Response from {url} is over the limit of {self.max_response_bytes} bytes"
+                    )
+
+            return HTTPResponse(
+                url=url,
+                status_code=response.status_code,
+                headers={
+                    name.lower(): value
+                    for name, value in response.headers.items()
+                    if name.lower() in REVALIDATION_HEADERS
+                },
+                content=bytes(content),
+                encoding=response.encoding,
+            )
+
+
+# Process-wide HTTP client, shared so that every fetch reuses its connection pool
+HTTP_CLIENT = HTTPClient.from_env()
@@ -0,0 +1,167 @@
+# Shared by api (app/lib) and orion (app/features): keep the copies identical apart from
+# their app.lib / app.features imports. api/test_shared_modules.py checks that they are.
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from enum import StrEnum
+from typing import Any
+
+from pydantic import BaseModel
+
+
+class JobStatus(StrEnum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+# Jobs in these states have not finished yet; they are resumed after a restart
+ACTIVE_JOB_STATUSES = [JobStatus.QUEUED, JobStatus.RUNNING]
+ACTIVE_JOB_STATUSES_SQL = ", ".join(f"'{status}'" for status in ACTIVE_JOB_STATUSES)
+
+
+class Job(BaseModel):
+    id: str
+    # Deduplication key, e.g. the result cache key of the request
+    key: str
+    url: str
+    # Whatever the runner needs to run the job again after a restart
+    params: dict[str, Any]
+    status: JobStatus
+    completed_stages: list[str] = []
+    # Share of the job's stages that have completed, from 0 to 1
+    progress: float = 0.0
+    result: dict[str, Any] | None = None
+    error: str | None = None
+    created_at: float
+    updated_at: float
+
+    def to_response(self) -> dict[str, Any]:
+        return self.model_dump(mode="json", exclude={"key", "params"})
+
+
+class JobStore:
+    """
+    A persistent SQLite-backed store of background jobs, so that submitted work and finished
+    results survive restarts. Jobs are kept for `ttl_seconds` after they were last updated.
+    """
+
+    def __init__(self, path: str, ttl_seconds: int):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                status TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_key_status ON jobs (key, status)"
+        )
+        self._connection.commit()
+
+    @classmethod
+    def from_env(cls, prefix: str) -> "JobStore":
+        """
+        Build a store configured through the <prefix>_JOBS_PATH and <prefix>_JOBS_TTL_SECONDS
+        environment variables, e.g. SMRZ_JOBS_PATH for the api.
+        """
+        return cls(
+            path=os.environ.get(
+                f"{prefix}_JOBS_PATH", os.path.join("cache", "jobs.db")
+            ),
+            # 1 day
+            ttl_seconds=int(os.environ.get(f"{prefix}_JOBS_TTL_SECONDS", "86400")),
+        )
+
+    def get_or_create(
+        self, key: str, url: str, params: dict[str, Any]
+    ) -> tuple[Job, bool]:
+        """
+        Return the unfinished job with the given key if there is one, otherwise create a new
+        queued job. The second value tells whether the job was created.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                f"SELECT value FROM jobs WHERE key = ? AND status IN ({ACTIVE_JOB_STATUSES_SQL}) ORDER BY updated_at DESC LIMIT 1",
+                (key,),
+            ).fetchone()
+            if row is not None:
+                return Job.model_validate_json(row[0]), False
+
+            job = Job(
+                id=uuid.uuid4().hex,
+                key=key,
+                url=url,
+                params=params,
+                status=JobStatus.QUEUED,
+                created_at=now,
+                updated_at=now,
+            )
+            self._save(job)
+            self._evict(now)
+            self._connection.commit()
+            return job, True
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            return Job.model_validate_json(row[0]) if row else None
+
+    def update(self, job_id: str, **fields: Any) -> Job:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if row is None:
+                raise KeyError(f"Unknown job: {job_id}")
+
+            job = Job.model_validate_json(row[0]).model_copy(
+                update={**fields, "updated_at": time.time()}
+            )
+            self._save(job)
+            self._connection.commit()
+            return job
+
+    def active(self) -> list[Job]:
+        """
+        Return every unfinished job, oldest first.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT value FROM jobs WHERE status IN ({ACTIVE_JOB_STATUSES_SQL})"
+            ).fetchall()
+        return sorted(
+            (Job.model_validate_json(row[0]) for row in rows),
+            key=lambda job: job.created_at,
+        )
+
+    def _save(self, job: Job):
+        self._connection.execute(
+            "INSERT OR REPLACE INTO jobs (id, key, value, status, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (job.id, job.key, job.model_dump_json(), job.status, job.updated_at),
+        )
+
+    def _evict(self, now: float):
+        # Unfinished jobs are never evicted, however old they are
+        self._connection.execute(
+            f"DELETE FROM jobs WHERE updated_at < ? AND status NOT IN ({ACTIVE_JOB_STATUSES_SQL})",
+            (now - self.ttl_seconds,),
+        )
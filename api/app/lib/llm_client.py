@@ -1,11 +1,35 @@
+import asyncio
 from enum import StrEnum
+from functools import cache, cached_property
+import itertools
 import os
 import time
 
+import httpx
 import instructor
-from openai import NotGiven, OpenAI
+import tiktoken
+from openai import (
+    APIConnectionError,
+    AsyncOpenAI,
+    DefaultAsyncHttpxClient,
+    DefaultHttpxClient,
+    InternalServerError,
+    NotGiven,
+    OpenAI,
+    RateLimitError,
+)
 from pydantic import BaseModel
-from typing import Type, TypedDict
+from typing import AsyncIterator, Awaitable, Callable, Type, TypedDict
+
+from app.lib.concurrency_limit import ConcurrencyLimit
+from app.lib.llm_response_cache import LLMResponseCache, make_llm_cache_key
+from app.lib.rate_limiter import RateLimiter, parse_retry_after
+from app.lib.metrics import (
+    LLM_COST_USD,
+    LLM_ERRORS,
+    LLM_REQUEST_DURATION_SECONDS,
+    LLM_TOKENS,
+)
 
 
 class Models(StrEnum):
@@ -37,6 +61,10 @@ class ModelInfo(TypedDict):
     provider: str
     cost_per_1M_input_tokens: int
     cost_per_1M_output_tokens: int
+    # Tokens the model accepts in a single request (input and output together), and of
+    # output alone
+    context_window: int
+    max_output_tokens: int
 
 
 MODEL_REGISTRY: dict[Models, ModelInfo] = {
@@ -46,24 +74,32 @@ MODEL_REGISTRY: dict[Models, ModelInfo] = {
         "provider": "Google",
         "cost_per_1M_input_tokens": 20,  # 0.20 USD
         "cost_per_1M_output_tokens": 80,  # 0.80 USD
+        "context_window": 1_048_576,
+        "max_output_tokens": 65_536,
     },
     Models.GEMINI_2_5_FLASH: {
         "name": "Gemini 2.5 Flash",
         "provider": "Google",
         "cost_per_1M_input_tokens": 10,  # 0.10 USD
         "cost_per_1M_output_tokens": 40,  # 0.40 USD
+        "context_window": 1_048_576,
+        "max_output_tokens": 65_536,
     },
     Models.GEMINI_2_5_FLASH_LITE_PREVIEW: {
         "name": "Gemini 2.5 Flash Lite Preview",
         "provider": "Google",
         "cost_per_1M_input_tokens": 5,  # 0.05 USD
         "cost_per_1M_output_tokens": 20,  # 0.20 USD
+        "context_window": 1_048_576,
+        "max_output_tokens": 65_536,
     },
     Models.GEMINI_2_0_FLASH: {
         "name": "Gemini 2.0 Flash",
         "provider": "Google",
         "cost_per_1M_input_tokens": 5,  # 0.05 USD
         "cost_per_1M_output_tokens": 20,  # 0.20 USD
+        "context_window": 1_048_576,
+        "max_output_tokens": 8_192,
     },
     # OpenAI Models
     Models.GPT_5: {
@@ -71,48 +107,64 @@ MODEL_REGISTRY: dict[Models, ModelInfo] = {
         "provider": "OpenAI",
         "cost_per_1M_input_tokens": 125,  # 1.25 USD
         "cost_per_1M_output_tokens": 1000,  # 10.00 USD
+        "context_window": 400_000,
+        "max_output_tokens": 128_000,
     },
     Models.GPT_5_MINI: {
         "name": "GPT-5 Mini",
         "provider": "OpenAI",
         "cost_per_1M_input_tokens": 25,  # 0.25 USD
         "cost_per_1M_output_tokens": 200,  # 2.00 USD
+        "context_window": 400_000,
+        "max_output_tokens": 128_000,
     },
     Models.GPT_5_NANO: {
         "name": "GPT-5 Nano",
         "provider": "OpenAI",
         "cost_per_1M_input_tokens": 5,  # 0.05 USD
         "cost_per_1M_output_tokens": 40,  # 0.40 USD
+        "context_window": 400_000,
+        "max_output_tokens": 128_000,
     },
     Models.GPT_4O_MINI: {
         "name": "GPT-4o Mini",
         "provider": "OpenAI",
         "cost_per_1M_input_tokens": 15,  # 0.15 USD
         "cost_per_1M_output_tokens": 60,  # 0.60 USD
+        "context_window": 128_000,
+        "max_output_tokens": 16_384,
     },
     Models.GPT_4_1_NANO_2025_04_14: {
         "name": "GPT-4.1 Nano",
         "provider": "OpenAI",
         "cost_per_1M_input_tokens": 10,  # 0.10 USD
         "cost_per_1M_output_tokens": 40,  # 0.40 USD
+        "context_window": 1_047_576,
+        "max_output_tokens": 32_768,
     },
     Models.GPT_4_1_MINI_2025_04_14: {
         "name": "GPT-4.1 Mini",
         "provider": "OpenAI",
         "cost_per_1M_input_tokens": 40,  # 0.40 USD
         "cost_per_1M_output_tokens": 160,  # 1.60 USD
+        "context_window": 1_047_576,
+        "max_output_tokens": 32_768,
     },
     Models.GPT_O3_MINI_2025_01_31: {
         "name": "GPT-o3 Mini",
         "provider": "OpenAI",
         "cost_per_1M_input_tokens": 110,  # 1.10 USD
         "cost_per_1M_output_tokens": 440,  # 4.40 USD
+        "context_window": 200_000,
+        "max_output_tokens": 100_000,
     },
     Models.GPT_O4_MINI_2025_04_16: {
         "name": "GPT-o4 Mini",
         "provider": "OpenAI",
         "cost_per_1M_input_tokens": 110,  # 1.10 USD
         "cost_per_1M_output_tokens": 440,  # 4.40 USD
+        "context_window": 200_000,
+        "max_output_tokens": 100_000,
     },
     # OpenRouter Models
     Models.OR_LLAMA_4_MAVERICK: {
@@ -120,73 +172,270 @@ MODEL_REGISTRY: dict[Models, ModelInfo] = {
         "provider": "OpenRouter",
         "cost_per_1M_input_tokens": 15,  # 0.15 USD
         "cost_per_1M_output_tokens": 60,  # 0.60 USD
+        "context_window": 1_048_576,
+        "max_output_tokens": 16_384,
     },
     Models.OR_LLAMA_3_3_70B_INSTRUCT: {
         "name": "Llama 3.3 70B Instruct",
         "provider": "OpenRouter",
         "cost_per_1M_input_tokens": 5,  # 0.05 USD
         "cost_per_1M_output_tokens": 25,  # 0.25 USD
+        "context_window": 131_072,
+        "max_output_tokens": 16_384,
     },
     Models.OR_GPT_4O_MINI: {
         "name": "GPT-4o Mini",
         "provider": "OpenRouter",
         "cost_per_1M_input_tokens": 15,  # 0.15 USD
         "cost_per_1M_output_tokens": 60,  # 0.60 USD
+        "context_window": 128_000,
+        "max_output_tokens": 16_384,
     },
     Models.OR_GPT_4_1_MINI: {
         "name": "GPT-4.1 Mini",
         "provider": "OpenRouter",
         "cost_per_1M_input_tokens": 40,  # 0.40 USD
         "cost_per_1M_output_tokens": 160,  # 1.60 USD
+        "context_window": 1_047_576,
+        "max_output_tokens": 32_768,
     },
     Models.OR_KIMI_K2: {
         "name": "Kimi K2",
         "provider": "OpenRouter",
         "cost_per_1M_input_tokens": 14,  # 0.14 USD
         "cost_per_1M_output_tokens": 249,  # 2.49 USD
+        "context_window": 131_072,
+        "max_output_tokens": 16_384,
     },
     Models.OR_GPT_OSS_120B: {
         "name": "GPT-OSS 120B",
         "provider": "OpenRouter",
         "cost_per_1M_input_tokens": 15,  # 0.15 USD
         "cost_per_1M_output_tokens": 75,  # 0.75 USD
+        "context_window": 131_072,
+        "max_output_tokens": 32_768,
+    },
+}
+
+# Connection pool shared by every request made through a provider client. Keep-alive
+# connections are reused across requests so we don't pay a TCP+TLS handshake per LLM call.
+LLM_HTTP_LIMITS = httpx.Limits(
+    max_connections=int(os.environ.get("LLM_MAX_CONNECTIONS", "100")),
+    max_keepalive_connections=int(
+        os.environ.get("LLM_MAX_KEEPALIVE_CONNECTIONS", "20")
+    ),
+    keepalive_expiry=float(os.environ.get("LLM_KEEPALIVE_EXPIRY_SECONDS", "30")),
+)
+
+# The base URLs can be overridden (e.g. to point every provider at the benchmark's stub server)
+PROVIDER_CONFIG: dict[str, dict[str, str | None]] = {
+    "Google": {
+        "api_key": os.environ.get("GEMINI_API_KEY"),
+        "base_url": os.environ.get(
+            "GEMINI_BASE_URL",
+            "https://generativelanguage.googleapis.com/v1beta/openai/",
+        ),
+    },
+    "OpenAI": {
+        "api_key": os.environ.get("OPENAI_API_KEY"),
+        "base_url": os.environ.get("OPENAI_BASE_URL", "https://api.openai.com/v1"),
     },
+    "OpenRouter": {
+        "api_key": os.environ.get("OPENROUTER_API_KEY"),
+        "base_url": os.environ.get(
+            "OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1"
+        ),
+    },
+}
+
+# Maximum number of requests in flight to each provider at once, across the whole process.
+# LLM_MAX_CONCURRENT_REQUESTS sets the default for every provider, and e.g.
+# LLM_MAX_CONCURRENT_REQUESTS_OPENAI overrides it for a single provider.
+PROVIDER_CONCURRENCY_LIMITS: dict[str, ConcurrencyLimit] = {
+    provider: ConcurrencyLimit(
+        int(
+            os.environ.get(
+                f"LLM_MAX_CONCURRENT_REQUESTS_{provider.upper()}",
+                os.environ.get("LLM_MAX_CONCURRENT_REQUESTS", "16"),
+            )
+        )
+    )
+    for provider in PROVIDER_CONFIG
+}
+
+# Client-side requests/min and tokens/min budget of each provider, across the whole process
+# (see RateLimiter.from_env). Set them a little under the provider's quota, so requests
+# queue here instead of bouncing off 429s.
+PROVIDER_RATE_LIMITERS: dict[str, RateLimiter] = {
+    provider: RateLimiter.from_env(provider) for provider in PROVIDER_CONFIG
 }
 
+# Times a request rejected with a 429 is retried, after pausing its provider for the
+# response's Retry-After (or an exponential backoff when it has none)
+LLM_MAX_RATE_LIMIT_RETRIES = int(os.environ.get("LLM_MAX_RATE_LIMIT_RETRIES", "3"))
+
+# Longest Retry-After honoured for a 429. A provider asking for longer (e.g. once a daily
+# quota is spent) fails the request right away, so a routing client can fail over instead
+# of every caller of the provider waiting that long.
+LLM_MAX_RETRY_AFTER_SECONDS = float(os.environ.get("LLM_MAX_RETRY_AFTER_SECONDS", "30"))
+
+# Times a request failing with a connection error or a 5xx is retried, with an exponential
+# backoff. The provider clients don't retry anything themselves (max_retries=0), so that
+# every attempt goes through the rate limiter and 429s reach it.
+LLM_MAX_TRANSIENT_RETRIES = int(os.environ.get("LLM_MAX_TRANSIENT_RETRIES", "2"))
+
+# Provider errors worth retrying: rate limits, connection errors (including timeouts) and 5xx
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, InternalServerError)
+
+# Output tokens reserved for a request before the provider reports its actual usage
+ESTIMATED_OUTPUT_TOKENS = 1000
+
 # For the models with "Google" as the provider, we use the GEMINI_CLIENT.
 GEMINI_CLIENT = OpenAI(
-    api_key=os.environ.get("GEMINI_API_KEY"),
-    base_url="https://generativelanguage.googleapis.com/v1beta/openai/",
+    **PROVIDER_CONFIG["Google"],
+    http_client=DefaultHttpxClient(limits=LLM_HTTP_LIMITS),
+    max_retries=0,
+)
+ASYNC_GEMINI_CLIENT = AsyncOpenAI(
+    **PROVIDER_CONFIG["Google"],
+    http_client=DefaultAsyncHttpxClient(limits=LLM_HTTP_LIMITS),
+    max_retries=0,
 )
 
 # For the models with "OpenAI" as the provider, we use the OPENAI_CLIENT.
 OPENAI_CLIENT = OpenAI(
-    api_key=os.environ.get("OPENAI_API_KEY"),
-    base_url="https://api.openai.com/v1",
+    **PROVIDER_CONFIG["OpenAI"],
+    http_client=DefaultHttpxClient(limits=LLM_HTTP_LIMITS),
+    max_retries=0,
+)
+ASYNC_OPENAI_CLIENT = AsyncOpenAI(
+    **PROVIDER_CONFIG["OpenAI"],
+    http_client=DefaultAsyncHttpxClient(limits=LLM_HTTP_LIMITS),
+    max_retries=0,
 )
 
 # For the models with "OpenRouter" as the provider, we use the OPENROUTER_CLIENT.
 OPENROUTER_CLIENT = OpenAI(
-    api_key=os.environ.get("OPENROUTER_API_KEY"),
-    base_url="https://openrouter.ai/api/v1",
+    **PROVIDER_CONFIG["OpenRouter"],
+    http_client=DefaultHttpxClient(limits=LLM_HTTP_LIMITS),
+    max_retries=0,
+)
+ASYNC_OPENROUTER_CLIENT = AsyncOpenAI(
+    **PROVIDER_CONFIG["OpenRouter"],
+    http_client=DefaultAsyncHttpxClient(limits=LLM_HTTP_LIMITS),
+    max_retries=0,
 )
 
 
+def estimate_token_count(text: str) -> int:
+    """
+    Roughly estimate the number of tokens in the given text (~4 characters per token).
+    """
+    return (len(text) + 3) // 4
+
+
+# The tokenizer of current OpenAI models. Other providers tokenize differently, but close
+# enough to budget prompts against their context windows.
+TOKENIZER_ENCODING = "o200k_base"
+
+# Share of a context window prompts are planned to fill, leaving room for the chat
+# formatting and for the difference between our tokenizer and the provider's
+CONTEXT_WINDOW_HEADROOM = 0.9
+
+
+@cache
+def get_tokenizer() -> tiktoken.Encoding | None:
+    """
+    Load the tokenizer once. tiktoken downloads its encodings on first use; when that fails
+    (e.g. offline), token counts fall back to `estimate_token_count`.
+    """
+    try:
+        return tiktoken.get_encoding(TOKENIZER_ENCODING)
+    except Exception as e:
+        print(
+            f"Warning: Failed to load the {TOKENIZER_ENCODING} tokenizer, estimating token counts instead: {e}"
+        )
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count the tokens in the given text, as an LLM would see them.
+    """
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        return estimate_token_count(text)
+    return len(tokenizer.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Cut the given text down to its first `max_tokens` tokens.
+    """
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        return text[: max(0, max_tokens) * 4]
+
+    tokens = tokenizer.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return tokenizer.decode(tokens[: max(0, max_tokens)])
+
+
+class PromptPlan(BaseModel):
+    """
+    The size and cost of a request, computed before making it.
+    """
+
+    model: str
+    input_tokens: int
+    output_tokens: int
+    # In cents, like LLMClientResponse.cost
+    cost: float
+    # Whether the request fits in the model's context window and output limit
+    fits: bool
+
+
 class LLMClientResponse[T = str](BaseModel):
     content: T
     response_time: float
     provider: str
+    # The model that produced the response (a routing client may fail over to another one)
+    model: str = ""
     cost: float
+    input_tokens: int = 0
+    output_tokens: int = 0
+    # Served from the LLM response cache; nothing was spent on it, so its cost is 0
+    cached: bool = False
+
+
+class LLMClientStreamChunk(BaseModel):
+    delta: str = ""
+    # Only set on the final chunk of a stream, once the provider has reported usage
+    response: LLMClientResponse | None = None
 
 
 class LLMClient:
-    def __init__(self, model: Models, system_prompt: str, log_key: str | None = None):
+    def __init__(
+        self,
+        model: Models,
+        system_prompt: str,
+        log_key: str | None = None,
+        response_cache: LLMResponseCache | None = None,
+    ):
+        """
+        Responses are stored in and served from `response_cache` when one is given.
+        """
         self.model = model
         self.system_prompt = system_prompt
         self.provider = self._get_provider()
         self.client = self._get_client()
+        self.async_client = self._get_async_client()
+        self.concurrency_limit = PROVIDER_CONCURRENCY_LIMITS[self.provider]
+        self.rate_limiter = PROVIDER_RATE_LIMITERS[self.provider]
         self.instructor_client = instructor.from_openai(self.client)
         self.log_key = log_key
+        self.response_cache = response_cache
 
     def _get_provider(self):
         try:
@@ -206,90 +455,478 @@ class LLMClient:
         else:
             raise ValueError(f"Unknown provider: {provider}")
 
+    def _get_async_client(self):
+        provider = self.provider
+
+        if provider == "Google":
+            return ASYNC_GEMINI_CLIENT
+        elif provider == "OpenAI":
+            return ASYNC_OPENAI_CLIENT
+        elif provider == "OpenRouter":
+            return ASYNC_OPENROUTER_CLIENT
+        else:
+            raise ValueError(f"Unknown provider: {provider}")
+
     def generate_response(
         self, user_prompt: str, temp: float = 0.7
     ) -> LLMClientResponse:
+        cache_key = self._response_cache_key(user_prompt, temp)
+        if cached_response := self._get_cached_response(cache_key):
+            return cached_response
+
         start_time = time.time()
 
         try:
-            if self.model in {Models.GPT_5_NANO, Models.GPT_5_MINI, Models.GPT_5}:
-                # GPT-5 Nano and Mini use chat.completions with reasoning_effort
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {"role": "system", "content": self.system_prompt},
-                        {"role": "user", "content": user_prompt},
-                    ],
-                    reasoning_effort="medium",  # Enable medium reasoning effort for GPT-5 Nano and Mini
-                )
-            else:
-                # Other models use the standard chat.completions endpoint
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {"role": "system", "content": self.system_prompt},
-                        {"role": "user", "content": user_prompt},
-                    ],
-                    temperature=temp,
-                )
+            response = self._call_provider(
+                lambda: self.client.chat.completions.create(
+                    **self._chat_completion_params(user_prompt, temp)
+                ),
+                self._estimate_request_tokens(user_prompt),
+            )
+        except Exception as e:
+            LLM_ERRORS.labels(**self._metric_labels()).inc()
+            raise RuntimeError(f"Failed to generate response: {str(e)}")
+
+        return self._cache_response(
+            cache_key, self._to_response(response, time.time() - start_time)
+        )
+
+    async def agenerate_response(
+        self, user_prompt: str, temp: float = 0.7
+    ) -> LLMClientResponse:
+        """
+        Async variant of `generate_response` that doesn't hold a worker thread while waiting on the provider.
+        """
+        cache_key = self._response_cache_key(user_prompt, temp)
+        if cached_response := self._get_cached_response(cache_key):
+            return cached_response
+
+        start_time = time.time()
+
+        try:
+            response = await self._acall_provider(
+                lambda: self.async_client.chat.completions.create(
+                    **self._chat_completion_params(user_prompt, temp)
+                ),
+                self._estimate_request_tokens(user_prompt),
+            )
         except Exception as e:
+            LLM_ERRORS.labels(**self._metric_labels()).inc()
+            raise RuntimeError(f"Failed to generate response: {str(e)}")
+
+        return self._cache_response(
+            cache_key, self._to_response(response, time.time() - start_time)
+        )
+
+    async def astream_response(
+        self, user_prompt: str, temp: float = 0.7
+    ) -> AsyncIterator[LLMClientStreamChunk]:
+        """
+        Stream the response as it is generated. Every chunk carries a text delta; the final
+        chunk also carries the complete response with its usage and cost.
+        """
+        cache_key = self._response_cache_key(user_prompt, temp)
+        if cached_response := self._get_cached_response(cache_key):
+            yield LLMClientStreamChunk(delta=cached_response.content)
+            yield LLMClientStreamChunk(response=cached_response)
+            return
+
+        start_time = time.time()
+        estimated_tokens = self._estimate_request_tokens(user_prompt)
+        content = ""
+        usage = None
+
+        try:
+            for attempt in itertools.count():
+                await self.rate_limiter.aacquire(estimated_tokens)
+                retry_delay = None
+                try:
+                    async with self.concurrency_limit:
+                        try:
+                            stream = await self.async_client.chat.completions.create(
+                                **self._chat_completion_params(user_prompt, temp),
+                                stream=True,
+                                stream_options={"include_usage": True},
+                            )
+                        except RETRYABLE_ERRORS as e:
+                            retry_delay = self._before_retry(e, attempt)
+                        else:
+                            async for chunk in stream:
+                                if chunk.usage:
+                                    usage = chunk.usage
+                                if chunk.choices and chunk.choices[0].delta.content:
+                                    delta = chunk.choices[0].delta.content
+                                    content += delta
+                                    yield LLMClientStreamChunk(delta=delta)
+                finally:
+                    self.rate_limiter.reconcile(
+                        estimated_tokens,
+                        self._used_tokens(estimated_tokens, usage, bool(content)),
+                    )
+                if retry_delay is None:
+                    break
+                # Back off outside of the concurrency limit, so the slot serves other calls
+                await asyncio.sleep(retry_delay)
+        except Exception as e:
+            LLM_ERRORS.labels(**self._metric_labels()).inc()
             raise RuntimeError(f"Failed to generate response: {str(e)}")
 
         response_time = time.time() - start_time
 
-        content = response.choices[0].message.content
         if not content:
             raise RuntimeError("Failed to generate response")
 
-        usage = response.usage
         if not usage:
             raise RuntimeError("Response usage information is missing")
 
-        cost = (
-            (usage.prompt_tokens / 1_000_000)
-            * MODEL_REGISTRY[self.model]["cost_per_1M_input_tokens"]
-        ) + (
-            (usage.completion_tokens / 1_000_000)
-            * MODEL_REGISTRY[self.model]["cost_per_1M_output_tokens"]
+        yield LLMClientStreamChunk(
+            response=self._cache_response(
+                cache_key,
+                self._build_response(
+                    content,
+                    response_time,
+                    usage.prompt_tokens,
+                    usage.completion_tokens,
+                    kind="streamed response",
+                ),
+            )
         )
 
-        if self.log_key:
-            print(
-                f"[LLMClient] [{self.log_key}]: Took {response_time:.2f}s to generate response with {self.model} ({self.provider}) - {usage.prompt_tokens} input tokens, {usage.completion_tokens} output tokens costing ~${cost / 100:.4f} USD"
+    def generate_structured_response(
+        self, OutputSchema: Type[BaseModel], user_prompt: str, temp: float = 0.7
+    ) -> LLMClientResponse[BaseModel]:
+        self._ensure_structured_responses_supported()
+
+        cache_key = self._response_cache_key(user_prompt, temp, OutputSchema)
+        if cached_response := self._get_cached_response(cache_key, OutputSchema):
+            return cached_response
+
+        start_time = time.time()
+
+        try:
+            response = self._call_provider(
+                lambda: self.client.responses.parse(
+                    **self._structured_response_params(OutputSchema, user_prompt, temp)
+                ),
+                self._estimate_request_tokens(user_prompt),
             )
+        except Exception as e:
+            LLM_ERRORS.labels(**self._metric_labels()).inc()
+            raise RuntimeError(f"Failed to generate response: {str(e)}")
 
-        return LLMClientResponse(
-            content=content,
-            response_time=response_time,
-            provider=self.provider,
-            cost=cost,
+        return self._cache_response(
+            cache_key, self._to_structured_response(response, time.time() - start_time)
         )
 
-    def generate_structured_response(
+    async def agenerate_structured_response(
         self, OutputSchema: Type[BaseModel], user_prompt: str, temp: float = 0.7
     ) -> LLMClientResponse[BaseModel]:
+        """
+        Async variant of `generate_structured_response`.
+        """
+        self._ensure_structured_responses_supported()
+
+        cache_key = self._response_cache_key(user_prompt, temp, OutputSchema)
+        if cached_response := self._get_cached_response(cache_key, OutputSchema):
+            return cached_response
+
+        start_time = time.time()
+
+        try:
+            response = await self._acall_provider(
+                lambda: self.async_client.responses.parse(
+                    **self._structured_response_params(OutputSchema, user_prompt, temp)
+                ),
+                self._estimate_request_tokens(user_prompt),
+            )
+        except Exception as e:
+            LLM_ERRORS.labels(**self._metric_labels()).inc()
+            raise RuntimeError(f"Failed to generate response: {str(e)}")
+
+        return self._cache_response(
+            cache_key, self._to_structured_response(response, time.time() - start_time)
+        )
+
+    @cached_property
+    def system_prompt_tokens(self) -> int:
+        return count_tokens(self.system_prompt)
+
+    @property
+    def max_output_tokens(self) -> int:
+        return MODEL_REGISTRY[self.model]["max_output_tokens"]
+
+    def max_prompt_tokens(
+        self, expected_output_tokens: int = ESTIMATED_OUTPUT_TOKENS
+    ) -> int:
+        """
+        The number of user prompt tokens that fit in the model's context window, next to
+        the system prompt and the expected output.
+        """
+        return (
+            int(MODEL_REGISTRY[self.model]["context_window"] * CONTEXT_WINDOW_HEADROOM)
+            - self.system_prompt_tokens
+            - min(expected_output_tokens, self.max_output_tokens)
+        )
+
+    def plan_request(
+        self, user_prompt: str, expected_output_tokens: int = ESTIMATED_OUTPUT_TOKENS
+    ) -> PromptPlan:
+        """
+        Compute the size and cost of a request before making it, to shrink (or reroute)
+        prompts that would be rejected for their size.
+        """
+        prompt_tokens = count_tokens(user_prompt)
+        input_tokens = self.system_prompt_tokens + prompt_tokens
+        return PromptPlan(
+            model=str(self.model),
+            input_tokens=input_tokens,
+            output_tokens=expected_output_tokens,
+            cost=self._compute_cost(input_tokens, expected_output_tokens),
+            fits=prompt_tokens <= self.max_prompt_tokens(expected_output_tokens)
+            and expected_output_tokens <= self.max_output_tokens,
+        )
+
+    def _estimate_request_tokens(self, user_prompt: str) -> int:
+        return (
+            self.system_prompt_tokens
+            + count_tokens(user_prompt)
+            + ESTIMATED_OUTPUT_TOKENS
+        )
+
+    def _call_provider[R](self, call: Callable[[], R], estimated_tokens: int) -> R:
+        """
+        Make a call to the provider within its rate and concurrency limits, retrying it when
+        it fails with a 429, a connection error or a 5xx. Whatever happens, the tokens reserved
+        for each attempt are reconciled with what it actually used.
+        """
+        for attempt in itertools.count():
+            self.rate_limiter.acquire(estimated_tokens)
+            response = None
+            try:
+                with self.concurrency_limit:
+                    response = call()
+                return response
+            except RETRYABLE_ERRORS as e:
+                time.sleep(self._before_retry(e, attempt))
+            finally:
+                self.rate_limiter.reconcile(
+                    estimated_tokens,
+                    self._used_tokens(
+                        estimated_tokens, getattr(response, "usage", None), response
+                    ),
+                )
+
+    async def _acall_provider[R](
+        self, call: Callable[[], Awaitable[R]], estimated_tokens: int
+    ) -> R:
+        """
+        Async variant of `_call_provider`.
+        """
+        for attempt in itertools.count():
+            await self.rate_limiter.aacquire(estimated_tokens)
+            response = None
+            try:
+                async with self.concurrency_limit:
+                    response = await call()
+                return response
+            except RETRYABLE_ERRORS as e:
+                await asyncio.sleep(self._before_retry(e, attempt))
+            finally:
+                self.rate_limiter.reconcile(
+                    estimated_tokens,
+                    self._used_tokens(
+                        estimated_tokens, getattr(response, "usage", None), response
+                    ),
+                )
+
+    @staticmethod
+    def _used_tokens(estimated_tokens: int, usage, answered: object) -> int:
+        """
+        The tokens an attempt used: its reported usage, nothing if it failed before any
+        output, or the estimate when it produced output but no usage.
+        """
+        if usage is not None:
+            return getattr(usage, "total_tokens", None) or (
+                usage.prompt_tokens + usage.completion_tokens
+            )
+        return estimated_tokens if answered else 0
+
+    def _before_retry(self, error: Exception, attempt: int) -> float:
+        """
+        Prepare to retry a failed provider call, or re-raise its error once out of retries.
+        A 429 pauses the whole provider for its Retry-After (the returned delay is then 0,
+        as the rate limiter does the waiting), unless it is over LLM_MAX_RETRY_AFTER_SECONDS;
+        other errors back off for this call only.
+        """
+        if isinstance(error, RateLimitError):
+            # The rejected call doesn't count against the request budget
+            self.rate_limiter.release()
+            if attempt >= LLM_MAX_RATE_LIMIT_RETRIES:
+                raise error
+
+            delay = parse_retry_after(error.response.headers)
+            if delay is None:
+                delay = min(LLM_MAX_RETRY_AFTER_SECONDS, 2**attempt)
+            elif delay > LLM_MAX_RETRY_AFTER_SECONDS:
+                if self.log_key:
+                    print(
+                        f"[LLMClient] [{self.log_key}]: {self.provider} rate limited {self.model} for {delay:.0f}s, giving up"
+                    )
+                raise error
+            if self.log_key:
+                print(
+                    f"[LLMClient] [{self.log_key}]: {self.provider} rate limited {self.model}, retrying in {delay:.1f}s"
+                )
+            self.rate_limiter.pause(delay)
+            return 0
+
+        if attempt >= LLM_MAX_TRANSIENT_RETRIES:
+            raise error
+        delay = min(60, 0.5 * 2**attempt)
+        if self.log_key:
+            print(
+                f"[LLMClient] [{self.log_key}]: {self.model} ({self.provider}) failed, retrying in {delay:.1f}s: {error}"
+            )
+        return delay
+
+    def _chat_completion_params(self, user_prompt: str, temp: float) -> dict:
+        params = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": self.system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+        }
+
+        if self.model in {Models.GPT_5_NANO, Models.GPT_5_MINI, Models.GPT_5}:
+            # GPT-5 Nano and Mini use chat.completions with reasoning_effort
+            params["reasoning_effort"] = "medium"
+        else:
+            # Other models use the standard chat.completions endpoint
+            params["temperature"] = temp
+
+        return params
+
+    def _structured_response_params(
+        self, OutputSchema: Type[BaseModel], user_prompt: str, temp: float
+    ) -> dict:
+        return {
+            "model": self.model,
+            "input": [
+                {"role": "system", "content": self.system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            "temperature": temp,
+            "text_format": OutputSchema,
+        }
+
+    def _ensure_structured_responses_supported(self):
         if self.provider != "OpenAI":
             raise ValueError(
                 "Structured responses are only supported for OpenAI models."
             )
 
+    def _response_cache_key(
+        self,
+        user_prompt: str,
+        temp: float,
+        OutputSchema: Type[BaseModel] | None = None,
+    ) -> str | None:
+        if not self.response_cache:
+            return None
+
+        return make_llm_cache_key(
+            model=str(self.model),
+            system_prompt=self.system_prompt,
+            user_prompt=user_prompt,
+            temp=temp,
+            schema=OutputSchema.model_json_schema() if OutputSchema else None,
+        )
+
+    def _get_cached_response(
+        self, cache_key: str | None, OutputSchema: Type[BaseModel] | None = None
+    ) -> LLMClientResponse | None:
+        if not self.response_cache or not cache_key:
+            return None
+
         start_time = time.time()
+        cached = self.response_cache.get(cache_key)
+        if cached is None:
+            return None
 
-        try:
-            response = self.client.responses.parse(
-                model=self.model,
-                input=[
-                    {"role": "system", "content": self.system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                temperature=temp,
-                text_format=OutputSchema,
+        if self.log_key:
+            print(
+                f"[LLMClient] [{self.log_key}]: Served cached response for {self.model} ({self.provider})"
             )
-        except Exception as e:
-            raise RuntimeError(f"Failed to generate response: {str(e)}")
 
-        response_time = time.time() - start_time
+        response_class = (
+            LLMClientResponse[BaseModel] if OutputSchema else LLMClientResponse
+        )
+        return response_class(
+            content=(
+                OutputSchema.model_validate(cached["content"])
+                if OutputSchema
+                else cached["content"]
+            ),
+            response_time=time.time() - start_time,
+            provider=self.provider,
+            model=str(self.model),
+            cost=0.0,
+            input_tokens=cached["input_tokens"],
+            output_tokens=cached["output_tokens"],
+            cached=True,
+        )
+
+    def _cache_response[T](
+        self, cache_key: str | None, response: LLMClientResponse[T]
+    ) -> LLMClientResponse[T]:
+        if self.response_cache and cache_key:
+            self.response_cache.set(
+                cache_key,
+                {
+                    "content": (
+                        response.content.model_dump(mode="json")
+                        if isinstance(response.content, BaseModel)
+                        else response.content
+                    ),
+                    "input_tokens": response.input_tokens,
+                    "output_tokens": response.output_tokens,
+                },
+            )
+        return response
+
+    def _metric_labels(self) -> dict[str, str]:
+        return {"model": str(self.model), "log_key": self.log_key or ""}
+
+    def _compute_cost(self, input_tokens: int, output_tokens: int) -> float:
+        return (
+            (input_tokens / 1_000_000)
+            * MODEL_REGISTRY[self.model]["cost_per_1M_input_tokens"]
+        ) + (
+            (output_tokens / 1_000_000)
+            * MODEL_REGISTRY[self.model]["cost_per_1M_output_tokens"]
+        )
+
+    def _to_response(self, response, response_time: float) -> LLMClientResponse:
+        content = response.choices[0].message.content
+        if not content:
+            raise RuntimeError("Failed to generate response")
 
+        usage = response.usage
+        if not usage:
+            raise RuntimeError("Response usage information is missing")
+
+        return self._build_response(
+            content,
+            response_time,
+            usage.prompt_tokens,
+            usage.completion_tokens,
+            kind="response",
+        )
+
+    def _to_structured_response(
+        self, response, response_time: float
+    ) -> LLMClientResponse[BaseModel]:
         content = response.output_parsed
         if not content:
             raise RuntimeError("Failed to generate response")
@@ -298,22 +935,42 @@ class LLMClient:
         if not usage:
             raise RuntimeError("Response usage information is missing")
 
-        cost = (
-            (usage.input_tokens / 1_000_000)
-            * MODEL_REGISTRY[self.model]["cost_per_1M_input_tokens"]
-        ) + (
-            (usage.output_tokens / 1_000_000)
-            * MODEL_REGISTRY[self.model]["cost_per_1M_output_tokens"]
+        return self._build_response(
+            content,
+            response_time,
+            usage.input_tokens,
+            usage.output_tokens,
+            kind="structured response",
         )
 
+    def _build_response[T](
+        self,
+        content: T,
+        response_time: float,
+        input_tokens: int,
+        output_tokens: int,
+        kind: str,
+    ) -> LLMClientResponse[T]:
+        cost = self._compute_cost(input_tokens, output_tokens)
+
+        labels = self._metric_labels()
+        LLM_REQUEST_DURATION_SECONDS.labels(**labels).observe(response_time)
+        LLM_TOKENS.labels(direction="input", **labels).inc(input_tokens)
+        LLM_TOKENS.labels(direction="output", **labels).inc(output_tokens)
+        # Costs are computed in cents
+        LLM_COST_USD.labels(**labels).inc(cost / 100)
+
         if self.log_key:
             print(
-                f"[LLMClient] [{self.log_key}]: Took {response_time:.2f}s to generate structured response with {self.model} ({self.provider}) - {usage.input_tokens} input tokens, {usage.output_tokens} output tokens costing ~${cost / 100:.4f} USD"
+                f"[LLMClient] [{self.log_key}]: Took {response_time:.2f}s to generate {kind} with {self.model} ({self.provider}) - {input_tokens} input tokens, {output_tokens} output tokens costing ~${cost / 100:.4f} USD"
             )
 
-        return LLMClientResponse[BaseModel](
+        return LLMClientResponse[T](
             content=content,
             response_time=response_time,
             provider=self.provider,
+            model=str(self.model),
             cost=cost,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
         )
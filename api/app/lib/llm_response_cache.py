@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any
+
+
+def make_llm_cache_key(
+    model: str,
+    system_prompt: str,
+    user_prompt: str,
+    temp: float,
+    schema: dict[str, Any] | None = None,
+) -> str:
+    """
+    Hash everything that determines an LLM response: the model, both prompts, the temperature
+    and (for structured responses) the JSON schema of the output.
+    """
+    payload = json.dumps(
+        {
+            "model": model,
+            "system_prompt": system_prompt,
+            "user_prompt": user_prompt,
+            "temp": temp,
+            "schema": schema,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    A persistent SQLite-backed cache of LLM responses, evicting the least recently used ones
+    once their total size goes over `max_size_bytes`. Entries never expire otherwise: the
+    same inputs are expected to produce an equally good response.
+    """
+
+    def __init__(self, path: str, max_size_bytes: int):
+        self.path = path
+        self.max_size_bytes = max_size_bytes
+        self.hits = 0
+        self.misses = 0
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._connection.commit()
+
+    @classmethod
+    def from_env(cls) -> "LLMResponseCache | None":
+        """
+        Build a cache configured through the LLM_CACHE_PATH and LLM_CACHE_MAX_SIZE_MB
+        environment variables. The cache is opt-in: returns None unless LLM_CACHE_ENABLED
+        is set to a true value.
+        """
+        if os.environ.get("LLM_CACHE_ENABLED", "").lower() not in {"1", "true", "yes"}:
+            return None
+
+        return cls(
+            path=os.environ.get(
+                "LLM_CACHE_PATH", os.path.join("cache", "llm_responses.db")
+            ),
+            max_size_bytes=int(os.environ.get("LLM_CACHE_MAX_SIZE_MB", "100"))
+            * 1024
+            * 1024,
+        )
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self._connection.execute(
+                "UPDATE responses SET last_accessed_at = ? WHERE key = ?",
+                (time.time(), key),
+            )
+            self._connection.commit()
+            self.hits += 1
+            return json.loads(row[0])
+
+    def set(self, key: str, value: dict[str, Any]):
+        now = time.time()
+        serialized = json.dumps(value)
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created_at, last_accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, serialized, len(serialized.encode()), now, now),
+            )
+            self._evict()
+            self._connection.commit()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            entries, size = self._connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "size_bytes": size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _evict(self):
+        # Keep the most recently used entries that fit in the size budget
+        self._connection.execute(
+            """
+            DELETE FROM responses WHERE key IN (
+                SELECT key FROM (
+                    SELECT key, SUM(size) OVER (
+                        ORDER BY last_accessed_at DESC, created_at DESC
+                    ) AS total_size
+                    FROM responses
+                )
+                WHERE total_size > ?
+            )
+            """,
+            (self.max_size_bytes,),
+        )
+
+
+# Process-wide LLM response cache, or None when it is disabled
+LLM_RESPONSE_CACHE = LLMResponseCache.from_env()
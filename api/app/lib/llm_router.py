@@ -0,0 +1,471 @@
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import AsyncIterator, Awaitable, Callable, Type
+
+from pydantic import BaseModel
+
+from app.lib.llm_client import (
+    ESTIMATED_OUTPUT_TOKENS,
+    LLMClient,
+    LLMClientResponse,
+    LLMClientStreamChunk,
+    Models,
+    PromptPlan,
+    count_tokens,
+)
+from app.lib.llm_response_cache import LLMResponseCache
+from app.lib.metrics import LLM_FAILOVERS, LLM_HEDGED_REQUESTS
+
+# A model needs this many recent samples before its error rate or latency is trusted
+MIN_HEALTH_SAMPLES = 5
+# Models failing more often than this are tried after the healthy ones
+MAX_ERROR_RATE = 0.5
+# Weight of the newest sample in a model's average latency
+LATENCY_EWMA_ALPHA = 0.3
+# Healthy models slower on average than this multiple of the fastest one are tried after it
+SLOW_MODEL_LATENCY_RATIO = 1.5
+
+
+class ModelHealth:
+    """
+    The latency and outcome of the recent requests to a model, within a rolling time window.
+    A model that stops getting requests (e.g. because it was demoted) forgets its failures
+    once they fall out of the window, so it is tried again first.
+    """
+
+    def __init__(self, window_seconds: float, max_samples: int = 200):
+        self.window_seconds = window_seconds
+        self._lock = threading.Lock()
+        # (timestamp, latency in seconds, succeeded)
+        self._samples: deque[tuple[float, float, bool]] = deque(maxlen=max_samples)
+
+    def record(self, latency: float, ok: bool):
+        with self._lock:
+            self._samples.append((time.monotonic(), latency, ok))
+
+    def _recent(self) -> list[tuple[float, float, bool]]:
+        with self._lock:
+            cutoff = time.monotonic() - self.window_seconds
+            while self._samples and self._samples[0][0] < cutoff:
+                self._samples.popleft()
+            return list(self._samples)
+
+    def error_rate(self) -> float | None:
+        samples = self._recent()
+        if len(samples) < MIN_HEALTH_SAMPLES:
+            return None
+        return sum(1 for _, _, ok in samples if not ok) / len(samples)
+
+    def latency_p95(self) -> float | None:
+        latencies = sorted(latency for _, latency, ok in self._recent() if ok)
+        if len(latencies) < MIN_HEALTH_SAMPLES:
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+
+    def latency_ewma(self) -> float | None:
+        """
+        The exponentially weighted moving average of the recent successful latencies, which
+        follows a model slowing down sooner than a plain average would.
+        """
+        latencies = [latency for _, latency, ok in self._recent() if ok]
+        if len(latencies) < MIN_HEALTH_SAMPLES:
+            return None
+        average = latencies[0]
+        for latency in latencies[1:]:
+            average += LATENCY_EWMA_ALPHA * (latency - average)
+        return average
+
+    def degraded(self) -> bool:
+        error_rate = self.error_rate()
+        return error_rate is not None and error_rate > MAX_ERROR_RATE
+
+
+# Process-wide health of every model per stage (its `log_key`), shared by the routing clients
+# of that stage. Stages are kept apart because their latencies differ widely: a long
+# article-to-markdown call must not be hedged against the p95 of short summary calls.
+MODEL_HEALTH: dict[tuple[Models, str | None], ModelHealth] = {}
+_MODEL_HEALTH_LOCK = threading.Lock()
+
+
+def get_model_health(model: Models, log_key: str | None) -> ModelHealth:
+    with _MODEL_HEALTH_LOCK:
+        health = MODEL_HEALTH.get((model, log_key))
+        if health is None:
+            health = MODEL_HEALTH[(model, log_key)] = ModelHealth(
+                window_seconds=float(os.environ.get("LLM_ROUTER_WINDOW_SECONDS", "300"))
+            )
+        return health
+
+
+# Runs the requests of hedged sync calls, so the caller can wait on two of them at once
+ROUTER_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("LLM_ROUTER_MAX_WORKERS", "64")),
+    thread_name_prefix="llm-router",
+)
+
+
+class RoutingLLMClient(LLMClient):
+    """
+    An LLMClient that spreads requests over an ordered list of equivalent `models`, possibly
+    from different providers. Each request goes to the first healthy model and fails over to
+    the next one when it errors; models with a high recent error rate are tried last, and
+    healthy models that have recently been much slower than the fastest one come after it.
+
+    With `hedge` (off by default), a request that is still running after the p95 latency of
+    its model in this stage (and at least `min_hedge_delay` seconds) is duplicated on the next
+    model, and whichever answers first wins. Hedging pays for a second call on up to ~5% of
+    requests (more during a brownout): async callers cancel the losing request, but sync
+    callers can't, so it runs to completion and is billed (its response still warms the
+    response cache).
+
+    Prompts too large for a model's context window skip it, so a larger-context model in the
+    list takes them instead.
+
+    `model` and `provider` are those of the first model, so the result cache fingerprint only
+    changes when the preferred model does.
+    """
+
+    def __init__(
+        self,
+        models: list[Models],
+        system_prompt: str,
+        log_key: str | None = None,
+        response_cache: LLMResponseCache | None = None,
+        hedge: bool | None = None,
+        min_hedge_delay: float | None = None,
+    ):
+        if not models:
+            raise ValueError("A routing client needs at least one model")
+
+        super().__init__(
+            model=models[0],
+            system_prompt=system_prompt,
+            log_key=log_key,
+            response_cache=response_cache,
+        )
+        self.clients = [
+            LLMClient(
+                model=model,
+                system_prompt=system_prompt,
+                log_key=log_key,
+                response_cache=response_cache,
+            )
+            for model in models
+        ]
+        self.hedge = (
+            hedge
+            if hedge is not None
+            else os.environ.get("LLM_HEDGING_ENABLED", "false").lower() == "true"
+        )
+        self.min_hedge_delay = (
+            min_hedge_delay
+            if min_hedge_delay is not None
+            else float(os.environ.get("LLM_HEDGE_MIN_DELAY_SECONDS", "1"))
+        )
+
+    def generate_response(
+        self, user_prompt: str, temp: float = 0.7
+    ) -> LLMClientResponse:
+        return self._route(
+            self._ordered_clients(user_prompt),
+            lambda client: client.generate_response(user_prompt, temp),
+        )
+
+    async def agenerate_response(
+        self, user_prompt: str, temp: float = 0.7
+    ) -> LLMClientResponse:
+        return await self._aroute(
+            self._ordered_clients(user_prompt),
+            lambda client: client.agenerate_response(user_prompt, temp),
+        )
+
+    async def astream_response(
+        self, user_prompt: str, temp: float = 0.7
+    ) -> AsyncIterator[LLMClientStreamChunk]:
+        """
+        Streams fail over only until their first delta; once text has been sent, a failure
+        is raised as is. They are never hedged.
+        """
+        clients = self._ordered_clients(user_prompt)
+        errors = []
+        for i, client in enumerate(clients):
+            start_time = time.time()
+            started = False
+            try:
+                async for chunk in client.astream_response(user_prompt, temp):
+                    if chunk.response and not chunk.response.cached:
+                        self._health(client).record(time.time() - start_time, ok=True)
+                    started = started or bool(chunk.delta)
+                    yield chunk
+                return
+            except Exception as e:
+                self._health(client).record(time.time() - start_time, ok=False)
+                if started:
+                    raise
+                errors.append(f"{client.model}: {e}")
+                if i < len(clients) - 1:
+                    self._log_failover(client, e)
+
+        raise RuntimeError(f"Every model failed: {'; '.join(errors)}")
+
+    def generate_structured_response(
+        self, OutputSchema: Type[BaseModel], user_prompt: str, temp: float = 0.7
+    ) -> LLMClientResponse[BaseModel]:
+        return self._route(
+            self._structured_clients(user_prompt),
+            lambda client: client.generate_structured_response(
+                OutputSchema, user_prompt, temp
+            ),
+        )
+
+    async def agenerate_structured_response(
+        self, OutputSchema: Type[BaseModel], user_prompt: str, temp: float = 0.7
+    ) -> LLMClientResponse[BaseModel]:
+        return await self._aroute(
+            self._structured_clients(user_prompt),
+            lambda client: client.agenerate_structured_response(
+                OutputSchema, user_prompt, temp
+            ),
+        )
+
+    @property
+    def max_output_tokens(self) -> int:
+        # Any of the models may end up answering
+        return min(client.max_output_tokens for client in self.clients)
+
+    def max_prompt_tokens(
+        self, expected_output_tokens: int = ESTIMATED_OUTPUT_TOKENS
+    ) -> int:
+        # Prompts too large for some models are routed to the others
+        return max(
+            client.max_prompt_tokens(expected_output_tokens) for client in self.clients
+        )
+
+    def plan_request(
+        self, user_prompt: str, expected_output_tokens: int = ESTIMATED_OUTPUT_TOKENS
+    ) -> PromptPlan:
+        plans = [
+            client.plan_request(user_prompt, expected_output_tokens)
+            for client in self._ordered_clients(user_prompt)
+        ]
+        return next((plan for plan in plans if plan.fits), plans[0])
+
+    def _ordered_clients(self, user_prompt: str) -> list[LLMClient]:
+        """
+        The models to try for a prompt: healthy models first, by average latency, then the
+        degraded ones. Models within SLOW_MODEL_LATENCY_RATIO of the fastest healthy model,
+        or without enough samples to tell, keep the configured order (sorted() is stable).
+        Models whose context window is too small for the prompt are left out (unless none is
+        large enough, in which case the providers get to decide).
+        """
+        healths = {client.model: self._health(client) for client in self.clients}
+        degraded = {model: health.degraded() for model, health in healths.items()}
+        latencies = {
+            model: health.latency_ewma()
+            for model, health in healths.items()
+            if not degraded[model]
+        }
+        fastest = min(
+            (latency for latency in latencies.values() if latency is not None),
+            default=None,
+        )
+
+        def rank(client: LLMClient) -> tuple[bool, float]:
+            latency = latencies.get(client.model)
+            if degraded[client.model] or latency is None or fastest is None:
+                return degraded[client.model], 0.0
+            return (
+                False,
+                latency if latency > fastest * SLOW_MODEL_LATENCY_RATIO else 0.0,
+            )
+
+        clients = sorted(self.clients, key=rank)
+        prompt_tokens = count_tokens(user_prompt)
+        return [
+            client for client in clients if prompt_tokens <= client.max_prompt_tokens()
+        ] or clients
+
+    def _structured_clients(self, user_prompt: str) -> list[LLMClient]:
+        clients = [
+            client
+            for client in self._ordered_clients(user_prompt)
+            if client.provider == "OpenAI"
+        ]
+        if not clients:
+            raise ValueError(
+                "Structured responses are only supported for OpenAI models."
+            )
+        return clients
+
+    def _health(self, client: LLMClient) -> ModelHealth:
+        return get_model_health(client.model, self.log_key)
+
+    def _hedge_delay(self, client: LLMClient) -> float | None:
+        if not self.hedge:
+            return None
+        p95 = self._health(client).latency_p95()
+        return max(self.min_hedge_delay, p95) if p95 is not None else None
+
+    def _attempt[R: LLMClientResponse](
+        self, client: LLMClient, call: Callable[[LLMClient], R]
+    ) -> R:
+        start_time = time.time()
+        try:
+            response = call(client)
+        except Exception:
+            self._health(client).record(time.time() - start_time, ok=False)
+            raise
+        if not response.cached:
+            self._health(client).record(time.time() - start_time, ok=True)
+        return response
+
+    async def _aattempt[R: LLMClientResponse](
+        self, client: LLMClient, call: Callable[[LLMClient], Awaitable[R]]
+    ) -> R:
+        start_time = time.time()
+        try:
+            response = await call(client)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self._health(client).record(time.time() - start_time, ok=False)
+            raise
+        if not response.cached:
+            self._health(client).record(time.time() - start_time, ok=True)
+        return response
+
+    def _route[R: LLMClientResponse](
+        self, clients: list[LLMClient], call: Callable[[LLMClient], R]
+    ) -> R:
+        if not self.hedge:
+            errors = []
+            for i, client in enumerate(clients):
+                try:
+                    return self._attempt(client, call)
+                except Exception as e:
+                    errors.append(f"{client.model}: {e}")
+                    if i < len(clients) - 1:
+                        self._log_failover(client, e)
+            raise RuntimeError(f"Every model failed: {'; '.join(errors)}")
+
+        remaining = list(clients)
+        pending: dict[Future[R], LLMClient] = {}
+        errors = []
+        hedged: LLMClient | None = None
+
+        def launch():
+            client = remaining.pop(0)
+            future = ROUTER_EXECUTOR.submit(
+                contextvars.copy_context().run, self._attempt, client, call
+            )
+            pending[future] = client
+
+        launch()
+        while pending:
+            delay = None
+            if remaining and hedged is None and len(pending) == 1:
+                delay = self._hedge_delay(next(iter(pending.values())))
+
+            done, _ = wait(pending, timeout=delay, return_when=FIRST_COMPLETED)
+            if not done:
+                hedged = next(iter(pending.values()))
+                self._log_hedge(hedged, delay)
+                launch()
+                continue
+
+            for future in done:
+                client = pending.pop(future)
+                try:
+                    response = future.result()
+                except Exception as e:
+                    errors.append(f"{client.model}: {e}")
+                    if pending or remaining:
+                        self._log_failover(client, e)
+                    continue
+                self._record_hedge_winner(hedged, client)
+                return response
+
+            if not pending and remaining:
+                launch()
+
+        self._record_hedge_winner(hedged, None)
+        raise RuntimeError(f"Every model failed: {'; '.join(errors)}")
+
+    async def _aroute[R: LLMClientResponse](
+        self, clients: list[LLMClient], call: Callable[[LLMClient], Awaitable[R]]
+    ) -> R:
+        remaining = list(clients)
+        pending: dict[asyncio.Task[R], LLMClient] = {}
+        errors = []
+        hedged: LLMClient | None = None
+
+        def launch():
+            client = remaining.pop(0)
+            pending[asyncio.create_task(self._aattempt(client, call))] = client
+
+        launch()
+        try:
+            while pending:
+                delay = None
+                if remaining and hedged is None and len(pending) == 1:
+                    delay = self._hedge_delay(next(iter(pending.values())))
+
+                done, _ = await asyncio.wait(
+                    pending, timeout=delay, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    hedged = next(iter(pending.values()))
+                    self._log_hedge(hedged, delay)
+                    launch()
+                    continue
+
+                for task in done:
+                    client = pending.pop(task)
+                    try:
+                        response = task.result()
+                    except Exception as e:
+                        errors.append(f"{client.model}: {e}")
+                        if pending or remaining:
+                            self._log_failover(client, e)
+                        continue
+                    self._record_hedge_winner(hedged, client)
+                    return response
+
+                if not pending and remaining:
+                    launch()
+        finally:
+            # The losing (or abandoned) requests are no longer needed
+            for task in pending:
+                task.cancel()
+
+        self._record_hedge_winner(hedged, None)
+        raise RuntimeError(f"Every model failed: {'; '.join(errors)}")
+
+    def _log_failover(self, client: LLMClient, error: Exception):
+        LLM_FAILOVERS.labels(model=str(client.model), log_key=self.log_key or "").inc()
+        if self.log_key:
+            print(
+                f"[LLMRouter] [{self.log_key}]: {client.model} failed, failing over to the next model: {error}"
+            )
+
+    def _log_hedge(self, client: LLMClient, delay: float | None):
+        if self.log_key:
+            print(
+                f"[LLMRouter] [{self.log_key}]: {client.model} still running after {delay:.2f}s, hedging on the next model"
+            )
+
+    def _record_hedge_winner(self, hedged: LLMClient | None, winner: LLMClient | None):
+        if hedged is None:
+            return
+        LLM_HEDGED_REQUESTS.labels(
+            model=str(hedged.model),
+            log_key=self.log_key or "",
+            winner=(
+                "none" if winner is None else "primary" if winner is hedged else "hedge"
+            ),
+        ).inc()
@@ -0,0 +1,211 @@
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+# Latency buckets (in seconds) wide enough for both a cache hit and a long Whisper run
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+    300.0,
+    600.0,
+)
+
+PROMETHEUS_CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+
+class CacheStatsCollector(Collector):
+    """
+    Exposes the hit and miss counters that the caches keep themselves, read on every scrape.
+    Caches are added with a function returning their (hits, misses).
+    """
+
+    def __init__(self):
+        self._caches: dict[str, Callable[[], tuple[int, int]]] = {}
+
+    def add(self, cache: str, stats: Callable[[], tuple[int, int]]):
+        self._caches[cache] = stats
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        hits = GaugeMetricFamily(
+            "smrz_cache_hits", "Cache hits since the process started.", labels=["cache"]
+        )
+        misses = GaugeMetricFamily(
+            "smrz_cache_misses",
+            "Cache misses since the process started.",
+            labels=["cache"],
+        )
+        hit_ratio = GaugeMetricFamily(
+            "smrz_cache_hit_ratio",
+            "Share of cache lookups that were hits since the process started.",
+            labels=["cache"],
+        )
+        for cache, stats in self._caches.items():
+            cache_hits, cache_misses = stats()
+            lookups = cache_hits + cache_misses
+            hits.add_metric([cache], cache_hits)
+            misses.add_metric([cache], cache_misses)
+            hit_ratio.add_metric([cache], cache_hits / lookups if lookups else 0.0)
+        yield hits
+        yield misses
+        yield hit_ratio
+
+
+# Process-wide metrics registry and the metrics shared across modules
+METRICS = CollectorRegistry()
+
+STAGE_DURATION_SECONDS = Histogram(
+    "smrz_stage_duration_seconds",
+    "Time spent in each pipeline stage (and in the timed steps inside them).",
+    ("stage",),
+    buckets=DEFAULT_BUCKETS,
+    registry=METRICS,
+)
+STAGE_ERRORS = Counter(
+    "smrz_stage_errors_total",
+    "Pipeline stages that raised an error.",
+    ("stage",),
+    registry=METRICS,
+)
+LLM_REQUEST_DURATION_SECONDS = Histogram(
+    "smrz_llm_request_duration_seconds",
+    "Time taken by LLM requests that reached the provider.",
+    ("model", "log_key"),
+    buckets=DEFAULT_BUCKETS,
+    registry=METRICS,
+)
+LLM_TOKENS = Counter(
+    "smrz_llm_tokens_total",
+    "Tokens used by LLM requests, by direction (input or output).",
+    ("model", "log_key", "direction"),
+    registry=METRICS,
+)
+LLM_COST_USD = Counter(
+    "smrz_llm_cost_usd_total",
+    "Estimated cost of LLM requests in USD, from the MODEL_REGISTRY pricing.",
+    ("model", "log_key"),
+    registry=METRICS,
+)
+LLM_ERRORS = Counter(
+    "smrz_llm_errors_total",
+    "LLM requests that failed.",
+    ("model", "log_key"),
+    registry=METRICS,
+)
+LLM_FAILOVERS = Counter(
+    "smrz_llm_failovers_total",
+    "LLM requests retried on the next model of a routing client after a failure.",
+    ("model", "log_key"),
+    registry=METRICS,
+)
+LLM_HEDGED_REQUESTS = Counter(
+    "smrz_llm_hedged_requests_total",
+    "Hedged LLM requests, by the model that was hedged and which request won.",
+    ("model", "log_key", "winner"),
+    registry=METRICS,
+)
+LLM_RATE_LIMIT_QUEUE_DEPTH = Gauge(
+    "smrz_llm_rate_limit_queue_depth",
+    "LLM requests waiting for their provider's client-side rate limit.",
+    ("provider",),
+    registry=METRICS,
+)
+LLM_RATE_LIMITED = Counter(
+    "smrz_llm_rate_limited_total",
+    "LLM requests rejected by the provider with a 429 (and retried after a pause).",
+    ("provider",),
+    registry=METRICS,
+)
+HTTP_REQUEST_DURATION_SECONDS = Histogram(
+    "smrz_http_request_duration_seconds",
+    "Time taken to produce the response headers of each API request.",
+    ("method", "route", "status"),
+    buckets=DEFAULT_BUCKETS,
+    registry=METRICS,
+)
+
+
+# Hit and miss counters of the caches, added by app.routes
+CACHE_STATS = CacheStatsCollector()
+METRICS.register(CACHE_STATS)
+
+
+def render_metrics() -> bytes:
+    """
+    Render every metric in the Prometheus text exposition format.
+    """
+    return generate_latest(METRICS)
+
+
+# The Server-Timing entries of the API request being handled, if any. The list is shared
+# (not copied) with the threads and tasks that inherit the request's context.
+_SERVER_TIMINGS: contextvars.ContextVar[list[tuple[str, float]] | None] = (
+    contextvars.ContextVar("server_timings", default=None)
+)
+
+
+@contextmanager
+def collect_server_timings() -> Iterator[list[tuple[str, float]]]:
+    """
+    Collect the timings recorded while handling a request, as (name, seconds) pairs.
+    """
+    timings: list[tuple[str, float]] = []
+    token = _SERVER_TIMINGS.set(timings)
+    try:
+        yield timings
+    finally:
+        _SERVER_TIMINGS.reset(token)
+
+
+def record_timing(name: str, seconds: float):
+    """
+    Record the time spent in a pipeline stage or step, both in the stage histogram and in
+    the Server-Timing header of the current request.
+    """
+    STAGE_DURATION_SECONDS.labels(stage=name).observe(seconds)
+    timings = _SERVER_TIMINGS.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+
+@contextmanager
+def timed(name: str) -> Iterator[None]:
+    """
+    Time the enclosed block with `record_timing`, counting an error for it if it raises.
+    """
+    start_time = time.time()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.labels(stage=name).inc()
+        raise
+    finally:
+        record_timing(name, time.time() - start_time)
+
+
+def format_server_timing(timings: list[tuple[str, float]]) -> str:
+    # Server-Timing durations are in milliseconds; repeated names are all kept
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings)
@@ -0,0 +1,181 @@
+import asyncio
+import email.utils
+import os
+import threading
+import time
+
+from app.lib.metrics import LLM_RATE_LIMIT_QUEUE_DEPTH, LLM_RATE_LIMITED
+
+
+class TokenBucket:
+    """
+    A budget of `per_minute` units refilled continuously, holding at most a minute's worth.
+    Its level can go negative: the units taken beyond it are a debt that delays later callers.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def take(self, amount: float, now: float) -> float:
+        """
+        Take `amount` units and return the (monotonic) time at which the budget covers them.
+        """
+        self.give(0, now)
+        self.level -= amount
+        return now if self.level >= 0 else now + -self.level / self.rate
+
+    def give(self, amount: float, now: float):
+        self.level = min(
+            self.capacity, self.level + amount + (now - self.updated) * self.rate
+        )
+        self.updated = now
+
+
+class RateLimiter:
+    """
+    A client-side requests-per-minute and tokens-per-minute budget for a provider, usable from
+    threads (`acquire`) and coroutines (`aacquire`). Every call reserves its share of the budget
+    as soon as it arrives, so callers are served in arrival order, then waits until the budget
+    covers it. `pause` holds every caller back, e.g. for the Retry-After of a 429 response.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: float | None = None,
+        tokens_per_minute: float | None = None,
+    ):
+        self.name = name
+        self._lock = threading.Lock()
+        self._requests = (
+            TokenBucket(requests_per_minute) if requests_per_minute else None
+        )
+        self._tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._paused_until = 0.0
+        self._waiting = 0
+
+    @classmethod
+    def from_env(cls, provider: str) -> "RateLimiter":
+        """
+        Build the limiter of a provider from LLM_REQUESTS_PER_MINUTE and LLM_TOKENS_PER_MINUTE,
+        or their per-provider overrides (e.g. LLM_TOKENS_PER_MINUTE_OPENAI). Both are unlimited
+        by default.
+        """
+
+        def per_minute(name: str) -> float | None:
+            value = os.environ.get(f"{name}_{provider.upper()}", os.environ.get(name))
+            return float(value) if value else None
+
+        return cls(
+            provider,
+            requests_per_minute=per_minute("LLM_REQUESTS_PER_MINUTE"),
+            tokens_per_minute=per_minute("LLM_TOKENS_PER_MINUTE"),
+        )
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        The number of callers currently waiting for the budget.
+        """
+        return self._waiting
+
+    def acquire(self, tokens: int = 0):
+        ready = self._reserve(tokens)
+        if self._delay(ready) <= 0:
+            return
+
+        self._set_waiting(1)
+        try:
+            while (delay := self._delay(ready)) > 0:
+                time.sleep(delay)
+        finally:
+            self._set_waiting(-1)
+
+    async def aacquire(self, tokens: int = 0):
+        ready = self._reserve(tokens)
+        if self._delay(ready) <= 0:
+            return
+
+        self._set_waiting(1)
+        try:
+            while (delay := self._delay(ready)) > 0:
+                await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            # The call will not be made; hand its share back to the callers behind it
+            self.release(tokens)
+            raise
+        finally:
+            self._set_waiting(-1)
+
+    def release(self, tokens: int = 0):
+        """
+        Give back the share of a call that was never made (e.g. one rejected with a 429).
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._requests:
+                self._requests.give(1, now)
+            if self._tokens:
+                self._tokens.give(tokens, now)
+
+    def reconcile(self, estimated_tokens: int, actual_tokens: int):
+        """
+        Correct the tokens reserved for a call with the usage the provider reported.
+        """
+        if not self._tokens:
+            return
+        with self._lock:
+            self._tokens.give(estimated_tokens - actual_tokens, time.monotonic())
+
+    def pause(self, seconds: float):
+        LLM_RATE_LIMITED.labels(provider=self.name).inc()
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _reserve(self, tokens: int) -> float:
+        with self._lock:
+            now = time.monotonic()
+            ready = now
+            if self._requests:
+                ready = max(ready, self._requests.take(1, now))
+            if self._tokens:
+                ready = max(ready, self._tokens.take(tokens, now))
+            return ready
+
+    def _delay(self, ready: float) -> float:
+        with self._lock:
+            return max(ready, self._paused_until) - time.monotonic()
+
+    def _set_waiting(self, change: int):
+        with self._lock:
+            self._waiting += change
+            LLM_RATE_LIMIT_QUEUE_DEPTH.labels(provider=self.name).set(self._waiting)
+
+
+def parse_retry_after(headers) -> float | None:
+    """
+    Read how long to wait from the Retry-After (seconds or HTTP date) or the OpenAI-specific
+    retry-after-ms header of a response.
+    """
+    if value := headers.get("retry-after-ms"):
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(
+            0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time()
+        )
+    except (TypeError, ValueError):
+        return None
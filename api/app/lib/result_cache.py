@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import urllib.parse
+from typing import Any
+
+from app.lib.llm_client import LLMClient
+from app.utils import is_youtube_url, parse_youtube_video_id
+
+# Bump this whenever a change to the pipeline changes its output for the same inputs,
+# so that results produced by an older pipeline are no longer served from the cache.
+PIPELINE_VERSION = "7"
+
+# Query parameters that never change the content behind a URL
+TRACKING_QUERY_PARAMS = {"fbclid", "gclid", "mc_cid", "mc_eid", "ref", "ref_src"}
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normalize a URL so that trivially different links to the same content share a cache entry.
+    YouTube URLs are collapsed to their video ID.
+    """
+    if is_youtube_url(url):
+        return f"youtube:{parse_youtube_video_id(url)}"
+
+    parts = urllib.parse.urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    if (scheme, parts.port) in {("http", 80), ("https", 443)}:
+        netloc = netloc.rsplit(":", 1)[0]
+
+    path = parts.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+
+    query = urllib.parse.urlencode(
+        sorted(
+            (key, value)
+            for key, value in urllib.parse.parse_qsl(
+                parts.query, keep_blank_values=True
+            )
+            if not key.startswith("utm_") and key not in TRACKING_QUERY_PARAMS
+        )
+    )
+
+    return urllib.parse.urlunsplit((scheme, netloc, path, query, ""))
+
+
+def pipeline_fingerprint(llm_clients: list[LLMClient]) -> str:
+    """
+    Hash the pipeline version together with the model and system prompt of every LLM stage.
+    """
+    payload = json.dumps(
+        {
+            "pipeline_version": PIPELINE_VERSION,
+            "stages": [
+                {"model": str(client.model), "system_prompt": client.system_prompt}
+                for client in llm_clients
+            ],
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def make_cache_key(
+    url: str, llm_clients: list[LLMClient], options: dict[str, Any] | None = None
+) -> str:
+    """
+    Build a content-addressed cache key from the normalized URL, the pipeline fingerprint
+    and the per-request pipeline options.
+    """
+    return hashlib.sha256(
+        f"{normalize_url(url)}|{pipeline_fingerprint(llm_clients)}|{json.dumps(options or {}, sort_keys=True)}".encode()
+    ).hexdigest()
+
+
+class ResultCache:
+    """
+    A persistent SQLite-backed cache of pipeline results with TTL and LRU eviction.
+    """
+
+    def __init__(self, path: str, ttl_seconds: int, max_entries: int):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._connection.commit()
+
+    @classmethod
+    def from_env(cls) -> "ResultCache":
+        """
+        Build a cache configured through the SMRZ_CACHE_PATH, SMRZ_CACHE_TTL_SECONDS and
+        SMRZ_CACHE_MAX_ENTRIES environment variables.
+        """
+        return cls(
+            path=os.environ.get("SMRZ_CACHE_PATH", os.path.join("cache", "results.db")),
+            ttl_seconds=int(
+                os.environ.get("SMRZ_CACHE_TTL_SECONDS", "604800")
+            ),  # 7 days
+            max_entries=int(os.environ.get("SMRZ_CACHE_MAX_ENTRIES", "1000")),
+        )
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value, created_at FROM results WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._connection.execute(
+                        "DELETE FROM results WHERE key = ?", (key,)
+                    )
+                    self._connection.commit()
+                self.misses += 1
+                return None
+
+            self._connection.execute(
+                "UPDATE results SET last_accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._connection.commit()
+            self.hits += 1
+            return json.loads(row[0])
+
+    def set(self, key: str, url: str, value: dict[str, Any]):
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO results (key, url, value, created_at, last_accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, url, json.dumps(value), now, now),
+            )
+            self._evict(now)
+            self._connection.commit()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            (entries,) = self._connection.execute(
+                "SELECT COUNT(*) FROM results"
+            ).fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _evict(self, now: float):
+        # Drop expired entries first, then the least recently used ones above the size limit
+        self._connection.execute(
+            "DELETE FROM results WHERE created_at < ?", (now - self.ttl_seconds,)
+        )
+        self._connection.execute(
+            """
+            DELETE FROM results WHERE key IN (
+                SELECT key FROM results ORDER BY last_accessed_at DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_entries,),
+        )
+
+
+# Process-wide cache of /smrz results
+RESULT_CACHE = ResultCache.from_env()
@@ -0,0 +1,111 @@
+# Shared by api (app/lib) and orion (app/features): keep the copies identical apart from
+# their app.lib / app.features imports. api/test_shared_modules.py checks that they are.
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import AsyncIterator, Callable
+
+
+class SingleFlight[T]:
+    """
+    Coalesces concurrent calls that share a key: the first caller runs the function, and the
+    callers that arrive while it is running wait for and share its result (or its exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[str, Future[T]] = {}
+
+    def do(self, key: str, fn: Callable[[], T]) -> T:
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if future is None:
+                future = self._calls[key] = Future()
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+class _StreamFlight[T]:
+    def __init__(self):
+        self.items: list[T] = []
+        self.error: Exception | None = None
+        self.done = False
+        self.condition = asyncio.Condition()
+
+
+class StreamSingleFlight[T]:
+    """
+    Coalesces concurrent async streams that share a key: the first subscriber starts the
+    stream in a background task, and every subscriber (including ones that join later, while
+    it is still running) receives all of its items from the beginning. The stream runs to
+    completion even if its subscribers disconnect.
+    """
+
+    def __init__(self):
+        self._flights: dict[str, _StreamFlight[T]] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    async def subscribe(
+        self, key: str, stream: Callable[[], AsyncIterator[T]]
+    ) -> AsyncIterator[T]:
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = _StreamFlight()
+            task = asyncio.create_task(self._produce(key, flight, stream))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        index = 0
+        while True:
+            async with flight.condition:
+                await flight.condition.wait_for(
+                    lambda: index < len(flight.items) or flight.done
+                )
+                items = flight.items[index:]
+                done = flight.done
+
+            index += len(items)
+            for item in items:
+                yield item
+
+            # The stream is marked done only after its last item, so nothing was missed
+            if done:
+                if flight.error:
+                    raise flight.error
+                return
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    async def _produce(
+        self, key: str, flight: _StreamFlight[T], stream: Callable[[], AsyncIterator[T]]
+    ):
+        try:
+            async for item in stream():
+                async with flight.condition:
+                    flight.items.append(item)
+                    flight.condition.notify_all()
+        except Exception as e:
+            flight.error = e
+        finally:
+            del self._flights[key]
+            async with flight.condition:
+                flight.done = True
+                flight.condition.notify_all()
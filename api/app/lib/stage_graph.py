@@ -0,0 +1,118 @@
+import contextvars
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from app.lib.metrics import STAGE_ERRORS, record_timing
+
+
+@dataclass
+class Stage:
+    """
+    A single pipeline step. `run` is called with the results of the stages it depends on,
+    passed as keyword arguments named after those stages.
+    """
+
+    name: str
+    run: Callable[..., Any]
+    depends_on: list[str] = field(default_factory=list)
+
+
+@dataclass
+class StageGraphResult:
+    results: dict[str, Any]
+    timings: dict[str, float]  # seconds spent in each stage
+
+
+class StageGraph:
+    """
+    Runs a small dependency graph of stages, executing every stage as soon as all of its
+    dependencies are done so that independent stages run in parallel on a thread pool.
+    """
+
+    def __init__(self, stages: list[Stage], log_key: str | None = None):
+        names = {stage.name for stage in stages}
+        if len(names) != len(stages):
+            raise ValueError("Stage names must be unique")
+        for stage in stages:
+            unknown = set(stage.depends_on) - names
+            if unknown:
+                raise ValueError(
+                    f"Stage '{stage.name}' depends on unknown stages: {', '.join(sorted(unknown))}"
+                )
+
+        self.stages = stages
+        self.log_key = log_key
+
+    def run(
+        self, on_stage_complete: Callable[[str, Any], None] | None = None
+    ) -> StageGraphResult:
+        """
+        Run every stage and return their results. The first stage to fail aborts the run
+        and its exception is re-raised. `on_stage_complete` is called with the name and
+        result of each stage as soon as it finishes.
+        """
+        results: dict[str, Any] = {}
+        timings: dict[str, float] = {}
+        pending = {stage.name: stage for stage in self.stages}
+        running: dict[Future, str] = {}
+
+        with ThreadPoolExecutor(max_workers=len(self.stages) or 1) as executor:
+            try:
+                while pending or running:
+                    for name, stage in list(pending.items()):
+                        if all(
+                            dependency in results for dependency in stage.depends_on
+                        ):
+                            del pending[name]
+                            # Run in the caller's context, so stage timings reach
+                            # its Server-Timing header
+                            running[
+                                executor.submit(
+                                    contextvars.copy_context().run,
+                                    self._run_stage,
+                                    stage,
+                                    results,
+                                )
+                            ] = name
+
+                    if not running:
+                        raise RuntimeError(
+                            f"Stages can never run (dependency cycle): {', '.join(sorted(pending))}"
+                        )
+
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        name = running.pop(future)
+                        results[name], timings[name] = future.result()
+                        if on_stage_complete:
+                            on_stage_complete(name, results[name])
+            except BaseException:
+                for future in running:
+                    future.cancel()
+                raise
+            finally:
+                if self.log_key and timings:
+                    print(
+                        f"[StageGraph] [{self.log_key}]: "
+                        + ", ".join(
+                            f"{name} {duration:.2f}s"
+                            for name, duration in timings.items()
+                        )
+                    )
+
+        return StageGraphResult(results=results, timings=timings)
+
+    def _run_stage(self, stage: Stage, results: dict[str, Any]) -> tuple[Any, float]:
+        start_time = time.time()
+        try:
+            result = stage.run(
+                **{dependency: results[dependency] for dependency in stage.depends_on}
+            )
+        except BaseException:
+            STAGE_ERRORS.labels(stage=stage.name).inc()
+            raise
+        duration = time.time() - start_time
+        record_timing(stage.name, duration)
+        return result, duration
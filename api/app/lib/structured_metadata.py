@@ -0,0 +1,191 @@
+# Shared by api (app/lib) and orion (app/features): keep the copies identical apart from
+# their app.lib / app.features imports. api/test_shared_modules.py checks that they are.
+import datetime
+import json
+import urllib.parse
+from typing import Any
+
+from lxml import html as lxml_html
+from pydantic import BaseModel
+
+from app.utils import parse_date
+
+# JSON-LD types that describe the main content of a page
+JSON_LD_CONTENT_TYPES = {
+    "Article",
+    "NewsArticle",
+    "BlogPosting",
+    "TechArticle",
+    "ScholarlyArticle",
+    "Report",
+    "VideoObject",
+}
+
+
+class StructuredMetadata(BaseModel):
+    title: str | None = None
+    # The article's author(s), or the channel that published a video
+    author: str | None = None
+    published_date: datetime.date | None = None
+    image: str | None = None
+    favicon: str | None = None
+
+
+def extract_structured_metadata(
+    html: str, base_url: str | None = None
+) -> StructuredMetadata:
+    """
+    Read the metadata that the page declares about itself, in a single pass over its HTML:
+    JSON-LD (Article, NewsArticle, VideoObject, ...), OpenGraph and article:* tags, other
+    <meta> tags, microdata (itemprop) and <link rel="icon">. Earlier sources win. The bare
+    <title> tag is left to the caller, since it usually carries the site's name as well.
+    """
+    try:
+        page = lxml_html.fromstring(html)
+    except Exception:
+        return StructuredMetadata()
+
+    json_ld = _json_ld_content(page)
+
+    def meta(*names: str) -> str | None:
+        for name in names:
+            for value in page.xpath(
+                f"//meta[@property='{name}' or @name='{name}']/@content"
+            ):
+                if value.strip():
+                    return value.strip()
+        return None
+
+    def itemprop(name: str) -> str | None:
+        for value in page.xpath(
+            f"//*[@itemprop='{name}']/@content | //*[@itemprop='{name}']/@datetime | //link[@itemprop='{name}']/@href"
+        ):
+            if value.strip():
+                return value.strip()
+        return None
+
+    title = _first(
+        _json_ld_text(json_ld.get("headline")),
+        _json_ld_text(json_ld.get("name")),
+        meta("og:title", "twitter:title"),
+        itemprop("name"),
+    )
+
+    author = _first(
+        _json_ld_names(json_ld.get("author")),
+        # article:author is often a profile URL rather than a name
+        _not_url(meta("author", "article:author", "parsely-author")),
+        _first(
+            *(
+                value.strip()
+                for value in page.xpath(
+                    "//*[@itemprop='author']//*[@itemprop='name']/@content | //*[@itemprop='author']//*[@itemprop='name']/text()"
+                )
+            )
+        ),
+    )
+
+    published_date = None
+    for value in (
+        _json_ld_text(json_ld.get("datePublished")),
+        _json_ld_text(json_ld.get("uploadDate")),
+        meta("article:published_time", "og:published_time", "date", "pubdate"),
+        itemprop("datePublished"),
+        itemprop("uploadDate"),
+    ):
+        if value:
+            try:
+                published_date = parse_date(value)
+                break
+            except ValueError:
+                continue
+
+    image = _first(
+        _json_ld_url(json_ld.get("image")),
+        _json_ld_url(json_ld.get("thumbnailUrl")),
+        meta("og:image", "og:image:url", "twitter:image"),
+        itemprop("thumbnailUrl"),
+        itemprop("image"),
+    )
+
+    return StructuredMetadata(
+        title=title,
+        author=author,
+        published_date=published_date,
+        image=_absolute_url(image, base_url),
+        favicon=_absolute_url(_favicon(page), base_url),
+    )
+
+
+def _json_ld_content(page: lxml_html.HtmlElement) -> dict[str, Any]:
+    """
+    Returns the first JSON-LD object on the page describing its main content.
+    """
+    for script in page.xpath("//script[@type='application/ld+json']"):
+        try:
+            data = json.loads(script.text_content())
+        except ValueError:
+            continue
+
+        stack = [data]
+        while stack:
+            item = stack.pop(0)
+            if isinstance(item, list):
+                stack.extend(item)
+            elif isinstance(item, dict):
+                types = item.get("@type")
+                types = types if isinstance(types, list) else [types]
+                if any(type in JSON_LD_CONTENT_TYPES for type in types):
+                    return item
+                if "@graph" in item:
+                    stack.extend(item["@graph"])
+    return {}
+
+
+def _json_ld_text(value: Any) -> str | None:
+    if isinstance(value, list):
+        value = value[0] if value else None
+    return value.strip() if isinstance(value, str) and value.strip() else None
+
+
+def _json_ld_names(value: Any) -> str | None:
+    values = value if isinstance(value, list) else [value]
+    names = [
+        name
+        for item in values
+        if (name := _json_ld_text(item.get("name") if isinstance(item, dict) else item))
+    ]
+    return ", ".join(names) if names else None
+
+
+def _json_ld_url(value: Any) -> str | None:
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if isinstance(value, dict):
+        value = value.get("url") or value.get("contentUrl")
+    return _json_ld_text(value)
+
+
+def _favicon(page: lxml_html.HtmlElement) -> str | None:
+    icons = {
+        rel: href
+        for link in page.xpath("//link[@rel and @href]")
+        for rel in [" ".join(link.get("rel").lower().split())]
+        if "icon" in rel.split() or rel == "apple-touch-icon"
+        for href in [link.get("href").strip()]
+        if href
+    }
+    # Prefer the regular favicon over the (larger) Apple touch icon
+    return _first(icons.get("icon"), icons.get("shortcut icon"), *icons.values())
+
+
+def _not_url(value: str | None) -> str | None:
+    return value if value and not value.startswith(("http://", "https://")) else None
+
+
+def _absolute_url(url: str | None, base_url: str | None) -> str | None:
+    return urllib.parse.urljoin(base_url, url) if url and base_url else url
+
+
+def _first(*values: str | None) -> str | None:
+    return next((value for value in values if value), None)
@@ -1,11 +1,43 @@
-from app.lib.llm_client import LLMClient
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator
+
+from app.lib.llm_client import (
+    LLMClient,
+    LLMClientStreamChunk,
+    count_tokens,
+    truncate_to_tokens,
+)
 from app.utils import clean_markdown
 
+# Maximum number of parts of an oversized content summarized at once
+SUMMARY_PART_CONCURRENCY = 8
+
+# Tokens kept free in each part's prompt for the instructions around the part
+SUMMARY_PART_PROMPT_TOKENS = 100
+
 
 def summarize_content(llm_client: LLMClient, content: str) -> str:
     try:
+        condensed = False
+        while parts := _plan_summary(llm_client, content, condensed):
+            with ThreadPoolExecutor(
+                max_workers=min(SUMMARY_PART_CONCURRENCY, len(parts))
+            ) as executor:
+                summaries = list(
+                    executor.map(
+                        lambda prompt: (
+                            llm_client.generate_response(
+                                user_prompt=prompt, temp=585 / 1000
+                            ).content
+                        ),
+                        _part_prompts(parts),
+                    )
+                )
+            content, condensed = _join_part_summaries(summaries), True
+
         response = llm_client.generate_response(
-            user_prompt=f"Summarize the following content: {content}",
+            user_prompt=_summary_prompt(content, condensed),
             temp=585 / 1000,
         )
         return clean_markdown(response.content)
@@ -13,6 +45,108 @@ def summarize_content(llm_client: LLMClient, content: str) -> str:
         raise RuntimeError(f"Failed to summarize content: {e}") from e
 
 
+async def astream_summary(
+    llm_client: LLMClient, content: str
+) -> AsyncIterator[LLMClientStreamChunk]:
+    """
+    Stream the summary of the given content token by token. The final chunk carries the
+    complete response, with its content cleaned the same way as `summarize_content`.
+    """
+    try:
+        condensed = False
+        while parts := _plan_summary(llm_client, content, condensed):
+            responses = await asyncio.gather(
+                *[
+                    llm_client.agenerate_response(user_prompt=prompt, temp=585 / 1000)
+                    for prompt in _part_prompts(parts)
+                ]
+            )
+            content = _join_part_summaries([response.content for response in responses])
+            condensed = True
+
+        async for chunk in llm_client.astream_response(
+            user_prompt=_summary_prompt(content, condensed),
+            temp=585 / 1000,
+        ):
+            if chunk.response:
+                chunk.response.content = clean_markdown(chunk.response.content)
+            yield chunk
+    except Exception as e:
+        raise RuntimeError(f"Failed to summarize content: {e}") from e
+
+
+def _summary_prompt(content: str, condensed: bool = False) -> str:
+    if condensed:
+        return f"Summarize the following content, given as the summaries of its consecutive parts: {content}"
+    return f"Summarize the following content: {content}"
+
+
+def _plan_summary(llm_client: LLMClient, content: str, condensed: bool) -> list[str]:
+    """
+    Check that the summary prompt fits the model. Content that doesn't is split into parts
+    to summarize first, and the summary is then made from the summaries of the parts.
+    """
+    plan = llm_client.plan_request(_summary_prompt(content, condensed))
+    if llm_client.log_key:
+        print(
+            f"[{llm_client.log_key}]: Planned {plan.input_tokens} input tokens on {plan.model}, costing ~${plan.cost / 100:.4f} USD"
+        )
+    if plan.fits:
+        return []
+
+    parts = _split_content(
+        content, llm_client.max_prompt_tokens() - SUMMARY_PART_PROMPT_TOKENS
+    )
+    if llm_client.log_key:
+        print(
+            f"[{llm_client.log_key}]: Content is too large for {plan.model}, summarizing it in {len(parts)} parts first"
+        )
+    return parts
+
+
+def _part_prompts(parts: list[str]) -> list[str]:
+    return [
+        f"The following is part {i + 1} of {len(parts)} of the content. Summarize it: {part}"
+        for i, part in enumerate(parts)
+    ]
+
+
+def _join_part_summaries(summaries: list[str]) -> str:
+    return "\n\n".join(
+        f"Part {i + 1}:\n{clean_markdown(summary)}"
+        for i, summary in enumerate(summaries)
+    )
+
+
+def _split_content(content: str, max_tokens: int) -> list[str]:
+    """
+    Split content at paragraph boundaries into parts of at most about `max_tokens` each.
+    Paragraphs larger than a part are cut into several.
+    """
+    max_tokens = max(1, max_tokens)
+    parts: list[str] = []
+    paragraphs: list[str] = []
+    part_tokens = 0
+    for paragraph in content.split("\n\n"):
+        tokens = count_tokens(paragraph)
+        if paragraphs and part_tokens + tokens > max_tokens:
+            parts.append("\n\n".join(paragraphs))
+            paragraphs, part_tokens = [], 0
+
+        while tokens > max_tokens:
+            piece = truncate_to_tokens(paragraph, max_tokens)
+            parts.append(piece)
+            paragraph = paragraph[len(piece) :]
+            tokens = count_tokens(paragraph)
+
+        paragraphs.append(paragraph)
+        part_tokens += tokens
+
+    if paragraphs:
+        parts.append("\n\n".join(paragraphs))
+    return parts
+
+
 SUMMARIZE_PROMPT_1 = """
 You are a summarization system that extracts the most interesting, useful, and surprising aspects of an article or video transcript.
 
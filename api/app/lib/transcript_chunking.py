@@ -0,0 +1,121 @@
+import os
+import re
+
+from pydantic import BaseModel
+
+from app.lib.llm_client import count_tokens
+
+# Size of the transcript text rewritten by a single readability LLM call
+TRANSCRIPT_CHUNK_TOKENS = int(os.getenv("TRANSCRIPT_CHUNK_TOKENS", "2000"))
+
+# Text preceding each chunk that is passed along as context only, so the model can tell
+# whether the chunk starts a new section or continues the previous one
+TRANSCRIPT_CHUNK_CONTEXT_TOKENS = int(
+    os.getenv("TRANSCRIPT_CHUNK_CONTEXT_TOKENS", "200")
+)
+
+# Sentence ends, or the pauses Whisper marks with an ellipsis or a dash
+SENTENCE_BOUNDARY_PATTERN = re.compile(r"(?<=[.!?…])\s+|(?<=\s[-–—])\s+")
+
+HEADER_PATTERN = re.compile(r"^(#{1,6})(\s+\S.*)$", re.MULTILINE)
+
+# Top level of the headers added by the readability prompt
+TOP_HEADER_LEVEL = 2
+
+
+class TranscriptChunk(BaseModel):
+    # The text the model should rewrite
+    text: str
+    # The end of the previous chunk, for reference only
+    context: str
+
+
+def split_transcript(
+    transcript: str,
+    chunk_tokens: int = TRANSCRIPT_CHUNK_TOKENS,
+    context_tokens: int = TRANSCRIPT_CHUNK_CONTEXT_TOKENS,
+) -> list[TranscriptChunk]:
+    """
+    Split a transcript at sentence or pause boundaries into windows of about `chunk_tokens`
+    each. Every window overlaps the end of the previous one by about `context_tokens`, given
+    as context rather than as text to rewrite, so the chunks can be joined back without
+    deduplicating anything. Captions without punctuation are split between words instead.
+    """
+    segments = [
+        segment
+        for segment in SENTENCE_BOUNDARY_PATTERN.split(transcript.strip())
+        if segment
+    ]
+    # A single "sentence" larger than a chunk (e.g. unpunctuated captions) is split by words
+    segments = [
+        piece
+        for segment in segments
+        for piece in (
+            _split_words(segment, chunk_tokens)
+            if count_tokens(segment) > chunk_tokens
+            else [segment]
+        )
+    ]
+
+    groups: list[list[str]] = []
+    group_tokens = 0
+    for segment in segments:
+        segment_tokens = count_tokens(segment) + 1
+        if groups and group_tokens + segment_tokens <= chunk_tokens:
+            groups[-1].append(segment)
+            group_tokens += segment_tokens
+        else:
+            groups.append([segment])
+            group_tokens = segment_tokens
+
+    chunks: list[TranscriptChunk] = []
+    for index, group in enumerate(groups):
+        context: list[str] = []
+        if index > 0:
+            for segment in reversed(groups[index - 1]):
+                if count_tokens(" ".join([segment, *context])) > context_tokens:
+                    break
+                context.insert(0, segment)
+        chunks.append(TranscriptChunk(text=" ".join(group), context=" ".join(context)))
+
+    return chunks
+
+
+def join_transcript_chunks(chunks: list[str]) -> str:
+    """
+    Stitch the rewritten chunks back together. Each chunk's headers are shifted so that its
+    highest header sits at the same level as everywhere else, since the model picks header
+    levels per chunk.
+    """
+    return "\n\n".join(
+        normalized
+        for chunk in chunks
+        if (normalized := normalize_header_levels(chunk.strip()))
+    )
+
+
+def normalize_header_levels(markdown: str, top_level: int = TOP_HEADER_LEVEL) -> str:
+    levels = [len(match.group(1)) for match in HEADER_PATTERN.finditer(markdown)]
+    if not levels:
+        return markdown
+
+    shift = top_level - min(levels)
+    return HEADER_PATTERN.sub(
+        lambda match: (
+            "#" * min(max(len(match.group(1)) + shift, 1), 6) + match.group(2)
+        ),
+        markdown,
+    )
+
+
+def _split_words(text: str, chunk_tokens: int) -> list[str]:
+    pieces: list[list[str]] = [[]]
+    piece_tokens = 0
+    for word in text.split():
+        word_tokens = count_tokens(f"{word} ")
+        if pieces[-1] and piece_tokens + word_tokens > chunk_tokens:
+            pieces.append([])
+            piece_tokens = 0
+        pieces[-1].append(word)
+        piece_tokens += word_tokens
+    return [" ".join(piece) for piece in pieces]
@@ -1,23 +1,65 @@
-import whisper
 import os
-import tempfile
-import subprocess
-import requests
 import shutil
-
-from app.lib.llm_client import LLMClient
+from concurrent.futures import ThreadPoolExecutor
+from enum import StrEnum
+
+from pydantic import BaseModel
+from youtube_transcript_api import YouTubeTranscriptApi
+
+from app.lib.audio import load_audio_from_url, load_youtube_audio
+from app.lib.llm_client import LLMClient, count_tokens
+from app.lib.metrics import timed
+from app.lib.transcript_chunking import (
+    TRANSCRIPT_CHUNK_TOKENS,
+    TranscriptChunk,
+    join_transcript_chunks,
+    split_transcript,
+)
+from app.lib.whisper_pool import (
+    WHISPER_WORKER_POOL,
+    TranscriptionPoolFullError,
+    WhisperWorkerPool,
+)
 from app.utils import (
     clean_markdown,
     is_direct_audio_url,
     is_direct_video_url,
     is_youtube_url,
+    parse_youtube_video_id,
 )
 
 
+class TranscriptSource(StrEnum):
+    MANUAL_CAPTIONS = "manual"  # Captions uploaded by the channel (YouTube only)
+    AUTO_CAPTIONS = "auto"  # Captions generated by YouTube (YouTube only)
+    WHISPER = "whisper"  # Local Whisper transcription of the audio
+
+
+# Captions arrive in under a second, so they are tried before transcribing with Whisper
+DEFAULT_TRANSCRIPT_SOURCES = [
+    TranscriptSource.MANUAL_CAPTIONS,
+    TranscriptSource.AUTO_CAPTIONS,
+    TranscriptSource.WHISPER,
+]
+
+CAPTION_LANGUAGES = ["en"]
+
+# Maximum number of transcript chunks sent to the readability LLM at once
+TRANSCRIPT_READABILITY_CONCURRENCY = int(
+    os.getenv("TRANSCRIPT_READABILITY_CONCURRENCY", "4")
+)
+
+
+class Transcript(BaseModel):
+    content: str
+    source: TranscriptSource
+
+
 class VideoTranscriber:
     def __init__(
         self,
         transcript_readability_llm_client: LLMClient,
+        whisper_worker_pool: WhisperWorkerPool = WHISPER_WORKER_POOL,
     ):
         # Ensure yt-dlp is installed
         if not shutil.which("yt-dlp"):
@@ -31,113 +73,151 @@ class VideoTranscriber:
                 "ffmpeg is not installed. Please install it using your package manager or 'brew install ffmpeg' on macOS."
             )
 
-        self.whisper_model = whisper.load_model("base")
-        self.temp_dir = tempfile.mkdtemp()
+        self.whisper_worker_pool = whisper_worker_pool
         self.transcript_readability_llm_client = transcript_readability_llm_client
 
-    def transcribe_video(self, source_url: str) -> str:
-        try:
-            audio_path = None
-
-            if is_direct_audio_url(source_url):
-                audio_path = self._download_file(source_url)
-            elif is_direct_video_url(source_url):
-                video_path = self._download_file(source_url)
-                audio_path = self._extract_audio_from_video(video_path)
-            elif is_youtube_url(source_url):
-                audio_path = self._download_youtube_audio(source_url)
-            else:
-                raise ValueError(
-                    "Invalid input source. Provide a valid YouTube URL, direct video URL, direct audio URL."
-                )
-
-            return self._improve_transcript_readability(
-                self._transcribe_audio(audio_path)
+    def transcribe_video(
+        self,
+        source_url: str,
+        sources: list[TranscriptSource] = DEFAULT_TRANSCRIPT_SOURCES,
+    ) -> Transcript:
+        """
+        Transcribe the video using the first of the given sources that succeeds.
+        Caption sources only apply to YouTube videos and are skipped for other URLs.
+        """
+        errors = []
+        for source in sources:
+            if source != TranscriptSource.WHISPER and not is_youtube_url(source_url):
+                continue
+
+            try:
+                if source == TranscriptSource.WHISPER:
+                    transcript = self._transcribe_with_whisper(source_url)
+                else:
+                    transcript = self._fetch_youtube_captions(
+                        source_url,
+                        generated=source == TranscriptSource.AUTO_CAPTIONS,
+                    )
+            except TranscriptionPoolFullError:
+                raise
+            except Exception as e:
+                errors.append(f"{source}: {str(e)}")
+                continue
+
+            with timed("transcript_readability"):
+                content = self._improve_transcript_readability(transcript)
+            return Transcript(content=content, source=source)
+
+        raise RuntimeError(
+            f"Failed to transcribe video: {'; '.join(errors) or 'no applicable transcript source'}"
+        )
+
+    def _fetch_youtube_captions(self, url: str, generated: bool) -> str:
+        transcript_list = YouTubeTranscriptApi().list(parse_youtube_video_id(url))
+        if generated:
+            captions = transcript_list.find_generated_transcript(CAPTION_LANGUAGES)
+        else:
+            captions = transcript_list.find_manually_created_transcript(
+                CAPTION_LANGUAGES
             )
-        except Exception as e:
-            raise RuntimeError(f"Failed to transcribe video: {str(e)}")
-        finally:
-            self._cleanup_temp_files()
-
-    def _download_file(self, url: str) -> str:
-        response = requests.get(url, stream=True)
-        if response.status_code != 200:
-            raise RuntimeError(f"Failed to download file from {url}")
-
-        file_path = os.path.join(self.temp_dir, os.path.basename(url))
-        with open(file_path, "wb") as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-
-        return file_path
-
-    def _download_youtube_audio(self, url: str) -> str:
-        audio_path = os.path.join(self.temp_dir, "youtube_extracted_audio.wav")
-
-        # fmt: off
-        cmd = [
-            'yt-dlp',
-            '--extract-audio',
-            '--audio-format', 'wav',
-            '--audio-quality', '0',
-            '--output', audio_path,
-            url
-        ]
-        # fmt: on
-
-        try:
-            subprocess.run(cmd, check=True, capture_output=True, text=True)
-            return audio_path
-        except subprocess.CalledProcessError as e:
-            raise RuntimeError(f"Failed to download YouTube audio: {e}")
-
-    def _extract_audio_from_video(self, video_path: str) -> str:
-        audio_path = os.path.join(self.temp_dir, "extracted_audio.wav")
-
-        # fmt: off
-        cmd = [
-            'ffmpeg',
-            '-i', video_path,
-            '-vn',  # No video
-            '-acodec', 'pcm_s16le',  # WAV format
-            '-ar', '16000',  # 16kHz sample rate
-            '-ac', '1',  # Mono audio
-            '-y',  # Overwrite output file
-            audio_path
-        ]
-        # fmt: on
 
-        try:
-            subprocess.run(cmd, check=True, capture_output=True, text=True)
-            return audio_path
-        except subprocess.CalledProcessError as e:
-            raise RuntimeError(f"Failed to extract audio: {e}")
-
-    def _transcribe_audio(self, audio_path: str) -> str:
-        if not os.path.exists(audio_path):
-            raise FileNotFoundError(f"Audio file not found: {audio_path}")
-
-        result = self.whisper_model.transcribe(audio_path, language="en")
-        if "text" not in result:
-            raise RuntimeError("Transcription failed.")
+        transcript = " ".join(
+            " ".join(snippet.text.split()) for snippet in captions.fetch()
+        ).strip()
+        if not transcript:
+            raise RuntimeError("Captions are empty")
+
+        return transcript
+
+    def _transcribe_with_whisper(self, source_url: str) -> str:
+        if is_direct_audio_url(source_url) or is_direct_video_url(source_url):
+            load_audio = load_audio_from_url
+        elif is_youtube_url(source_url):
+            load_audio = load_youtube_audio
+        else:
+            raise ValueError(
+                "Invalid input source. Provide a valid YouTube URL, direct video URL, direct audio URL."
+            )
 
-        return str(result["text"]).strip()
+        # Claim a worker before downloading, so a full pool rejects the video right away
+        with self.whisper_worker_pool.reserve() as slot:
+            with timed("audio_decode"):
+                audio = load_audio(source_url)
+            # Runs in a separate worker process that keeps its model warm
+            with timed("whisper"):
+                return slot.submit(audio, language="en").result()
 
     def _improve_transcript_readability(self, transcript: str) -> str:
-        try:
-            response = self.transcript_readability_llm_client.generate_response(
-                user_prompt=f"Improve the readability of the following video transcript: {transcript}",
-                temp=825 / 1000,
+        """
+        Add headers to the transcript. Long transcripts are split into chunks that are
+        rewritten concurrently, so the wall-clock time grows with the number of chunks
+        divided by the concurrency rather than with the length of the whole transcript.
+        """
+        llm_client = self.transcript_readability_llm_client
+        # Every chunk is rewritten in full, so it has to fit in the model's output too (with
+        # room for the added headers and the error of the chunk size estimate)
+        chunks = split_transcript(
+            transcript,
+            chunk_tokens=min(
+                TRANSCRIPT_CHUNK_TOKENS, llm_client.max_output_tokens // 2
+            ),
+        )
+        prompts = [
+            _chunk_readability_prompt(chunk, index, len(chunks))
+            for index, chunk in enumerate(chunks)
+        ]
+        if llm_client.log_key:
+            plans = [
+                llm_client.plan_request(
+                    prompt, expected_output_tokens=count_tokens(chunk.text)
+                )
+                for prompt, chunk in zip(prompts, chunks)
+            ]
+            print(
+                f"[{llm_client.log_key}]: Planned {len(plans)} chunks with {sum(plan.input_tokens for plan in plans)} input and ~{sum(plan.output_tokens for plan in plans)} output tokens, costing ~${sum(plan.cost for plan in plans) / 100:.4f} USD"
             )
-            return clean_markdown(response.content)
-        except Exception as e:
-            raise RuntimeError(f"Failed to improve transcript readability: {e}") from e
 
-    def _cleanup_temp_files(self):
         try:
-            shutil.rmtree(self.temp_dir)
+            if len(prompts) == 1:
+                return self._improve_chunk_readability(prompts[0])
+
+            with ThreadPoolExecutor(
+                max_workers=min(TRANSCRIPT_READABILITY_CONCURRENCY, len(chunks))
+            ) as executor:
+                improved_chunks = list(
+                    executor.map(self._improve_chunk_readability, prompts)
+                )
+            return join_transcript_chunks(improved_chunks)
         except Exception as e:
-            print(f"Warning: Failed to clean up temporary files: {str(e)}")
+            raise RuntimeError(f"Failed to improve transcript readability: {e}") from e
+
+    def _improve_chunk_readability(self, user_prompt: str) -> str:
+        response = self.transcript_readability_llm_client.generate_response(
+            user_prompt=user_prompt,
+            temp=825 / 1000,
+        )
+        return clean_markdown(response.content)
+
+
+def _chunk_readability_prompt(
+    chunk: TranscriptChunk, index: int, chunk_count: int
+) -> str:
+    if chunk_count == 1:
+        return (
+            f"Improve the readability of the following video transcript: {chunk.text}"
+        )
+
+    return (
+        f"The following is part {index + 1} of {chunk_count} of a video transcript. "
+        + (
+            "It continues right after the context below, which is only there to tell "
+            "whether this part starts a new section; do not include the context in "
+            f"your output.\n\nContext: {chunk.context}\n\n"
+            if chunk.context
+            else ""
+        )
+        + f"Improve the readability of this part of the transcript: {chunk.text}"
+    )
 
 
 IMPROVE_TRANSCRIPT_PROMPT_1 = """
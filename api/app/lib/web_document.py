@@ -0,0 +1,61 @@
+from functools import cached_property
+
+from newspaper import Article
+
+from app.lib.html_reduction import HTMLReduction, reduce_article_html
+from app.lib.structured_metadata import StructuredMetadata, extract_structured_metadata
+from app.utils import clean_html, fetch_html
+
+
+class WebDocument:
+    """
+    A web page fetched once per request. The raw HTML, the cleaned HTML, the reduced article
+    HTML, the structured metadata and the parsed Newspaper3k article are all derived from the
+    same download and computed lazily, so every pipeline stage can share them without hitting
+    the origin again.
+    """
+
+    def __init__(self, url: str, raw_html: str):
+        self.url = url
+        self.raw_html = raw_html
+
+    @classmethod
+    def fetch(cls, url: str) -> "WebDocument":
+        return cls(url=url, raw_html=fetch_html(url))
+
+    def prepare(self) -> "WebDocument":
+        """
+        Clean the HTML now, before the document is shared with stages running in parallel,
+        which would otherwise each clean it (cached_property does not lock).
+        """
+        _ = self.clean_html
+        return self
+
+    @property
+    def domain(self) -> str:
+        return self.url.split("/")[2]
+
+    @cached_property
+    def clean_html(self) -> str:
+        return clean_html(self.raw_html)
+
+    @cached_property
+    def reduced_html(self) -> HTMLReduction:
+        """
+        The cleaned HTML reduced to the article body, ready to be sent to an LLM.
+        """
+        return reduce_article_html(self.clean_html)
+
+    @cached_property
+    def structured_metadata(self) -> StructuredMetadata:
+        """
+        The metadata the page declares in its JSON-LD, OpenGraph, <meta> and microdata tags.
+        """
+        return extract_structured_metadata(self.raw_html, base_url=self.url)
+
+    @cached_property
+    def article(self) -> Article:
+        article = Article(self.url)
+        article.download(input_html=self.raw_html)
+        article.parse()
+        return article
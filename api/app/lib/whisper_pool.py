@@ -0,0 +1,208 @@
+# Shared by api (app/lib) and orion (app/features): keep the copies identical apart from
+# their app.lib / app.features imports. api/test_shared_modules.py checks that they are.
+# Both apps handle TranscriptionPoolFullError alike: routes answer 503 with Retry-After
+# and background jobs go back to the queue and retry.
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable
+
+import numpy as np
+import torch
+import whisper
+
+
+class TranscriptionPoolFullError(RuntimeError):
+    """
+    Raised when a transcription is submitted while every worker is busy and the queue is full.
+    """
+
+
+class WhisperWorkerPool:
+    """
+    A pool of worker processes that each keep a warm Whisper model. Transcription is CPU bound
+    and holds a core (and the GIL, for the Python parts) for minutes, so it runs outside of the
+    API process: callers submit audio and wait on a future, and other requests are not slowed
+    down. At most `workers + queue_depth` transcriptions are accepted at once; anything beyond
+    that is rejected right away with TranscriptionPoolFullError instead of queueing unboundedly.
+    """
+
+    def __init__(
+        self,
+        model_size: str = "base",
+        device: str | None = None,
+        workers: int = 1,
+        torch_threads: int | None = None,
+        queue_depth: int = 4,
+    ):
+        if workers < 1:
+            raise ValueError("Whisper worker pool size must be at least 1")
+        if queue_depth < 0:
+            raise ValueError("Whisper worker pool queue depth cannot be negative")
+
+        self.model_size = model_size
+        self.device = device
+        self.workers = workers
+        # Split the cores between the workers so they don't oversubscribe the CPU
+        self.torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // workers)
+        self.queue_depth = queue_depth
+        self._slots = threading.BoundedSemaphore(workers + queue_depth)
+        self._lock = threading.Lock()
+        self._executor: ProcessPoolExecutor | None = None
+
+    @classmethod
+    def from_env(cls) -> "WhisperWorkerPool":
+        """
+        Build a pool configured through the WHISPER_MODEL_SIZE, WHISPER_DEVICE,
+        WHISPER_POOL_SIZE, WHISPER_TORCH_THREADS and WHISPER_QUEUE_DEPTH environment variables.
+        """
+        return cls(
+            model_size=os.environ.get("WHISPER_MODEL_SIZE", "base"),
+            device=os.environ.get("WHISPER_DEVICE") or None,
+            workers=int(os.environ.get("WHISPER_POOL_SIZE", "1")),
+            torch_threads=int(os.environ.get("WHISPER_TORCH_THREADS", "0")) or None,
+            queue_depth=int(os.environ.get("WHISPER_QUEUE_DEPTH", "4")),
+        )
+
+    def load(self):
+        """
+        Start the worker processes and wait until every one of them has loaded its model.
+        """
+        # Workers are started on demand, one per submission that finds no idle worker
+        for future in [self._submit(_warm_up) for _ in range(self.workers)]:
+            future.result()
+
+    def close(self):
+        with self._lock:
+            if self._executor:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def reserve(self) -> "TranscriptionSlot":
+        """
+        Claim a place in the pool before doing any work for a transcription (e.g. downloading
+        the audio), so overloaded requests are rejected before they cost anything.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise TranscriptionPoolFullError(
+                "Too many videos are being transcribed right now, please try again later"
+            )
+        return TranscriptionSlot(self)
+
+    def submit(self, audio: np.ndarray, language: str = "en") -> Future[str]:
+        """
+        Queue the transcription of 16 kHz mono float32 audio and return a future of its text.
+        """
+        with self.reserve() as slot:
+            return slot.submit(audio, language)
+
+    def transcribe(self, audio: np.ndarray, language: str = "en") -> str:
+        return self.submit(audio, language).result()
+
+    def _submit(self, fn: Callable[..., Any], *args: Any) -> Future:
+        """
+        Run `fn` in a worker. A pool broken by a dead worker (e.g. one killed for running out
+        of memory) is replaced, so only the transcriptions it was running fail.
+        """
+        executor = self._get_executor()
+        try:
+            future = executor.submit(fn, *args)
+        except BrokenProcessPool:
+            self._discard_executor(executor)
+            executor = self._get_executor()
+            future = executor.submit(fn, *args)
+
+        def discard_if_broken(future: Future):
+            if not future.cancelled() and isinstance(
+                future.exception(), BrokenProcessPool
+            ):
+                self._discard_executor(executor)
+
+        future.add_done_callback(discard_if_broken)
+        return future
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._new_executor()
+            return self._executor
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            # Forking a process that has already started threads (or torch) is unsafe
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.model_size, self.device, self.torch_threads),
+        )
+
+    def _discard_executor(self, executor: ProcessPoolExecutor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+class TranscriptionSlot:
+    """
+    A claimed place in a WhisperWorkerPool. It is given back when the submitted transcription
+    finishes, or when the slot is exited without submitting anything.
+    """
+
+    def __init__(self, pool: WhisperWorkerPool):
+        self._pool = pool
+        self._submitted = False
+        self._released = False
+
+    def __enter__(self) -> "TranscriptionSlot":
+        return self
+
+    def __exit__(self, *exc_info):
+        if not self._submitted:
+            self._release()
+
+    def submit(self, audio: np.ndarray, language: str = "en") -> Future[str]:
+        if self._submitted or self._released:
+            raise RuntimeError("A transcription slot can only be used once")
+
+        future = self._pool._submit(_transcribe, audio, language)
+        self._submitted = True
+        future.add_done_callback(lambda _: self._release())
+        return future
+
+    def _release(self):
+        if not self._released:
+            self._released = True
+            self._pool._slots.release()
+
+
+# Each worker process loads its own model once, when it starts
+_worker_model: whisper.Whisper | None = None
+
+
+def _init_worker(model_size: str, device: str | None, torch_threads: int):
+    global _worker_model
+
+    torch.set_num_threads(torch_threads)
+    _worker_model = whisper.load_model(model_size, device=device)
+
+
+def _warm_up():
+    return _worker_model is not None
+
+
+def _transcribe(audio: np.ndarray, language: str) -> str:
+    if _worker_model is None:
+        raise RuntimeError("Whisper worker was not initialized")
+
+    result = _worker_model.transcribe(audio, language=language)
+    if "text" not in result:
+        raise RuntimeError("Transcription failed.")
+
+    return str(result["text"]).strip()
+
+
+# Process-wide pool, started by the FastAPI lifespan hook in app.main
+WHISPER_WORKER_POOL = WhisperWorkerPool.from_env()
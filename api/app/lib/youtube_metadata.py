@@ -0,0 +1,130 @@
+# Shared by api (app/lib) and orion (app/features): keep the copies identical apart from
+# their app.lib / app.features imports. api/test_shared_modules.py checks that they are.
+import datetime
+import os
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+
+from pydantic import BaseModel
+
+from app.lib.http_client import HTTP_CLIENT
+from app.lib.single_flight import SingleFlight
+from app.lib.structured_metadata import (
+    StructuredMetadata,
+    extract_structured_metadata,
+)
+from app.utils import get_json_from_url, parse_youtube_video_id
+
+# A desktop browser User-Agent gets the full watch page, with its microdata
+WATCH_PAGE_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+
+class VideoMetadata(BaseModel):
+    title: str
+    channel: str | None = None
+    published_date: datetime.date | None = None
+    thumbnail_url: str | None = None
+
+
+class YoutubeMetadataProvider:
+    """
+    Looks up the metadata of YouTube videos. Title, channel, thumbnail and publish date are all
+    read from a single fetch of the watch page; the oEmbed endpoint is only queried for what the
+    page is missing (e.g. when YouTube serves a consent page instead). Results are cached in
+    memory per video ID for `ttl_seconds`, and concurrent lookups of the same video share one
+    fetch.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[float, VideoMetadata]] = OrderedDict()
+        self._flights = SingleFlight[VideoMetadata]()
+
+    @classmethod
+    def from_env(cls) -> "YoutubeMetadataProvider":
+        """
+        Build a provider configured through the YOUTUBE_METADATA_TTL_SECONDS and
+        YOUTUBE_METADATA_MAX_ENTRIES environment variables.
+        """
+        return cls(
+            ttl_seconds=float(os.environ.get("YOUTUBE_METADATA_TTL_SECONDS", "21600")),
+            max_entries=int(os.environ.get("YOUTUBE_METADATA_MAX_ENTRIES", "1024")),
+        )
+
+    def get(self, url: str) -> VideoMetadata:
+        video_id = parse_youtube_video_id(url)
+        if not video_id:
+            raise ValueError("Invalid YouTube video URL")
+
+        metadata = self._get_cached(video_id)
+        if metadata is not None:
+            return metadata
+
+        return self._flights.do(video_id, lambda: self._fetch_and_cache(video_id))
+
+    def _get_cached(self, video_id: str) -> VideoMetadata | None:
+        with self._lock:
+            entry = self._entries.get(video_id)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._entries[video_id]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(video_id)
+            self.hits += 1
+            return entry[1]
+
+    def _fetch_and_cache(self, video_id: str) -> VideoMetadata:
+        metadata = self._fetch(video_id)
+        with self._lock:
+            self._entries[video_id] = (time.monotonic() + self.ttl_seconds, metadata)
+            self._entries.move_to_end(video_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return metadata
+
+    def _fetch(self, video_id: str) -> VideoMetadata:
+        url = f"https://www.youtube.com/watch?v={video_id}"
+
+        try:
+            response = HTTP_CLIENT.get(url, headers=WATCH_PAGE_HEADERS)
+            response.raise_for_status()
+            structured = extract_structured_metadata(response.text, base_url=url)
+        except Exception as e:
+            print(f"Warning: Failed to read the watch page of {url}: {e}")
+            structured = StructuredMetadata()
+
+        title = structured.title
+        channel = structured.author
+        thumbnail_url = structured.image
+
+        if not (title and channel and thumbnail_url):
+            oembed = get_json_from_url(
+                f"https://www.youtube.com/oembed?url={urllib.parse.quote(url)}&format=json"
+            )
+            title = title or oembed["title"]
+            channel = channel or oembed.get("author_name", None)
+            thumbnail_url = thumbnail_url or oembed.get("thumbnail_url", None)
+
+        return VideoMetadata(
+            title=title,
+            channel=channel,
+            published_date=structured.published_date,
+            thumbnail_url=thumbnail_url,
+        )
+
+
+# Process-wide YouTube metadata provider, shared so that its cache serves every request
+YOUTUBE_METADATA_PROVIDER = YoutubeMetadataProvider.from_env()
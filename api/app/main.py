@@ -1,12 +1,56 @@
 import sys
+import time
+from contextlib import asynccontextmanager
 
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 
 sys.dont_write_bytecode = True  # Disable .pyc file generation
 load_dotenv()  # Load environment variables from .env file
 
+from app.jobs import SUMMARY_JOB_RUNNER  # noqa: E402
+from app.lib.metrics import (  # noqa: E402
+    HTTP_REQUEST_DURATION_SECONDS,
+    collect_server_timings,
+    format_server_timing,
+)
+from app.lib.whisper_pool import WHISPER_WORKER_POOL  # noqa: E402
 from app.routes import router  # noqa: E402
 
-app = FastAPI(title="readr API", version="0.1.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Start the transcription workers up front so video requests never pay the model load time
+    WHISPER_WORKER_POOL.load()
+    # Pick up the background jobs that were interrupted by the last shutdown
+    SUMMARY_JOB_RUNNER.start()
+    yield
+    SUMMARY_JOB_RUNNER.close()
+    WHISPER_WORKER_POOL.close()
+
+
+app = FastAPI(title="readr API", version="0.1.0", lifespan=lifespan)
 app.include_router(router)
+
+
+@app.middleware("http")
+async def server_timing(request: Request, call_next):
+    """
+    Report the time spent in each pipeline stage in a Server-Timing header. Streaming
+    responses only include what was done before their headers were sent.
+    """
+    start_time = time.time()
+    with collect_server_timings() as timings:
+        response = await call_next(request)
+    duration = time.time() - start_time
+
+    route = request.scope.get("route")
+    HTTP_REQUEST_DURATION_SECONDS.labels(
+        method=request.method,
+        route=route.path if route else "unmatched",
+        status=response.status_code,
+    ).observe(duration)
+    response.headers["Server-Timing"] = format_server_timing(
+        timings + [("total", duration)]
+    )
+    return response
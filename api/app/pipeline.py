@@ -0,0 +1,387 @@
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable
+
+from pydantic import BaseModel
+from slugify import slugify
+
+from app.lib.article_content import (
+    ARTICLE_TO_MARKDOWN_PROMPT_4,
+    ArticleMetadata,
+    article_to_markdown,
+    extract_article_metadata,
+)
+from app.lib.llm_client import Models
+from app.lib.llm_router import RoutingLLMClient
+from app.lib.llm_response_cache import LLM_RESPONSE_CACHE
+from app.lib.metrics import record_timing, timed
+from app.lib.result_cache import RESULT_CACHE, make_cache_key
+from app.lib.single_flight import SingleFlight
+from app.lib.stage_graph import Stage, StageGraph
+from app.lib.summarization import (
+    SUMMARIZE_PROMPT_1,
+    astream_summary,
+    summarize_content,
+)
+from app.lib.transcription import (
+    DEFAULT_TRANSCRIPT_SOURCES,
+    IMPROVE_TRANSCRIPT_PROMPT_1,
+    TranscriptSource,
+    VideoTranscriber,
+)
+from app.lib.video_content import (
+    VideoMetadata,
+    extract_video_metadata,
+    get_video_transcript,
+)
+from app.lib.web_document import WebDocument
+from app.utils import (
+    is_direct_audio_url,
+    is_direct_video_url,
+    is_youtube_url,
+)
+
+# Each stage routes over equivalent models from different providers, in order of
+# preference, failing over (and hedging slow requests) when the preferred one misbehaves
+TRANSCRIPT_READABILITY_LLM_CLIENT = RoutingLLMClient(
+    models=[
+        Models.GEMINI_2_5_FLASH_LITE_PREVIEW,
+        Models.GPT_4_1_NANO_2025_04_14,
+        Models.OR_GPT_4O_MINI,
+    ],
+    system_prompt=IMPROVE_TRANSCRIPT_PROMPT_1,
+    log_key="improve-transcript-readability",
+    response_cache=LLM_RESPONSE_CACHE,
+)
+
+# Structured responses are only supported by OpenAI, so there is no other provider to fall back to
+ARTICLE_METADATA_LLM_CLIENT = RoutingLLMClient(
+    models=[Models.GPT_4_1_NANO_2025_04_14, Models.GPT_4O_MINI],
+    system_prompt="You are an expert at extracting metadata from articles.",
+    log_key="extract-article-metadata",
+    response_cache=LLM_RESPONSE_CACHE,
+)
+
+ARTICLE_TO_MARKDOWN_LLM_CLIENT = RoutingLLMClient(
+    models=[
+        Models.GPT_4_1_MINI_2025_04_14,
+        # Models.GPT_5_MINI,
+        # Models.GPT_5,
+        Models.OR_GPT_4_1_MINI,
+        Models.GEMINI_2_5_FLASH,
+    ],
+    system_prompt=ARTICLE_TO_MARKDOWN_PROMPT_4,
+    log_key="article-to-markdown",
+    response_cache=LLM_RESPONSE_CACHE,
+)
+
+SUMMARIZE_LLM_CLIENT = RoutingLLMClient(
+    models=[
+        Models.GEMINI_2_5_FLASH_LITE_PREVIEW,
+        Models.GPT_4_1_NANO_2025_04_14,
+        Models.OR_GPT_4O_MINI,
+    ],
+    system_prompt=SUMMARIZE_PROMPT_1,
+    log_key="summarize-content",
+    response_cache=LLM_RESPONSE_CACHE,
+)
+
+# Every LLM stage of the /smrz pipeline; changing any of them invalidates cached results
+PIPELINE_LLM_CLIENTS = [
+    TRANSCRIPT_READABILITY_LLM_CLIENT,
+    ARTICLE_METADATA_LLM_CLIENT,
+    ARTICLE_TO_MARKDOWN_LLM_CLIENT,
+    SUMMARIZE_LLM_CLIENT,
+]
+
+
+class PipelineOptions(BaseModel):
+    """
+    Per-request pipeline settings. They are part of the result cache key.
+    """
+
+    # Transcript sources to try, in order, for videos
+    transcript_sources: list[TranscriptSource] = DEFAULT_TRANSCRIPT_SOURCES
+
+
+class SummaryResult(BaseModel):
+    metadata: ArticleMetadata | VideoMetadata
+    content: str
+    summary: str
+    transcript_source: TranscriptSource | None = None  # only set for videos
+    timings: dict[str, float]  # seconds spent in each pipeline stage
+
+    def to_response(self) -> dict[str, Any]:
+        return {
+            "metadata": self.metadata.model_dump(mode="json"),
+            "content": self.content,
+            "summary": self.summary,
+            "transcript_source": self.transcript_source,
+        }
+
+
+def is_video_url(url: str) -> bool:
+    return is_youtube_url(url) or is_direct_video_url(url) or is_direct_audio_url(url)
+
+
+def build_content_graph(url: str, options: PipelineOptions) -> StageGraph:
+    """
+    Build the stage graph that fetches the given URL and extracts its metadata and content.
+    Metadata extraction and content extraction do not depend on each other and run in parallel.
+    """
+    return StageGraph(_content_stages(url, options), log_key="smrz")
+
+
+def build_summary_graph(url: str, options: PipelineOptions) -> StageGraph:
+    """
+    Build the stage graph that fetches, converts and summarizes the content at the given URL.
+    """
+    stages = _content_stages(url, options)
+    stages += [
+        Stage(
+            "summary",
+            lambda metadata, content: (
+                f"# {metadata.title}\n\n"
+                + summarize_content(llm_client=SUMMARIZE_LLM_CLIENT, content=content)
+            ),
+            depends_on=["metadata", "content"],
+        ),
+        Stage(
+            "artifacts",
+            write_artifacts,
+            depends_on=["metadata", "content", "summary"]
+            + (["fetch"] if not is_video_url(url) else []),
+        ),
+    ]
+
+    return StageGraph(stages, log_key="smrz")
+
+
+def run_summary_pipeline(
+    url: str,
+    options: PipelineOptions = PipelineOptions(),
+    on_stage_complete: Callable[[str, Any], None] | None = None,
+) -> SummaryResult:
+    """
+    Run the whole summarization pipeline for the given URL.
+    """
+    graph_result = build_summary_graph(url, options).run(
+        on_stage_complete=on_stage_complete
+    )
+    return SummaryResult(
+        metadata=graph_result.results["metadata"],
+        content=graph_result.results["content"],
+        summary=graph_result.results["summary"],
+        transcript_source=_transcript_source(graph_result.results),
+        timings=graph_result.timings,
+    )
+
+
+# Concurrent requests for the same URL and options share a single pipeline run, whether they
+# come from /smrz, /smrz/batch or a background job
+SUMMARY_FLIGHTS = SingleFlight[dict[str, Any]]()
+
+
+def summarize_url(
+    url: str,
+    options: PipelineOptions,
+    refresh: bool = False,
+    on_stage_complete: Callable[[str, Any], None] | None = None,
+) -> dict[str, Any]:
+    """
+    Summarize the content from the given URL, going through the result cache and joining
+    any identical request that is already running. `on_stage_complete` is only called when
+    this call runs the pipeline itself.
+    """
+    cache_key = make_cache_key(
+        url, PIPELINE_LLM_CLIENTS, options.model_dump(mode="json")
+    )
+    if not refresh:
+        with timed("result_cache"):
+            cached_result = RESULT_CACHE.get(cache_key)
+        if cached_result is not None:
+            return cached_result
+
+    def run_and_cache() -> dict[str, Any]:
+        result = run_summary_pipeline(
+            url, options, on_stage_complete=on_stage_complete
+        ).to_response()
+        with timed("result_cache_write"):
+            RESULT_CACHE.set(cache_key, url, result)
+        return result
+
+    return SUMMARY_FLIGHTS.do(cache_key, run_and_cache)
+
+
+class PipelineEvent(BaseModel):
+    event: str
+    data: dict[str, Any]
+
+
+async def astream_summary_pipeline(
+    url: str, options: PipelineOptions = PipelineOptions()
+) -> AsyncIterator[PipelineEvent]:
+    """
+    Run the summarization pipeline for the given URL, yielding a `stage` event as each
+    content stage finishes, `summary` events as summary tokens arrive and a final `done`
+    event with the full result, the summary's token usage and its cost.
+    """
+    loop = asyncio.get_running_loop()
+    stage_results: asyncio.Queue[tuple[str, Any] | None] = asyncio.Queue()
+
+    def on_stage_complete(name: str, result: Any):
+        loop.call_soon_threadsafe(stage_results.put_nowait, (name, result))
+
+    content_task = asyncio.ensure_future(
+        asyncio.to_thread(build_content_graph(url, options).run, on_stage_complete)
+    )
+    content_task.add_done_callback(lambda _: stage_results.put_nowait(None))
+
+    while (item := await stage_results.get()) is not None:
+        name, result = item
+        yield PipelineEvent(event="stage", data=_stage_event_data(name, result))
+
+    graph_result = await content_task
+    metadata = graph_result.results["metadata"]
+    content = graph_result.results["content"]
+    timings = dict(graph_result.timings)
+
+    start_time = time.time()
+    title = f"# {metadata.title}\n\n"
+    yield PipelineEvent(event="summary", data={"delta": title})
+
+    summary_response = None
+    async for chunk in astream_summary(
+        llm_client=SUMMARIZE_LLM_CLIENT, content=content
+    ):
+        if chunk.delta:
+            yield PipelineEvent(event="summary", data={"delta": chunk.delta})
+        if chunk.response:
+            summary_response = chunk.response
+
+    if summary_response is None:
+        raise RuntimeError("Failed to summarize content: the stream ended early")
+    timings["summary"] = time.time() - start_time
+    record_timing("summary", timings["summary"])
+
+    result = SummaryResult(
+        metadata=metadata,
+        content=content,
+        summary=title + summary_response.content,
+        transcript_source=_transcript_source(graph_result.results),
+        timings=timings,
+    )
+
+    start_time = time.time()
+    await asyncio.to_thread(
+        write_artifacts,
+        metadata=result.metadata,
+        content=result.content,
+        summary=result.summary,
+        fetch=graph_result.results.get("fetch"),
+    )
+    result.timings["artifacts"] = time.time() - start_time
+    record_timing("artifacts", result.timings["artifacts"])
+
+    yield PipelineEvent(
+        event="done",
+        data={
+            **result.to_response(),
+            "usage": {
+                "model": summary_response.model,
+                "input_tokens": summary_response.input_tokens,
+                "output_tokens": summary_response.output_tokens,
+            },
+            "cost": summary_response.cost,
+            "timings": result.timings,
+        },
+    )
+
+
+def _stage_event_data(name: str, result: Any) -> dict[str, Any]:
+    if name == "metadata":
+        return {"stage": name, "metadata": result.model_dump(mode="json")}
+    if name == "content":
+        return {"stage": name, "content": result}
+    if name == "transcript":
+        return {"stage": name, "transcript_source": result.source}
+    return {"stage": name}
+
+
+def _transcript_source(results: dict[str, Any]) -> TranscriptSource | None:
+    transcript = results.get("transcript")
+    return transcript.source if transcript else None
+
+
+def write_artifacts(
+    metadata: ArticleMetadata | VideoMetadata,
+    content: str,
+    summary: str,
+    fetch: WebDocument | None = None,
+):
+    """
+    Write the cleaned HTML (for articles), the content and the summary to the output directory.
+    """
+    now_str = datetime.now().isoformat()
+    title_slug = slugify(metadata.title)
+    output_dir = os.path.join("output", f"{now_str}_{title_slug}")
+    os.makedirs(output_dir, exist_ok=True)
+
+    if fetch:
+        with open(os.path.join(output_dir, f"{title_slug}_clean.html"), "w+") as f:
+            f.write(fetch.clean_html)
+
+    with open(os.path.join(output_dir, f"{title_slug}.md"), "w+") as f:
+        f.write(content)
+
+    with open(os.path.join(output_dir, f"{title_slug}_summary.md"), "w+") as f:
+        f.write(summary)
+
+
+def _content_stages(url: str, options: PipelineOptions) -> list[Stage]:
+    if is_video_url(url):
+        return [
+            Stage("metadata", lambda: extract_video_metadata(url)),
+            Stage(
+                "transcript",
+                lambda: get_video_transcript(
+                    VideoTranscriber(
+                        transcript_readability_llm_client=TRANSCRIPT_READABILITY_LLM_CLIENT,
+                    ),
+                    url,
+                    sources=options.transcript_sources,
+                ),
+            ),
+            Stage(
+                "content",
+                lambda transcript: transcript.content,
+                depends_on=["transcript"],
+            ),
+        ]
+
+    return [
+        Stage("fetch", lambda: _fetch_document(url)),
+        Stage(
+            "metadata",
+            lambda fetch: extract_article_metadata(
+                document=fetch,
+                fallback_llm_client=ARTICLE_METADATA_LLM_CLIENT,
+            ),
+            depends_on=["fetch"],
+        ),
+        Stage(
+            "content",
+            lambda fetch: article_to_markdown(
+                llm_client=ARTICLE_TO_MARKDOWN_LLM_CLIENT,
+                document=fetch,
+            ),
+            depends_on=["fetch"],
+        ),
+    ]
+
+
+def _fetch_document(url: str) -> WebDocument:
+    # Clean the HTML up front, since the stages that run next share it
+    return WebDocument.fetch(url).prepare()
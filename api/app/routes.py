@@ -1,134 +1,306 @@
-import os
-from datetime import datetime
-
-from fastapi import APIRouter, status
-from fastapi.responses import JSONResponse
-from slugify import slugify
-
-from app import utils
-from app.lib.article_content import (
-    ARTICLE_TO_MARKDOWN_PROMPT_3,
-    ARTICLE_TO_MARKDOWN_PROMPT_4,
-    article_to_markdown,
-    extract_article_metadata,
+import asyncio
+import contextvars
+import functools
+import json
+import urllib.parse
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Annotated, Any
+
+from fastapi import APIRouter, Query, status
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
+
+from app.jobs import SUMMARY_JOB_RUNNER
+from app.lib.http_client import HTTP_CLIENT
+from app.lib.llm_response_cache import LLM_RESPONSE_CACHE
+from app.lib.metrics import (
+    CACHE_STATS,
+    PROMETHEUS_CONTENT_TYPE,
+    render_metrics,
 )
-from app.lib.llm_client import LLMClient, Models
-from app.lib.summarization import SUMMARIZE_PROMPT_1, summarize_content
-from app.lib.transcription import IMPROVE_TRANSCRIPT_PROMPT_1, VideoTranscriber
-from app.lib.video_content import extract_video_metadata, get_video_transcript
-from app.utils import (
-    is_direct_audio_url,
-    is_direct_video_url,
-    is_youtube_url,
+from app.lib.result_cache import RESULT_CACHE, make_cache_key
+from app.lib.single_flight import StreamSingleFlight
+from app.lib.transcription import DEFAULT_TRANSCRIPT_SOURCES, TranscriptSource
+from app.lib.whisper_pool import TranscriptionPoolFullError
+from app.lib.youtube_metadata import YOUTUBE_METADATA_PROVIDER
+from app.pipeline import (
+    PIPELINE_LLM_CLIENTS,
+    PipelineEvent,
+    PipelineOptions,
+    astream_summary_pipeline,
+    summarize_url,
 )
 
 router = APIRouter()
 
+# How long clients should wait before retrying when every transcription worker is busy
+TRANSCRIPTION_RETRY_AFTER_SECONDS = "30"
+
+# Concurrent streams for the same URL and options share a single pipeline run
+SUMMARY_STREAM_FLIGHTS = StreamSingleFlight[PipelineEvent]()
+
 
 @router.get("/")
 def index():
     return "fine, i'll do it myself"
 
 
+@router.get("/cache/stats")
+def cache_stats():
+    """
+    Returns the hit/miss counters of the /smrz result cache.
+    """
+    return JSONResponse(RESULT_CACHE.stats(), status_code=status.HTTP_200_OK)
+
+
+CACHE_STATS.add("result", lambda: (RESULT_CACHE.hits, RESULT_CACHE.misses))
+if LLM_RESPONSE_CACHE is not None:
+    CACHE_STATS.add(
+        "llm_response", lambda: (LLM_RESPONSE_CACHE.hits, LLM_RESPONSE_CACHE.misses)
+    )
+CACHE_STATS.add(
+    "youtube_metadata",
+    lambda: (YOUTUBE_METADATA_PROVIDER.hits, YOUTUBE_METADATA_PROVIDER.misses),
+)
+CACHE_STATS.add(
+    "http_revalidation",
+    lambda: (HTTP_CLIENT.revalidation_hits, HTTP_CLIENT.revalidation_misses),
+)
+
+
+@router.get("/metrics")
+def metrics():
+    """
+    Returns the pipeline, LLM and cache metrics in the Prometheus text format.
+    """
+    return Response(render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
 @router.get("/smrz")
-def summarize(url: str):
+def summarize(
+    url: str,
+    refresh: bool = False,
+    transcript_sources: Annotated[
+        list[TranscriptSource], Query()
+    ] = DEFAULT_TRANSCRIPT_SOURCES,
+):
     """
     Summarize the content from the given URL.
+    Results are served from the result cache unless `refresh` is set.
+    For videos, `transcript_sources` are tried in order until one succeeds.
     """
     # Check if url is valid
     if not url.startswith(("http://", "https://")):
         return {"error": "Invalid URL. Please provide a valid URL."}
 
     try:
-        clean_html = None
-        if is_youtube_url(url) or is_direct_video_url(url) or is_direct_audio_url(url):
-            video_transcriber = VideoTranscriber(
-                transcript_readability_llm_client=LLMClient(
-                    model=Models.GEMINI_2_5_FLASH_LITE_PREVIEW,
-                    system_prompt=IMPROVE_TRANSCRIPT_PROMPT_1,
-                ),
-            )
+        result = summarize_url(
+            url, PipelineOptions(transcript_sources=transcript_sources), refresh
+        )
+        return JSONResponse(result, status_code=status.HTTP_200_OK)
+    except TranscriptionPoolFullError as e:
+        return JSONResponse(
+            {"error": str(e)},
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={"Retry-After": TRANSCRIPTION_RETRY_AFTER_SECONDS},
+        )
+    except RuntimeError as e:
+        return JSONResponse(
+            {"error": str(e)},
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+    except Exception as e:
+        return JSONResponse(
+            {"error": f"An unexpected error occurred: {str(e)}"},
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
 
-            metadata = extract_video_metadata(url)
-            content = get_video_transcript(video_transcriber, url)
-        else:
-            clean_html = utils.get_clean_html(url)
-            metadata = extract_article_metadata(
-                url=url,
-                content=clean_html,
-                fallback_llm_client=LLMClient(
-                    model=Models.GPT_4_1_NANO_2025_04_14,
-                    system_prompt="You are an expert at extracting metadata from articles.",
-                    log_key="extract-article-metadata",
-                ),
-            )
-            content = article_to_markdown(
-                llm_client=LLMClient(
-                    model=Models.GPT_4_1_MINI_2025_04_14,
-                    # model=Models.GPT_5_MINI,
-                    # model=Models.GPT_5,
-                    system_prompt=ARTICLE_TO_MARKDOWN_PROMPT_4,
-                    log_key="article-to-markdown",
-                ),
-                url=url,
-            )
 
-        summary = f"# {metadata.title}\n\n" + summarize_content(
-            llm_client=LLMClient(
-                model=Models.GEMINI_2_5_FLASH_LITE_PREVIEW,
-                # model=Models.GPT_4_1_NANO_2025_04_14,
-                system_prompt=SUMMARIZE_PROMPT_1,
-                log_key="summarize-content",
-            ),
-            content=content,
-        )
+class BatchSummarizeRequest(BaseModel):
+    urls: list[str] = Field(min_length=1, max_length=1000)
+    refresh: bool = False
+    transcript_sources: list[TranscriptSource] = DEFAULT_TRANSCRIPT_SOURCES
+    # Maximum number of URLs summarized at once, in total and per origin host
+    max_concurrency: int = Field(default=8, ge=1, le=64)
+    max_concurrency_per_host: int = Field(default=2, ge=1, le=64)
 
-        #######################################################################
 
-        now_str = datetime.now().isoformat()
-        title_slug = slugify(metadata.title)
+@router.post("/smrz/batch")
+async def summarize_batch(request: BatchSummarizeRequest):
+    """
+    Summarize many URLs with bounded concurrency, streaming one JSON line per URL (NDJSON)
+    in completion order. Every line has the URL and its `index` in the request, plus either
+    the `result` (as returned by /smrz) or an `error`. LLM calls are also limited per provider,
+    process-wide, by the LLM_MAX_CONCURRENT_REQUESTS settings.
+    """
+    options = PipelineOptions(transcript_sources=request.transcript_sources)
+    # A batch runs on its own threads rather than the event loop's default executor, so it
+    # cannot starve the threads used by other requests
+    executor = ThreadPoolExecutor(
+        max_workers=request.max_concurrency, thread_name_prefix="smrz-batch"
+    )
+    batch_limit = asyncio.Semaphore(request.max_concurrency)
+    host_limits = defaultdict(
+        lambda: asyncio.Semaphore(request.max_concurrency_per_host)
+    )
 
-        clean_html_path = os.path.join(
-            "output", f"{now_str}_{title_slug}", f"{title_slug}_clean.html"
-        )
-        content_output_path = os.path.join(
-            "output", f"{now_str}_{title_slug}", f"{title_slug}.md"
-        )
-        summary_output_path = os.path.join(
-            "output", f"{now_str}_{title_slug}", f"{title_slug}_summary.md"
-        )
+    async def summarize_item(index: int, url: str) -> dict[str, Any]:
+        item: dict[str, Any] = {"index": index, "url": url}
+        if not url.startswith(("http://", "https://")):
+            return {**item, "error": "Invalid URL. Please provide a valid URL."}
 
-        os.makedirs(os.path.dirname(clean_html_path), exist_ok=True)
-        os.makedirs(os.path.dirname(content_output_path), exist_ok=True)
-        os.makedirs(os.path.dirname(summary_output_path), exist_ok=True)
+        try:
+            async with host_limits[urllib.parse.urlsplit(url).hostname], batch_limit:
+                result = await asyncio.get_running_loop().run_in_executor(
+                    executor,
+                    functools.partial(
+                        contextvars.copy_context().run,
+                        summarize_url,
+                        url,
+                        options,
+                        request.refresh,
+                    ),
+                )
+            return {**item, "result": result}
+        except RuntimeError as e:
+            return {**item, "error": str(e)}
+        except Exception as e:
+            return {**item, "error": f"An unexpected error occurred: {str(e)}"}
 
-        if clean_html:
-            with open(clean_html_path, "w+") as f:
-                f.write(clean_html)
+    async def result_lines():
+        tasks = [
+            asyncio.create_task(summarize_item(index, url))
+            for index, url in enumerate(request.urls)
+        ]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield json.dumps(await task) + "\n"
+        finally:
+            # Stop the remaining work if the client goes away
+            for task in tasks:
+                task.cancel()
+            executor.shutdown(wait=False, cancel_futures=True)
 
-        with open(content_output_path, "w+") as f:
-            f.write(content)
+    return StreamingResponse(result_lines(), media_type="application/x-ndjson")
 
-        with open(summary_output_path, "w+") as f:
-            f.write(summary)
 
-        #######################################################################
+@router.get("/summarize/stream")
+async def summarize_stream(
+    url: str,
+    refresh: bool = False,
+    transcript_sources: Annotated[
+        list[TranscriptSource], Query()
+    ] = DEFAULT_TRANSCRIPT_SOURCES,
+):
+    """
+    Stream the summary of the content from the given URL as Server-Sent Events.
+    Emits a `stage` event as each pipeline stage finishes, `summary` events with the
+    summary tokens as they are generated, and a final `done` event with the full result,
+    usage and cost (or an `error` event if the pipeline fails).
+    """
+    # Check if url is valid
+    if not url.startswith(("http://", "https://")):
+        return {"error": "Invalid URL. Please provide a valid URL."}
 
+    options = PipelineOptions(transcript_sources=transcript_sources)
+
+    async def event_stream():
+        try:
+            cache_key = make_cache_key(
+                url, PIPELINE_LLM_CLIENTS, options.model_dump(mode="json")
+            )
+            if not refresh:
+                cached_result = await asyncio.to_thread(RESULT_CACHE.get, cache_key)
+                if cached_result is not None:
+                    yield _sse(
+                        "stage",
+                        {"stage": "metadata", "metadata": cached_result["metadata"]},
+                    )
+                    yield _sse(
+                        "stage",
+                        {"stage": "content", "content": cached_result["content"]},
+                    )
+                    yield _sse("summary", {"delta": cached_result["summary"]})
+                    yield _sse("done", {**cached_result, "cached": True})
+                    return
+
+            async def stream_and_cache():
+                async for event in astream_summary_pipeline(url, options):
+                    if event.event == "done":
+                        result = {
+                            "metadata": event.data["metadata"],
+                            "content": event.data["content"],
+                            "summary": event.data["summary"],
+                            "transcript_source": event.data["transcript_source"],
+                        }
+                        await asyncio.to_thread(
+                            RESULT_CACHE.set, cache_key, url, result
+                        )
+                    yield event
+
+            async for event in SUMMARY_STREAM_FLIGHTS.subscribe(
+                cache_key, stream_and_cache
+            ):
+                yield _sse(event.event, event.data)
+        except RuntimeError as e:
+            yield _sse("error", {"error": str(e)})
+        except Exception as e:
+            yield _sse("error", {"error": f"An unexpected error occurred: {str(e)}"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+class JobRequest(BaseModel):
+    url: str
+    refresh: bool = False
+    transcript_sources: list[TranscriptSource] = DEFAULT_TRANSCRIPT_SOURCES
+
+
+@router.post("/jobs")
+def submit_job(request: JobRequest):
+    """
+    Start summarizing the content from the given URL in the background and return the job
+    right away. Submitting a URL that already has an unfinished job returns that job.
+    """
+    # Check if url is valid
+    if not request.url.startswith(("http://", "https://")):
         return JSONResponse(
-            {
-                "metadata": metadata.model_dump(mode="json"),
-                "content": content,
-                "summary": summary,
-            },
-            status_code=status.HTTP_200_OK,
-        )
-    except RuntimeError as e:
-        return JSONResponse(
-            {"error": str(e)},
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            {"error": "Invalid URL. Please provide a valid URL."},
+            status_code=status.HTTP_400_BAD_REQUEST,
         )
-    except Exception as e:
+
+    job, created = SUMMARY_JOB_RUNNER.submit(
+        request.url,
+        PipelineOptions(transcript_sources=request.transcript_sources),
+        refresh=request.refresh,
+    )
+    return JSONResponse(
+        job.to_response(),
+        status_code=status.HTTP_202_ACCEPTED if created else status.HTTP_200_OK,
+    )
+
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """
+    Return the status, progress and (once it succeeded) the result of a job.
+    """
+    job = SUMMARY_JOB_RUNNER.get(job_id)
+    if job is None:
         return JSONResponse(
-            {"error": f"An unexpected error occurred: {str(e)}"},
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            {"error": "Job not found."}, status_code=status.HTTP_404_NOT_FOUND
         )
+
+    return JSONResponse(job.to_response(), status_code=status.HTTP_200_OK)
+
+
+def _sse(event: str, data: dict[str, Any]) -> str:
+    """
+    Format a Server-Sent Event.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
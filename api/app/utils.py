@@ -1,9 +1,10 @@
 import datetime
 import re
-import requests
 from lxml_html_clean import Cleaner
 from dateutil import parser
 
+from app.lib.http_client import HTTP_CLIENT
+
 #############################################################################
 ################################# YOUTUBE ###################################
 #############################################################################
@@ -52,12 +53,21 @@ def parse_youtube_video_id(url: str) -> str:
 #############################################################################
 
 
-def get_clean_html(url: str) -> str:
+def fetch_html(url: str) -> str:
     """
-    Fetches the HTML content from the specified URL and returns a cleaned version of the HTML.
+    Fetches the raw HTML content from the specified URL.
+    """
+    try:
+        return HTTP_CLIENT.get(url).text
+    except Exception as e:
+        raise RuntimeError(f"Failed to fetch HTML content from {url}: {e}")
+
+
+def clean_html(html: str) -> str:
+    """
+    Returns a cleaned version of the given HTML (scripts, styles and other unsafe markup removed).
     """
     try:
-        html = requests.get(url, headers={"User-Agent": "Mozilla/5.0"}).text
         cleaner = Cleaner()
         cleaned_html = cleaner.clean_html(html)
         # Remove all empty lines and trim all lines
@@ -66,7 +76,14 @@ def get_clean_html(url: str) -> str:
         )
         return cleaned_html
     except Exception:
-        raise RuntimeError("Failed to fetch or clean HTML content")
+        raise RuntimeError("Failed to clean HTML content")
+
+
+def get_clean_html(url: str) -> str:
+    """
+    Fetches the HTML content from the specified URL and returns a cleaned version of the HTML.
+    """
+    return clean_html(fetch_html(url))
 
 
 def clean_markdown(markdown: str) -> str:
@@ -119,7 +136,7 @@ def get_json_from_url(url: str) -> dict[str, str]:
     Fetch JSON data from a URL.
     """
     try:
-        response = requests.get(url)
+        response = HTTP_CLIENT.get(url)
         response.raise_for_status()
         return response.json()
     except Exception as e:
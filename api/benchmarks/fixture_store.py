@@ -0,0 +1,134 @@
+import http.server
+import json
+import math
+import os
+import struct
+import threading
+import wave
+from dataclasses import dataclass
+from functools import cached_property
+
+from app.lib.web_document import WebDocument
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+MASTERS_DIR = os.path.join(os.path.dirname(__file__), "..", "masters")
+
+AUDIO_SAMPLE_RATE = 16000
+
+# Short synthetic clips (name -> seconds): long enough to exercise decoding and Whisper,
+# short enough to keep a benchmark run quick
+AUDIO_CLIPS = {"clip-5s": 5, "clip-30s": 30}
+
+
+@dataclass
+class PageFixture:
+    name: str
+    # The URL the page was captured from
+    url: str
+    page: str
+    # The reference Markdown for the article, in masters/
+    master: str | None = None
+
+    @cached_property
+    def html(self) -> str:
+        with open(os.path.join(FIXTURES_DIR, self.page)) as f:
+            return f.read()
+
+    @cached_property
+    def master_markdown(self) -> str | None:
+        if not self.master:
+            return None
+        with open(os.path.join(MASTERS_DIR, self.master)) as f:
+            return f.read()
+
+    def document(self) -> WebDocument:
+        return WebDocument(url=self.url, raw_html=self.html)
+
+
+def load_page_fixtures() -> list[PageFixture]:
+    with open(os.path.join(FIXTURES_DIR, "pages.json")) as f:
+        return [PageFixture(**entry) for entry in json.load(f)]
+
+
+def write_audio_clip(path: str, seconds: float):
+    """
+    Write a 16 kHz mono WAV clip of a few alternating tones. The clips are generated rather
+    than stored, so they are identical on every machine without adding binaries to the repo.
+    """
+    frames = bytearray()
+    for i in range(int(seconds * AUDIO_SAMPLE_RATE)):
+        frequency = 220 * (1 + (i // AUDIO_SAMPLE_RATE) % 3)
+        sample = 0.3 * math.sin(2 * math.pi * frequency * i / AUDIO_SAMPLE_RATE)
+        frames += struct.pack("<h", int(sample * 32767))
+
+    with wave.open(path, "wb") as clip:
+        clip.setnchannels(1)
+        clip.setsampwidth(2)
+        clip.setframerate(AUDIO_SAMPLE_RATE)
+        clip.writeframes(bytes(frames))
+
+
+class FixtureServer:
+    """
+    Serves the page fixtures (at /pages/<name>) and the audio clips (at /audio/<name>.wav)
+    over local HTTP, so benchmarks go through the same fetch path as live requests.
+    """
+
+    def __init__(self, pages: list[PageFixture], audio_dir: str):
+        self.pages = {page.name: page for page in pages}
+        self.audio_dir = audio_dir
+        for name, seconds in AUDIO_CLIPS.items():
+            path = os.path.join(audio_dir, f"{name}.wav")
+            if not os.path.exists(path):
+                write_audio_clip(path, seconds)
+
+        self._server = http.server.ThreadingHTTPServer(
+            ("127.0.0.1", 0), self._handler()
+        )
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def page_url(self, page: PageFixture) -> str:
+        return f"{self.base_url}/pages/{page.name}"
+
+    def audio_url(self, name: str) -> str:
+        return f"{self.base_url}/audio/{name}.wav"
+
+    def start(self) -> "FixtureServer":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self) -> type[http.server.BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                kind, _, name = self.path.strip("/").partition("/")
+                if kind == "pages" and name in server.pages:
+                    self._send(
+                        server.pages[name].html.encode(), "text/html; charset=utf-8"
+                    )
+                elif kind == "audio" and f"{name.removesuffix('.wav')}" in AUDIO_CLIPS:
+                    with open(os.path.join(server.audio_dir, name), "rb") as f:
+                        self._send(f.read(), "audio/wav")
+                else:
+                    self.send_error(404)
+
+            def _send(self, body: bytes, content_type: str):
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
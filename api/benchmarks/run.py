@@ -0,0 +1,337 @@
+"""
+Offline benchmark of the summarization pipeline. Pages come from the local fixture store,
+audio from generated clips and every LLM call goes to a local OpenAI-compatible stub server,
+so runs are repeatable and can be compared between commits:
+
+    uv run python -m benchmarks.run --json before.json
+    uv run python -m benchmarks.run --compare before.json
+"""
+
+import argparse
+import contextlib
+import difflib
+import functools
+import io
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from benchmarks.stub_llm_server import StubLLMServer
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        nargs="+",
+        default=[1, 4, 16],
+        help="concurrency levels of the throughput benchmark",
+    )
+    parser.add_argument(
+        "--throughput-runs",
+        type=int,
+        default=16,
+        help="pipeline runs per concurrency level",
+    )
+    parser.add_argument("--llm-latency-ms", type=float, default=200)
+    parser.add_argument("--llm-tokens-per-second", type=float, default=500)
+    parser.add_argument("--llm-output-tokens", type=int, default=300)
+    parser.add_argument(
+        "--whisper",
+        action="store_true",
+        help="also transcribe the audio clips with Whisper (needs ffmpeg and a model)",
+    )
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="compare with the results in this file")
+    parser.add_argument(
+        "--verbose", action="store_true", help="keep the pipeline's own log output"
+    )
+    args = parser.parse_args()
+
+    stub = StubLLMServer(
+        latency_seconds=args.llm_latency_ms / 1000,
+        tokens_per_second=args.llm_tokens_per_second,
+        output_tokens=args.llm_output_tokens,
+    ).start()
+    workdir = tempfile.mkdtemp(prefix="smrz-benchmark-")
+    _configure_environment(stub, workdir)
+
+    # The app reads its configuration at import time, so import it only now
+    sys.path.insert(0, API_DIR)
+    from benchmarks.fixture_store import FixtureServer, load_page_fixtures
+
+    pages = load_page_fixtures()
+    fixture_server = FixtureServer(pages, audio_dir=workdir).start()
+    # Artifacts and caches are written relative to the working directory
+    os.chdir(workdir)
+
+    results: dict[str, Any] = {
+        "config": {
+            key: value
+            for key, value in vars(args).items()
+            if key not in {"json", "compare", "verbose"}
+        }
+    }
+    output = contextlib.nullcontext() if args.verbose else _quiet()
+    try:
+        with output:
+            results["get_clean_html"] = bench_clean_html(
+                pages, fixture_server, args.iterations
+            )
+            results["article_to_markdown"] = bench_article_to_markdown(
+                pages, args.iterations
+            )
+            results["pipeline"] = bench_pipeline(pages, fixture_server, args.iterations)
+            results["throughput"] = {
+                str(concurrency): bench_throughput(
+                    pages, fixture_server, concurrency, args.throughput_runs
+                )
+                for concurrency in args.concurrency
+            }
+            results["transcription"] = (
+                bench_transcription(fixture_server)
+                if args.whisper
+                else {"skipped": "run with --whisper"}
+            )
+    finally:
+        fixture_server.stop()
+        stub.stop()
+
+    results["llm"] = stub.stats()
+    results["peak_rss_mb"] = {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+    }
+
+    print(json.dumps(results, indent=2))
+    if args.json:
+        with open(os.path.join(API_DIR, args.json), "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(os.path.join(API_DIR, args.compare)) as f:
+            print_comparison(json.load(f), results)
+
+
+def _configure_environment(stub: StubLLMServer, workdir: str):
+    for provider in ("OPENAI", "GEMINI", "OPENROUTER"):
+        os.environ[f"{provider}_BASE_URL"] = stub.base_url
+        os.environ[f"{provider}_API_KEY"] = "benchmark"
+    # Measure the work itself, not the caches in front of it
+    os.environ["LLM_CACHE_ENABLED"] = "false"
+    os.environ["HTTP_CACHE_ENABLED"] = "false"
+    os.environ["SMRZ_CACHE_PATH"] = os.path.join(workdir, "cache", "results.db")
+    os.environ.setdefault("WHISPER_MODEL_SIZE", "tiny")
+    os.environ.setdefault("WHISPER_POOL_SIZE", "1")
+
+
+@contextlib.contextmanager
+def _quiet():
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def _time_ms(fn: Callable[[], Any]) -> tuple[Any, float]:
+    start_time = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start_time) * 1000
+
+
+def bench_clean_html(pages, fixture_server, iterations: int) -> dict[str, float]:
+    from app.utils import get_clean_html
+
+    results = {}
+    for page in pages:
+        fetch = functools.partial(get_clean_html, fixture_server.page_url(page))
+        results[page.name] = statistics.mean(
+            _time_ms(fetch)[1] for _ in range(iterations)
+        )
+    return results
+
+
+def bench_article_to_markdown(pages, iterations: int) -> dict[str, dict[str, Any]]:
+    """
+    Time the default conversion of every page (local when it is accepted, LLM otherwise)
+    and the LLM-only conversion, and score the default conversion against the page's
+    reference Markdown (1.0 is identical).
+    """
+    from app.lib.article_content import (
+        ARTICLE_TO_MARKDOWN_PROMPT_4,
+        article_to_markdown,
+    )
+    from app.lib.html_to_markdown import convert_article_locally
+    from app.lib.llm_client import LLMClient, Models
+
+    # The pipeline's first-choice model, without importing the pipeline and its audio stack
+    llm_client = LLMClient(
+        model=Models.GPT_4_1_MINI_2025_04_14,
+        system_prompt=ARTICLE_TO_MARKDOWN_PROMPT_4,
+        log_key="article-to-markdown",
+    )
+
+    results = {}
+    for page in pages:
+        default_times, llm_times = [], []
+        for _ in range(iterations):
+            markdown, duration = _time_ms(
+                functools.partial(article_to_markdown, llm_client, page.document())
+            )
+            default_times.append(duration)
+            llm_times.append(
+                _time_ms(
+                    functools.partial(
+                        article_to_markdown,
+                        llm_client,
+                        page.document(),
+                        allow_local_conversion=False,
+                    )
+                )[1]
+            )
+
+        document = page.document()
+        results[page.name] = {
+            "default_ms": statistics.mean(default_times),
+            "llm_ms": statistics.mean(llm_times),
+            "local_conversion_accepted": convert_article_locally(
+                document.reduced_html.html, document.clean_html, base_url=document.url
+            ).accepted,
+            "similarity_to_master": (
+                difflib.SequenceMatcher(None, markdown, page.master_markdown).ratio()
+                if page.master_markdown
+                else None
+            ),
+        }
+    return results
+
+
+def bench_pipeline(pages, fixture_server, iterations: int) -> dict[str, Any]:
+    """
+    Run the whole pipeline on every page and report the mean time of each stage (and of
+    the timed steps inside them), as recorded for the Server-Timing header.
+    """
+    from app.lib.metrics import collect_server_timings
+    from app.pipeline import run_summary_pipeline
+
+    stage_times: dict[str, list[float]] = defaultdict(list)
+    totals = []
+    for _ in range(iterations):
+        for page in pages:
+            with collect_server_timings() as timings:
+                _, duration = _time_ms(
+                    functools.partial(
+                        run_summary_pipeline, fixture_server.page_url(page)
+                    )
+                )
+            totals.append(duration)
+            for name, seconds in timings:
+                stage_times[name].append(seconds * 1000)
+
+    return {
+        "total_ms": statistics.mean(totals),
+        "stages_ms": {
+            name: statistics.mean(times) for name, times in stage_times.items()
+        },
+    }
+
+
+def bench_throughput(
+    pages, fixture_server, concurrency: int, runs: int
+) -> dict[str, float]:
+    from app.pipeline import run_summary_pipeline
+
+    urls = [fixture_server.page_url(pages[i % len(pages)]) for i in range(runs)]
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(
+            executor.map(
+                lambda url: _time_ms(functools.partial(run_summary_pipeline, url))[1],
+                urls,
+            )
+        )
+    elapsed = time.perf_counter() - start_time
+
+    latencies.sort()
+    return {
+        "runs_per_second": runs / elapsed,
+        "p50_ms": latencies[len(latencies) // 2],
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+    }
+
+
+def bench_transcription(fixture_server) -> dict[str, Any]:
+    from app.lib.metrics import collect_server_timings
+    from app.lib.transcription import TranscriptSource, VideoTranscriber
+    from app.lib.whisper_pool import WHISPER_WORKER_POOL
+    from app.pipeline import TRANSCRIPT_READABILITY_LLM_CLIENT
+    from benchmarks.fixture_store import AUDIO_CLIPS
+
+    try:
+        _, load_ms = _time_ms(WHISPER_WORKER_POOL.load)
+    except Exception as e:
+        return {"skipped": f"Failed to load Whisper: {e}"}
+
+    results: dict[str, Any] = {"model_load_ms": load_ms}
+    transcriber = VideoTranscriber(
+        transcript_readability_llm_client=TRANSCRIPT_READABILITY_LLM_CLIENT
+    )
+    try:
+        for name, seconds in AUDIO_CLIPS.items():
+            with collect_server_timings() as timings:
+                _, duration = _time_ms(
+                    functools.partial(
+                        transcriber.transcribe_video,
+                        fixture_server.audio_url(name),
+                        sources=[TranscriptSource.WHISPER],
+                    )
+                )
+            results[name] = {
+                "total_ms": duration,
+                "steps_ms": {
+                    step: step_seconds * 1000 for step, step_seconds in timings
+                },
+                # Seconds of processing per second of audio
+                "realtime_factor": duration / 1000 / seconds,
+            }
+    except Exception as e:
+        results["error"] = str(e)
+    finally:
+        WHISPER_WORKER_POOL.close()
+    return results
+
+
+def print_comparison(before: dict[str, Any], after: dict[str, Any]):
+    """
+    Print every numeric result that both runs have, with its relative change.
+    """
+    before_values, after_values = _flatten(before), _flatten(after)
+    print(f"\n{'metric':<60} {'before':>12} {'after':>12} {'change':>9}")
+    for key, value in after_values.items():
+        if key.startswith("config.") or key not in before_values:
+            continue
+        previous = before_values[key]
+        change = f"{(value - previous) / previous * 100:+.1f}%" if previous else "n/a"
+        print(f"{key:<60} {previous:>12.2f} {value:>12.2f} {change:>9}")
+
+
+def _flatten(results: dict[str, Any], prefix: str = "") -> dict[str, float]:
+    values = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            values.update(_flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[f"{prefix}{key}"] = float(value)
+    return values
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+import http.server
+import json
+import threading
+import time
+import uuid
+from typing import Any
+
+# Words the stub's responses are made of, cycled to reach the configured token count
+STUB_WORDS = (
+    "the quick brown fox jumps over the lazy dog while the benchmark measures "
+    "every stage of the pipeline"
+).split()
+
+
+def estimate_tokens(text: str) -> int:
+    # The same rough ratio the API uses for its own estimates
+    return max(1, len(text) // 4)
+
+
+def stub_markdown(output_tokens: int) -> str:
+    words = [STUB_WORDS[i % len(STUB_WORDS)] for i in range(max(1, output_tokens - 2))]
+    paragraphs = [" ".join(words[i : i + 60]) for i in range(0, len(words), 60)]
+    return "# Stub response\n\n" + "\n\n".join(paragraphs)
+
+
+def stub_instance(schema: dict[str, Any], defs: dict[str, Any] | None = None) -> Any:
+    """
+    Build a value that satisfies a (pydantic-generated) JSON schema, for structured responses.
+    """
+    defs = defs if defs is not None else schema.get("$defs", {})
+    if "$ref" in schema:
+        return stub_instance(defs[schema["$ref"].split("/")[-1]], defs)
+    if "anyOf" in schema:
+        options = [option for option in schema["anyOf"] if option.get("type") != "null"]
+        return stub_instance(options[0], defs) if options else None
+
+    match schema.get("type"):
+        case "object":
+            return {
+                name: stub_instance(property, defs)
+                for name, property in schema.get("properties", {}).items()
+            }
+        case "array":
+            return [stub_instance(schema.get("items", {}), defs)]
+        case "integer":
+            return 0
+        case "number":
+            return 0.0
+        case "boolean":
+            return False
+        case _:
+            if schema.get("format") == "date":
+                return "2024-01-01"
+            return "stub"
+
+
+class StubLLMServer:
+    """
+    A local OpenAI-compatible server (chat completions, streamed or not, and structured
+    responses) that answers after `latency_seconds`, then produces `output_tokens` tokens at
+    `tokens_per_second`. It counts the requests and tokens it receives, so benchmarks can
+    report what would have been sent to the providers.
+    """
+
+    def __init__(
+        self,
+        latency_seconds: float = 0.2,
+        tokens_per_second: float = 500,
+        output_tokens: int = 300,
+    ):
+        self.latency_seconds = latency_seconds
+        self.tokens_per_second = tokens_per_second
+        self.output_tokens = output_tokens
+
+        self.requests = 0
+        self.input_tokens = 0
+        self.output_tokens_sent = 0
+        self._lock = threading.Lock()
+
+        self._server = http.server.ThreadingHTTPServer(
+            ("127.0.0.1", 0), self._handler()
+        )
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}/v1"
+
+    def start(self) -> "StubLLMServer":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "input_tokens": self.input_tokens,
+                "output_tokens": self.output_tokens_sent,
+            }
+
+    def _record(self, input_tokens: int, output_tokens: int):
+        with self._lock:
+            self.requests += 1
+            self.input_tokens += input_tokens
+            self.output_tokens_sent += output_tokens
+
+    def _generation_time(self, output_tokens: int) -> float:
+        return output_tokens / self.tokens_per_second if self.tokens_per_second else 0
+
+    def _handler(self) -> type[http.server.BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                if self.path.endswith("/chat/completions"):
+                    self._chat_completion(body)
+                elif self.path.endswith("/responses"):
+                    self._structured_response(body)
+                else:
+                    self.send_error(404)
+
+            def _chat_completion(self, body: dict[str, Any]):
+                input_tokens = sum(
+                    estimate_tokens(str(message.get("content", "")))
+                    for message in body.get("messages", [])
+                )
+                content = stub_markdown(server.output_tokens)
+                # Reported as configured (one word is about one token)
+                output_tokens = server.output_tokens
+                server._record(input_tokens, output_tokens)
+                time.sleep(server.latency_seconds)
+
+                completion = {
+                    "id": f"chatcmpl-{uuid.uuid4().hex}",
+                    "created": int(time.time()),
+                    "model": body.get("model", "stub"),
+                }
+                usage = {
+                    "prompt_tokens": input_tokens,
+                    "completion_tokens": output_tokens,
+                    "total_tokens": input_tokens + output_tokens,
+                }
+
+                if not body.get("stream"):
+                    time.sleep(server._generation_time(output_tokens))
+                    self._send_json(
+                        {
+                            **completion,
+                            "object": "chat.completion",
+                            "choices": [
+                                {
+                                    "index": 0,
+                                    "message": {
+                                        "role": "assistant",
+                                        "content": content,
+                                    },
+                                    "finish_reason": "stop",
+                                }
+                            ],
+                            "usage": usage,
+                        }
+                    )
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                words = content.split(" ")
+                for i, word in enumerate(words):
+                    time.sleep(server._generation_time(output_tokens) / len(words))
+                    self._send_event(
+                        {
+                            **completion,
+                            "object": "chat.completion.chunk",
+                            "choices": [
+                                {
+                                    "index": 0,
+                                    "delta": {
+                                        "content": word if i == 0 else f" {word}"
+                                    },
+                                    "finish_reason": None,
+                                }
+                            ],
+                        }
+                    )
+                self._send_event(
+                    {
+                        **completion,
+                        "object": "chat.completion.chunk",
+                        "choices": [],
+                        "usage": usage,
+                    }
+                )
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.close_connection = True
+
+            def _structured_response(self, body: dict[str, Any]):
+                input_tokens = estimate_tokens(json.dumps(body.get("input", "")))
+                schema = body.get("text", {}).get("format", {}).get("schema", {})
+                text = json.dumps(stub_instance(schema))
+                output_tokens = estimate_tokens(text)
+                server._record(input_tokens, output_tokens)
+                time.sleep(
+                    server.latency_seconds + server._generation_time(output_tokens)
+                )
+
+                self._send_json(
+                    {
+                        "id": f"resp_{uuid.uuid4().hex}",
+                        "object": "response",
+                        "created_at": int(time.time()),
+                        "model": body.get("model", "stub"),
+                        "status": "completed",
+                        "output": [
+                            {
+                                "type": "message",
+                                "id": f"msg_{uuid.uuid4().hex}",
+                                "role": "assistant",
+                                "status": "completed",
+                                "content": [
+                                    {
+                                        "type": "output_text",
+                                        "text": text,
+                                        "annotations": [],
+                                    }
+                                ],
+                            }
+                        ],
+                        "parallel_tool_calls": False,
+                        "tool_choice": "auto",
+                        "tools": [],
+                        "usage": {
+                            "input_tokens": input_tokens,
+                            "input_tokens_details": {"cached_tokens": 0},
+                            "output_tokens": output_tokens,
+                            "output_tokens_details": {"reasoning_tokens": 0},
+                            "total_tokens": input_tokens + output_tokens,
+                        },
+                    }
+                )
+
+            def _send_json(self, payload: dict[str, Any]):
+                body = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_event(self, payload: dict[str, Any]):
+                self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode())
+                self.wfile.flush()
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
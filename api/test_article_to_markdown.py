@@ -1,58 +1,60 @@
-from app.lib.article_content import ARTICLE_TO_MARKDOWN_PROMPT_2, article_to_markdown
+import difflib
+
+import pytest
+from openai import OpenAI
+
+from app.lib.article_content import ARTICLE_TO_MARKDOWN_PROMPT_4, article_to_markdown
 from app.lib.llm_client import LLMClient, Models
+from benchmarks.fixture_store import load_page_fixtures
+from benchmarks.stub_llm_server import StubLLMServer
 
+PAGES = {page.name: page for page in load_page_fixtures()}
 
-MODELS: list[Models] = [
-    Models.GEMINI_2_5_FLASH_LITE_PREVIEW,
-    Models.GEMINI_2_5_PRO,
-]
 
+@pytest.fixture(scope="module")
+def stub_llm_server():
+    server = StubLLMServer(latency_seconds=0, tokens_per_second=0, output_tokens=200)
+    yield server.start()
+    server.stop()
 
-def test_level_1():
-    url = "https://www.unkey.com/blog/uuid-ux"
-    markdown = article_to_markdown(
-        llm_client=LLMClient(
-            model=Models.GEMINI_2_5_PRO, system_prompt=ARTICLE_TO_MARKDOWN_PROMPT_2
-        ),
-        url=url,
+
+@pytest.fixture
+def llm_client(stub_llm_server):
+    llm_client = LLMClient(
+        model=Models.GEMINI_2_5_FLASH_LITE_PREVIEW,
+        system_prompt=ARTICLE_TO_MARKDOWN_PROMPT_4,
     )
+    llm_client.client = OpenAI(base_url=stub_llm_server.base_url, api_key="test")
+    return llm_client
 
 
-def test_level_2():
-    url = "https://grantslatton.com/how-to-software"
+@pytest.mark.parametrize("name", PAGES)
+def test_article_to_markdown(llm_client, name):
     markdown = article_to_markdown(
-        llm_client=LLMClient(
-            model=Models.GEMINI_2_5_PRO, system_prompt=ARTICLE_TO_MARKDOWN_PROMPT_2
-        ),
-        url=url,
+        llm_client=llm_client, document=PAGES[name].document()
     )
 
+    assert len(markdown.split()) > 100
 
-def test_level_3():
-    url = "https://gerlacdt.github.io/blog/posts/cccp/"
-    markdown = article_to_markdown(
-        llm_client=LLMClient(
-            model=Models.GEMINI_2_5_PRO, system_prompt=ARTICLE_TO_MARKDOWN_PROMPT_2
-        ),
-        url=url,
-    )
 
+def test_local_conversion_matches_master(llm_client, stub_llm_server):
+    page = PAGES["gerlacdt-cccp"]
+    requests_before = stub_llm_server.stats()["requests"]
 
-def test_level_4():
-    url = "https://martinfowler.com/articles/is-quality-worth-cost.html"
-    markdown = article_to_markdown(
-        llm_client=LLMClient(
-            model=Models.GEMINI_2_5_PRO, system_prompt=ARTICLE_TO_MARKDOWN_PROMPT_2
-        ),
-        url=url,
-    )
+    markdown = article_to_markdown(llm_client=llm_client, document=page.document())
+
+    assert stub_llm_server.stats()["requests"] == requests_before
+    assert difflib.SequenceMatcher(None, markdown, page.master_markdown).ratio() > 0.9
 
 
-def test_level_5():
-    url = "https://substack.com/inbox/post/161631616"
+def test_llm_conversion(llm_client, stub_llm_server):
+    requests_before = stub_llm_server.stats()["requests"]
+
     markdown = article_to_markdown(
-        llm_client=LLMClient(
-            model=Models.GEMINI_2_5_PRO, system_prompt=ARTICLE_TO_MARKDOWN_PROMPT_2
-        ),
-        url=url,
+        llm_client=llm_client,
+        document=PAGES["unkey-uuid-ux"].document(),
+        allow_local_conversion=False,
     )
+
+    assert markdown.startswith("# Stub response")
+    assert stub_llm_server.stats()["requests"] == requests_before + 1
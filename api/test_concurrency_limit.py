@@ -0,0 +1,48 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.lib.concurrency_limit import ConcurrencyLimit
+
+
+def test_concurrency_limit_shared_by_threads_and_coroutines():
+    limit = ConcurrencyLimit(2)
+    running = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def enter():
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+
+    def leave():
+        nonlocal running
+        with lock:
+            running -= 1
+
+    def work_in_thread():
+        with limit:
+            enter()
+            time.sleep(0.05)
+            leave()
+
+    async def work_in_coroutine():
+        async with limit:
+            enter()
+            await asyncio.sleep(0.05)
+            leave()
+
+    async def main():
+        await asyncio.gather(*[work_in_coroutine() for _ in range(4)])
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(work_in_thread) for _ in range(4)]
+        asyncio.run(main())
+        for future in futures:
+            future.result()
+
+    assert peak == 2
+    assert running == 0
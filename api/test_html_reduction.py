@@ -0,0 +1,45 @@
+from app.lib.html_reduction import reduce_article_html
+
+
+PAGE = """
+<html>
+<head><title>The UX of UUIDs | Unkey</title></head>
+<body class="min-h-screen">
+<nav class="fixed top-0"><a href="/">Home</a><a href="/blog">Blog</a></nav>
+<div class="relative overflow-x-clip"><div class="prose">
+<h2 id="the-baseline" class="text-2xl font-medium">The baseline: Ensuring global uniqueness</h2>
+<p class="text-lg font-normal leading-8" style="color: white">Unique identifiers are essential for distinguishing individual entities within a system. They provide a reliable way to ensure that each item, user, or piece of data has a unique identity.</p>
+<p class="text-lg font-normal leading-8">Let's not pretend like we are Google or AWS who have special needs around this. Any securely generated UUID with 128 bits is more than enough for us.</p>
+<div class="flex flex-col"><div class="p-4"><pre class="language-typescript"><code class="language-typescript"><span class="linenumber">1</span><span>const id = crypto.randomUUID();</span></code></pre></div></div>
+<div class="flex"><svg viewBox="0 0 24 24"><path d="M0 0h24v24H0z"></path></svg><button class="copy">Copy</button></div>
+</div></div>
+</body>
+</html>
+"""
+
+
+def test_reduce_article_html():
+    reduction = reduce_article_html(PAGE)
+
+    assert "The baseline: Ensuring global uniqueness" in reduction.html
+    assert "const id = crypto.randomUUID();" in reduction.html
+    assert 'class="language-typescript"' in reduction.html
+    assert "text-lg" not in reduction.html
+    assert "style=" not in reduction.html
+    assert "<svg" not in reduction.html
+    assert "Copy" not in reduction.html
+    assert ">1<" not in reduction.html
+    assert reduction.output_tokens < reduction.input_tokens
+
+
+def test_reduce_article_html_keeps_code_indentation():
+    reduction = reduce_article_html(
+        PAGE.replace(
+            "</div></div>\n</body>",
+            "<pre><code>def f():\n    if x:\n\n        return 1</code></pre>\n"
+            "</div></div>\n</body>",
+        )
+    )
+
+    assert "def f():\n    if x:\n\n        return 1" in reduction.html
+    assert "\n\n" not in reduction.html.replace("if x:\n\n", "")
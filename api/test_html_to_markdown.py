@@ -0,0 +1,82 @@
+from app.lib.html_to_markdown import convert_article_locally, convert_html_to_markdown
+from app.lib.html_reduction import reduce_article_html
+
+
+PARAGRAPH = (
+    "Unique identifiers are essential for distinguishing individual entities within a system. "
+    "While using a standard UUID will satisfy all your security concerns, there is a lot we "
+    "can improve for the people who copy, paste and read them every day."
+)
+
+PAGE = f"""
+<html>
+<head><title>The UX of UUIDs</title></head>
+<body>
+<nav><a href="/">Home</a><a href="/blog">Blog</a></nav>
+<article>
+<h1>The UX of UUIDs</h1>
+<p>{PARAGRAPH}</p>
+<h2>Copying UUIDs is annoying</h2>
+<p>{PARAGRAPH} Try copying this one by double-clicking on it.</p>
+<pre><code class="language-typescript">const id = crypto.randomUUID();
+// '5727a4a4-9bba-41ae-b7fe-e69cf60bb0ab'</code></pre>
+<ol>
+<li>Make them easy to copy</li>
+<li>Prefixing</li>
+</ol>
+<p>{PARAGRAPH} See <a href="/blog/prefixes">our post on prefixes</a>.</p>
+</article>
+<footer>Copyright Unkey</footer>
+</body>
+</html>
+"""
+
+
+def test_convert_html_to_markdown():
+    markdown = convert_html_to_markdown(
+        "<h2>Title</h2><p>Some <strong>bold</strong> and <code>code</code>.</p>"
+        '<pre class="language-python"><code>print("hi")</code></pre>'
+        "<ul><li>one<ul><li>nested</li></ul></li><li>two</li></ul>",
+    )
+
+    assert markdown == (
+        "## Title\n\n"
+        "Some **bold** and `code`.\n\n"
+        '```python\nprint("hi")\n```\n\n'
+        "- one\n  - nested\n- two"
+    )
+
+
+def test_convert_article_locally():
+    reduction = reduce_article_html(PAGE)
+    conversion = convert_article_locally(
+        reduction.html, PAGE, base_url="https://www.unkey.com/blog/uuid-ux"
+    )
+
+    assert conversion.accepted
+    assert "## Copying UUIDs is annoying" in conversion.markdown
+    assert "```typescript\nconst id = crypto.randomUUID();" in conversion.markdown
+    assert "1. Make them easy to copy\n2. Prefixing" in conversion.markdown
+    assert (
+        "[our post on prefixes](https://www.unkey.com/blog/prefixes)"
+        in conversion.markdown
+    )
+
+
+def test_convert_article_locally_without_semantic_article():
+    page = PAGE.replace("<article>", "<div>").replace("</article>", "</div>")
+    reduction = reduce_article_html(page)
+
+    assert not convert_article_locally(reduction.html, page).accepted
+
+
+def test_convert_article_locally_keeps_code_indentation():
+    code = "def f(x):\n    if x:\n\n        return 1\n    return 0"
+    page = PAGE.replace(
+        "</ol>", f'</ol>\n<pre class="language-python"><code>{code}</code></pre>'
+    )
+    reduction = reduce_article_html(page)
+    conversion = convert_article_locally(reduction.html, page)
+
+    assert conversion.accepted
+    assert f"```python\n{code}\n```" in conversion.markdown
@@ -0,0 +1,106 @@
+import http.server
+import threading
+import time
+
+import pytest
+
+from app.lib.http_client import HTTPClient, ResponseTooLargeError, RevalidationStore
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    requests_seen: list[dict[str, str | None]] = []
+
+    def do_GET(self):
+        Handler.requests_seen.append(
+            {"path": self.path, "if-none-match": self.headers.get("If-None-Match")}
+        )
+
+        if self.path == "/busy" and len(Handler.requests_seen) == 1:
+            self.send_response(503)
+            self.send_header("Retry-After", "3600")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if self.path == "/large":
+            body = b"x" * 2048
+        elif self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        else:
+            body = b"<html>hello</html>"
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    Handler.requests_seen = []
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def make_client(tmp_path) -> HTTPClient:
+    return HTTPClient(
+        connect_timeout=1,
+        read_timeout=1,
+        max_retries=0,
+        backoff_factor=0,
+        max_response_bytes=1024,
+        pool_size=2,
+        revalidation_store=RevalidationStore(
+            path=str(tmp_path / "http.db"), max_size_bytes=1024 * 1024
+        ),
+    )
+
+
+def test_revalidates_with_etag(server_url, tmp_path):
+    client = make_client(tmp_path)
+
+    first = client.get(f"{server_url}/page")
+    second = client.get(f"{server_url}/page")
+
+    assert first.text == second.text == "<html>hello</html>"
+    assert not first.revalidated and second.revalidated
+    assert [request["if-none-match"] for request in Handler.requests_seen] == [
+        None,
+        '"v1"',
+    ]
+
+
+def test_rejects_large_responses(server_url, tmp_path):
+    client = make_client(tmp_path)
+
+    with pytest.raises(ResponseTooLargeError):
+        client.get(f"{server_url}/large")
+
+
+def test_caps_retry_after(server_url):
+    client = HTTPClient(
+        connect_timeout=1,
+        read_timeout=1,
+        max_retries=1,
+        backoff_factor=0,
+        max_response_bytes=1024,
+        pool_size=2,
+        max_retry_after=0.1,
+    )
+
+    start_time = time.monotonic()
+    response = client.get(f"{server_url}/busy")
+
+    assert response.status_code == 200
+    assert len(Handler.requests_seen) == 2
+    assert time.monotonic() - start_time < 2
@@ -0,0 +1,131 @@
+import threading
+import time
+
+import pytest
+
+import app.jobs
+import app.pipeline
+from app.jobs import SummaryJobRunner
+from app.lib.job_store import JobStatus, JobStore
+from app.lib.single_flight import SingleFlight
+from app.lib.whisper_pool import TranscriptionPoolFullError
+
+
+@pytest.fixture
+def store(tmp_path) -> JobStore:
+    return JobStore(path=str(tmp_path / "jobs.db"), ttl_seconds=60)
+
+
+def test_unfinished_jobs_are_deduplicated(store: JobStore):
+    job, created = store.get_or_create("key", "https://example.com", params={})
+    same_job, same_created = store.get_or_create("key", "https://example.com", {})
+
+    assert created and not same_created
+    assert same_job.id == job.id
+
+    store.update(job.id, status=JobStatus.SUCCEEDED)
+    new_job, new_created = store.get_or_create("key", "https://example.com", {})
+
+    assert new_created
+    assert new_job.id != job.id
+
+
+def test_jobs_survive_a_restart(store: JobStore):
+    queued, _ = store.get_or_create("a", "https://example.com/a", params={"n": 1})
+    done, _ = store.get_or_create("b", "https://example.com/b", params={})
+    store.update(done.id, status=JobStatus.SUCCEEDED, result={"summary": "ok"})
+
+    reopened = JobStore(path=store.path, ttl_seconds=60)
+
+    assert [job.id for job in reopened.active()] == [queued.id]
+    assert reopened.get(queued.id).params == {"n": 1}
+    assert reopened.get(done.id).result == {"summary": "ok"}
+
+
+class FakePipelineResult:
+    def to_response(self):
+        return {"summary": "ok"}
+
+
+def test_job_waits_for_a_free_transcription_worker(store, monkeypatch):
+    calls = []
+
+    def run_summary_pipeline(url, options, on_stage_complete):
+        calls.append(url)
+        if len(calls) == 1:
+            raise TranscriptionPoolFullError("Every transcription worker is busy")
+        return FakePipelineResult()
+
+    monkeypatch.setattr(app.pipeline, "run_summary_pipeline", run_summary_pipeline)
+    monkeypatch.setattr(app.jobs, "TRANSCRIPTION_RETRY_DELAY_SECONDS", 0.05)
+    monkeypatch.setattr(app.jobs.RESULT_CACHE, "get", lambda key: None)
+    monkeypatch.setattr(app.jobs.RESULT_CACHE, "set", lambda key, url, value: None)
+
+    runner = SummaryJobRunner(store=store, max_workers=1)
+    try:
+        job, _ = runner.submit(
+            "https://example.com", app.jobs.PipelineOptions(), refresh=True
+        )
+        deadline = time.time() + 5
+        while runner.get(job.id).status != JobStatus.SUCCEEDED:
+            assert time.time() < deadline
+            assert runner.get(job.id).status != JobStatus.FAILED
+            time.sleep(0.01)
+    finally:
+        runner.close()
+
+    assert len(calls) == 2
+
+
+def test_job_joins_a_running_summary_for_the_same_url(store, monkeypatch):
+    joined = threading.Event()
+    calls = []
+    cached = []
+
+    class WatchedCalls(dict):
+        def get(self, key, default=None):
+            call = super().get(key, default)
+            if call is not None:
+                joined.set()
+            return call
+
+    flights = SingleFlight[dict]()
+    flights._calls = WatchedCalls()
+
+    def run_summary_pipeline(url, options, on_stage_complete):
+        calls.append(url)
+        # Keep running until the job has joined this run
+        assert joined.wait(5)
+        return FakePipelineResult()
+
+    monkeypatch.setattr(app.pipeline, "SUMMARY_FLIGHTS", flights)
+    monkeypatch.setattr(app.pipeline, "run_summary_pipeline", run_summary_pipeline)
+    monkeypatch.setattr(app.jobs.RESULT_CACHE, "get", lambda key: None)
+    monkeypatch.setattr(
+        app.jobs.RESULT_CACHE, "set", lambda key, url, value: cached.append(key)
+    )
+
+    options = app.jobs.PipelineOptions()
+    direct = threading.Thread(
+        target=app.pipeline.summarize_url, args=("https://example.com", options)
+    )
+    direct.start()
+    while not calls:
+        time.sleep(0.01)
+
+    runner = SummaryJobRunner(store=store, max_workers=1)
+    try:
+        job, _ = runner.submit("https://example.com", options)
+        deadline = time.time() + 5
+        while runner.get(job.id).status != JobStatus.SUCCEEDED:
+            assert time.time() < deadline
+            assert runner.get(job.id).status != JobStatus.FAILED
+            time.sleep(0.01)
+    finally:
+        joined.set()
+        direct.join(5)
+        runner.close()
+
+    assert runner.get(job.id).result == {"summary": "ok"}
+    assert len(calls) == 1
+    assert len(cached) == 1
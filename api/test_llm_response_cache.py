@@ -0,0 +1,27 @@
+from app.lib.llm_response_cache import LLMResponseCache, make_llm_cache_key
+
+
+def test_llm_cache_key():
+    key = make_llm_cache_key("gpt-4.1-nano", "system", "user", 0.7)
+
+    assert key == make_llm_cache_key("gpt-4.1-nano", "system", "user", 0.7)
+    assert key != make_llm_cache_key("gpt-4.1-nano", "system", "user", 0.2)
+    assert key != make_llm_cache_key("gpt-4.1-mini", "system", "user", 0.7)
+    assert key != make_llm_cache_key(
+        "gpt-4.1-nano", "system", "user", 0.7, schema={"type": "object"}
+    )
+
+
+def test_llm_response_cache_evicts_least_recently_used(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "llm.db"), max_size_bytes=250)
+    value = {"content": "x" * 50, "input_tokens": 1, "output_tokens": 1}
+
+    cache.set("a", value)
+    cache.set("b", value)
+    assert cache.get("a") == value
+    cache.set("c", value)
+
+    # Each entry is ~100 bytes, so only the two most recently used ones fit
+    assert cache.get("b") is None
+    assert cache.get("a") == value
+    assert cache.get("c") == value
@@ -0,0 +1,129 @@
+import asyncio
+import time
+
+import pytest
+
+from app.lib.llm_client import LLMClientResponse, Models
+from app.lib.llm_router import MODEL_HEALTH, RoutingLLMClient, get_model_health
+
+MODELS = [Models.GEMINI_2_5_FLASH_LITE_PREVIEW, Models.GPT_4_1_NANO_2025_04_14]
+
+
+@pytest.fixture(autouse=True)
+def reset_model_health():
+    MODEL_HEALTH.clear()
+
+
+def make_router(behaviors, hedge=False) -> RoutingLLMClient:
+    """
+    Build a router whose clients answer after `delay` seconds, or raise when `delay` is None.
+    """
+    router = RoutingLLMClient(
+        models=MODELS, system_prompt="test", hedge=hedge, min_hedge_delay=0.05
+    )
+    for client, delay in zip(router.clients, behaviors):
+
+        def generate_response(user_prompt, temp=0.7, client=client, delay=delay):
+            if delay is None:
+                raise RuntimeError("Failed to generate response: 503")
+            time.sleep(delay)
+            return LLMClientResponse(
+                content=str(client.model),
+                response_time=delay,
+                provider=client.provider,
+                cost=0,
+            )
+
+        async def agenerate_response(user_prompt, temp=0.7, client=client, delay=delay):
+            if delay is None:
+                raise RuntimeError("Failed to generate response: 503")
+            await asyncio.sleep(delay)
+            return LLMClientResponse(
+                content=str(client.model),
+                response_time=delay,
+                provider=client.provider,
+                cost=0,
+            )
+
+        client.generate_response = generate_response
+        client.agenerate_response = agenerate_response
+    return router
+
+
+def test_fails_over_to_next_model():
+    router = make_router([None, 0])
+
+    assert router.generate_response("hi").content == MODELS[1]
+    assert asyncio.run(router.agenerate_response("hi")).content == MODELS[1]
+    assert get_model_health(MODELS[0], None).error_rate() is None
+
+
+def test_degraded_model_is_tried_last():
+    for _ in range(5):
+        get_model_health(MODELS[0], None).record(1, ok=False)
+
+    assert router_order(make_router([0, 0])) == [MODELS[1], MODELS[0]]
+
+
+def test_slow_healthy_model_is_tried_after_faster_ones():
+    for _ in range(5):
+        get_model_health(MODELS[0], None).record(2, ok=True)
+        get_model_health(MODELS[1], None).record(0.5, ok=True)
+
+    assert router_order(make_router([0, 0])) == [MODELS[1], MODELS[0]]
+
+
+def test_similar_latencies_keep_the_configured_order():
+    for _ in range(5):
+        get_model_health(MODELS[0], None).record(1.2, ok=True)
+        get_model_health(MODELS[1], None).record(1, ok=True)
+
+    assert router_order(make_router([0, 0])) == MODELS
+
+
+def test_latency_average_follows_recent_samples():
+    health = get_model_health(MODELS[0], None)
+    for _ in range(10):
+        health.record(0.5, ok=True)
+    for _ in range(5):
+        health.record(2, ok=True)
+
+    assert health.latency_ewma() > 1.5
+
+
+def router_order(router: RoutingLLMClient) -> list[Models]:
+    return [client.model for client in router._ordered_clients("hi")]
+
+
+def test_every_model_failing_raises():
+    router = make_router([None, None])
+
+    with pytest.raises(RuntimeError, match="Every model failed"):
+        router.generate_response("hi")
+
+
+def test_hedges_slow_request():
+    for _ in range(5):
+        get_model_health(MODELS[0], None).record(0.05, ok=True)
+    router = make_router([1, 0], hedge=True)
+
+    start_time = time.time()
+    assert router.generate_response("hi").content == MODELS[1]
+    assert asyncio.run(router.agenerate_response("hi")).content == MODELS[1]
+    assert time.time() - start_time < 1
+
+
+def test_does_not_hedge_without_latency_samples():
+    router = make_router([0.1, 0], hedge=True)
+
+    assert router.generate_response("hi").content == MODELS[0]
+
+
+def test_stages_keep_separate_latencies():
+    for _ in range(5):
+        get_model_health(MODELS[0], "summarize-content").record(0.05, ok=True)
+    router = RoutingLLMClient(
+        models=MODELS, system_prompt="test", log_key="article-to-markdown", hedge=True
+    )
+
+    assert router._hedge_delay(router.clients[0]) is None
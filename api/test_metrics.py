@@ -0,0 +1,69 @@
+from prometheus_client.parser import text_string_to_metric_families
+
+from app.lib.metrics import (
+    CACHE_STATS,
+    collect_server_timings,
+    format_server_timing,
+    record_timing,
+    render_metrics,
+)
+from app.lib.stage_graph import Stage, StageGraph
+
+
+def scrape() -> dict[str, dict]:
+    return {
+        family.name: family
+        for family in text_string_to_metric_families(render_metrics().decode())
+    }
+
+
+def test_cache_stats_are_read_on_scrape():
+    stats = {"hits": 3, "misses": 1}
+    CACHE_STATS.add("test", lambda: (stats["hits"], stats["misses"]))
+
+    stats["hits"] = 9
+    families = scrape()
+
+    def value(name: str) -> float:
+        return next(
+            sample.value
+            for sample in families[name].samples
+            if sample.labels == {"cache": "test"}
+        )
+
+    assert value("smrz_cache_hits") == 9
+    assert value("smrz_cache_misses") == 1
+    assert value("smrz_cache_hit_ratio") == 0.9
+
+
+def test_stage_timings_are_exported():
+    record_timing('stage "quoted"', 0.5)
+
+    samples = [
+        sample
+        for sample in scrape()["smrz_stage_duration_seconds"].samples
+        if sample.labels.get("stage") == 'stage "quoted"'
+    ]
+
+    assert {sample.name for sample in samples} == {
+        "smrz_stage_duration_seconds_bucket",
+        "smrz_stage_duration_seconds_sum",
+        "smrz_stage_duration_seconds_count",
+    }
+    assert any(
+        sample.labels.get("le") == "+Inf" and sample.value == 1 for sample in samples
+    )
+
+
+def test_server_timings_include_stage_graph_stages():
+    with collect_server_timings() as timings:
+        StageGraph(
+            [
+                Stage("fetch", lambda: 1),
+                Stage("content", lambda fetch: fetch + 1, depends_on=["fetch"]),
+            ]
+        ).run()
+    record_timing("outside", 1.0)
+
+    assert [name for name, _ in timings] == ["fetch", "content"]
+    assert format_server_timing([("fetch", 0.0123)]) == "fetch;dur=12.3"
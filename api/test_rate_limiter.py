@@ -0,0 +1,210 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from openai import APIConnectionError, RateLimitError
+
+from app.lib.concurrency_limit import ConcurrencyLimit
+from app.lib.llm_client import LLMClient, Models
+from app.lib.rate_limiter import RateLimiter, parse_retry_after
+
+
+def test_requests_per_minute():
+    # A burst of 2, then one request every 0.1s
+    limiter = RateLimiter("test", requests_per_minute=600)
+    limiter._requests.level = 2
+
+    start_time = time.monotonic()
+    for _ in range(4):
+        limiter.acquire()
+
+    assert 0.15 < time.monotonic() - start_time < 0.4
+
+
+def test_tokens_are_reconciled_with_usage():
+    limiter = RateLimiter("test", tokens_per_minute=6000)
+
+    limiter.acquire(6000)
+    # The call used far fewer tokens than reserved, so the next one doesn't wait
+    limiter.reconcile(estimated_tokens=6000, actual_tokens=100)
+    start_time = time.monotonic()
+    limiter.acquire(1000)
+
+    assert time.monotonic() - start_time < 0.05
+
+
+def test_callers_are_served_in_arrival_order():
+    limiter = RateLimiter("test", requests_per_minute=1200)
+    limiter._requests.level = 0
+    order = []
+    depths = []
+
+    async def call(i: int):
+        await limiter.aacquire()
+        order.append(i)
+
+    async def main():
+        tasks = []
+        for i in range(5):
+            tasks.append(asyncio.create_task(call(i)))
+            await asyncio.sleep(0)
+        await asyncio.sleep(0.01)
+        depths.append(limiter.queue_depth)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+
+    assert order == [0, 1, 2, 3, 4]
+    assert depths == [5]
+    assert limiter.queue_depth == 0
+
+
+def test_pause_holds_back_every_caller():
+    limiter = RateLimiter("test")
+    limiter.pause(0.2)
+    done = []
+
+    threads = [
+        threading.Thread(target=lambda: (limiter.acquire(), done.append(1)))
+        for _ in range(3)
+    ]
+    start_time = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(done) == 3
+    assert time.monotonic() - start_time >= 0.19
+
+
+def test_parse_retry_after():
+    assert parse_retry_after({"retry-after": "3"}) == 3
+    assert parse_retry_after({"retry-after-ms": "1500", "retry-after": "2"}) == 1.5
+    assert parse_retry_after({"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"}) == 0
+    assert parse_retry_after({}) is None
+
+
+def test_failed_calls_give_their_tokens_back():
+    llm_client = LLMClient(model=Models.GPT_4O_MINI, system_prompt="test")
+    llm_client.rate_limiter = RateLimiter("test", tokens_per_minute=60_000)
+
+    def fail():
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        llm_client._call_provider(fail, estimated_tokens=50_000)
+    with pytest.raises(ValueError):
+        asyncio.run(llm_client._acall_provider(fail_async, estimated_tokens=50_000))
+
+    assert llm_client.rate_limiter._tokens.level > 59_000
+
+
+async def fail_async():
+    raise ValueError("bad request")
+
+
+def test_calls_are_reconciled_with_their_usage():
+    llm_client = LLMClient(model=Models.GPT_4O_MINI, system_prompt="test")
+    llm_client.rate_limiter = RateLimiter("test", tokens_per_minute=60_000)
+    response = SimpleNamespace(usage=SimpleNamespace(total_tokens=1_000))
+
+    assert (
+        llm_client._call_provider(lambda: response, estimated_tokens=50_000) is response
+    )
+    assert 58_000 < llm_client.rate_limiter._tokens.level < 59_100
+
+
+def rate_limit_error(headers: dict[str, str]) -> RateLimitError:
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    return RateLimitError(
+        "Rate limited",
+        response=httpx.Response(429, headers=headers, request=request),
+        body=None,
+    )
+
+
+def test_short_retry_after_pauses_the_provider_and_retries():
+    llm_client = LLMClient(model=Models.GPT_4O_MINI, system_prompt="test")
+    llm_client.rate_limiter = RateLimiter("test")
+    results = [rate_limit_error({"retry-after-ms": "100"}), SimpleNamespace(usage=None)]
+
+    def call():
+        result = results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    start_time = time.monotonic()
+    llm_client._call_provider(call, estimated_tokens=100)
+
+    assert not results
+    assert time.monotonic() - start_time >= 0.09
+
+
+def test_long_retry_after_fails_fast():
+    llm_client = LLMClient(model=Models.GPT_4O_MINI, system_prompt="test")
+    llm_client.rate_limiter = RateLimiter("test")
+    calls = []
+
+    def call():
+        calls.append(1)
+        raise rate_limit_error({"retry-after": "86400"})
+
+    start_time = time.monotonic()
+    with pytest.raises(RateLimitError):
+        llm_client._call_provider(call, estimated_tokens=100)
+
+    assert len(calls) == 1
+    assert time.monotonic() - start_time < 1
+    # Other callers of the provider are not held back
+    llm_client.rate_limiter.acquire()
+    assert time.monotonic() - start_time < 1
+
+
+def test_streams_back_off_outside_the_concurrency_limit():
+    llm_client = LLMClient(model=Models.GPT_4O_MINI, system_prompt="test")
+    llm_client.rate_limiter = RateLimiter("test")
+    llm_client.concurrency_limit = ConcurrencyLimit(1)
+    attempts = []
+
+    async def chunks():
+        yield SimpleNamespace(
+            usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content="hi"))]
+        )
+        yield SimpleNamespace(
+            usage=SimpleNamespace(prompt_tokens=1, completion_tokens=1, total_tokens=2),
+            choices=[],
+        )
+
+    async def create(**params):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise APIConnectionError(request=httpx.Request("POST", "https://x"))
+        return chunks()
+
+    llm_client.async_client = SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=create))
+    )
+
+    async def main():
+        stream = asyncio.create_task(collect(llm_client.astream_response("hello")))
+        await asyncio.sleep(0.1)
+        # The stream is backing off after its first attempt; its slot is free meanwhile
+        slot_free = llm_client.concurrency_limit._semaphore.acquire(blocking=False)
+        if slot_free:
+            llm_client.concurrency_limit._semaphore.release()
+        return slot_free, await stream
+
+    slot_free, chunks_seen = asyncio.run(main())
+
+    assert slot_free
+    assert len(attempts) == 2
+    assert chunks_seen[-1].response.content == "hi"
+
+
+async def collect(stream):
+    return [chunk async for chunk in stream]
@@ -0,0 +1,77 @@
+from types import SimpleNamespace
+
+import pytest
+
+import app.lib.result_cache
+from app.lib.llm_client import LLMClient, Models
+from app.lib.result_cache import ResultCache, make_cache_key, normalize_url
+
+
+@pytest.fixture
+def clock(monkeypatch) -> SimpleNamespace:
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(
+        app.lib.result_cache, "time", SimpleNamespace(time=lambda: clock.now)
+    )
+    return clock
+
+
+def test_normalize_url():
+    assert (
+        normalize_url("HTTPS://Example.COM:443/Post/?utm_source=x&b=2&a=1&fbclid=y#top")
+        == "https://example.com/Post?a=1&b=2"
+    )
+    assert normalize_url("http://example.com") == "http://example.com/"
+    assert normalize_url("http://example.com:8080/") == "http://example.com:8080/"
+    assert (
+        normalize_url("https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=42")
+        == normalize_url("https://youtu.be/dQw4w9WgXcQ")
+        == "youtube:dQw4w9WgXcQ"
+    )
+
+
+def test_cache_key_changes_with_llm_client_config():
+    clients = [LLMClient(model=Models.GPT_4O_MINI, system_prompt="Summarize.")]
+    key = make_cache_key("https://example.com/post?utm_medium=x", clients)
+
+    assert key == make_cache_key("https://EXAMPLE.com/post/#comments", clients)
+    assert key != make_cache_key(
+        "https://example.com/post",
+        [LLMClient(model=Models.GPT_4O_MINI, system_prompt="Summarize briefly.")],
+    )
+    assert key != make_cache_key(
+        "https://example.com/post",
+        [LLMClient(model=Models.GPT_4_1_NANO_2025_04_14, system_prompt="Summarize.")],
+    )
+    assert key != make_cache_key(
+        "https://example.com/post", clients, options={"transcript_sources": []}
+    )
+
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    cache = ResultCache(str(tmp_path / "results.db"), ttl_seconds=60, max_entries=10)
+
+    cache.set("key", "https://example.com", {"summary": "ok"})
+    clock.now += 59
+    assert cache.get("key") == {"summary": "ok"}
+    clock.now += 2
+    assert cache.get("key") is None
+
+    assert cache.stats()["entries"] == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_evicts_least_recently_used(tmp_path, clock):
+    cache = ResultCache(str(tmp_path / "results.db"), ttl_seconds=60, max_entries=2)
+
+    for key in ("a", "b"):
+        clock.now += 1
+        cache.set(key, f"https://example.com/{key}", {"summary": key})
+    clock.now += 1
+    cache.get("a")
+    clock.now += 1
+    cache.set("c", "https://example.com/c", {"summary": "c"})
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"summary": "a"}
+    assert cache.get("c") == {"summary": "c"}
@@ -0,0 +1,31 @@
+import os
+
+import pytest
+
+API_LIB_DIR = os.path.join(os.path.dirname(__file__), "app", "lib")
+ORION_FEATURES_DIR = os.path.join(
+    os.path.dirname(__file__), "..", "orion", "app", "features"
+)
+
+# Modules that api and orion each ship a copy of
+SHARED_MODULES = [
+    "audio",
+    "http_client",
+    "job_store",
+    "single_flight",
+    "structured_metadata",
+    "whisper_pool",
+    "youtube_metadata",
+]
+
+
+@pytest.mark.parametrize("module", SHARED_MODULES)
+def test_shared_module_copies_are_identical(module: str):
+    with open(os.path.join(API_LIB_DIR, f"{module}.py")) as f:
+        api_source = f.read()
+    with open(os.path.join(ORION_FEATURES_DIR, f"{module}.py")) as f:
+        orion_source = f.read().replace("from app.features.", "from app.lib.")
+
+    assert orion_source == api_source, (
+        f"orion/app/features/{module}.py has drifted from api/app/lib/{module}.py"
+    )
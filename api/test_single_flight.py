@@ -0,0 +1,50 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.lib.single_flight import SingleFlight, StreamSingleFlight
+
+
+def test_single_flight():
+    flights = SingleFlight[int]()
+    calls = 0
+    lock = threading.Lock()
+
+    def run() -> int:
+        nonlocal calls
+        with lock:
+            calls += 1
+        time.sleep(0.2)
+        return 42
+
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        results = list(executor.map(lambda _: flights.do("key", run), range(10)))
+
+    assert results == [42] * 10
+    assert calls == 1
+    assert flights.in_flight() == 0
+
+
+def test_stream_single_flight():
+    flights = StreamSingleFlight[int]()
+    calls = 0
+
+    async def stream():
+        nonlocal calls
+        calls += 1
+        for item in range(3):
+            await asyncio.sleep(0.05)
+            yield item
+
+    async def collect(delay: float) -> list[int]:
+        await asyncio.sleep(delay)
+        return [item async for item in flights.subscribe("key", stream)]
+
+    async def main():
+        return await asyncio.gather(collect(0), collect(0), collect(0.08))
+
+    # A subscriber that joins mid-stream still receives every item
+    assert asyncio.run(main()) == [[0, 1, 2]] * 3
+    assert calls == 1
+    assert flights.in_flight() == 0
@@ -0,0 +1,69 @@
+import datetime
+
+from app.lib.structured_metadata import extract_structured_metadata
+
+
+ARTICLE_HTML = """
+<html><head>
+<title>Ignored | Example Blog</title>
+<meta property="og:title" content="OpenGraph Title">
+<meta property="og:image" content="/images/cover.png">
+<meta property="article:published_time" content="2024-03-01T08:00:00Z">
+<link rel="apple-touch-icon" href="/apple-touch-icon.png">
+<link rel="shortcut icon" href="/static/favicon.svg">
+<script type="application/ld+json">
+{"@context": "https://schema.org", "@graph": [
+  {"@type": "WebSite", "name": "Example Blog"},
+  {"@type": ["NewsArticle"], "headline": "JSON-LD Headline",
+   "author": [{"@type": "Person", "name": "Ada Lovelace"}, {"name": "Alan Turing"}],
+   "datePublished": "2024-02-29"}
+]}
+</script>
+</head><body><p>Hello</p></body></html>
+"""
+
+YOUTUBE_HTML = """
+<html><head><title>Video - YouTube</title></head><body>
+<div itemscope itemtype="http://schema.org/VideoObject">
+<meta itemprop="name" content="Video Title">
+<span itemprop="author" itemscope itemtype="http://schema.org/Person">
+<link itemprop="url" href="http://www.youtube.com/@channel"><link itemprop="name" content="Channel Name">
+</span>
+<link itemprop="thumbnailUrl" href="https://i.ytimg.com/vi/abc/maxresdefault.jpg">
+<meta itemprop="datePublished" content="2023-11-05T10:00:00-07:00">
+</div></body></html>
+"""
+
+
+def test_json_ld_takes_precedence():
+    metadata = extract_structured_metadata(
+        ARTICLE_HTML, base_url="https://blog.example.com/posts/1"
+    )
+
+    assert metadata.title == "JSON-LD Headline"
+    assert metadata.author == "Ada Lovelace, Alan Turing"
+    assert metadata.published_date == datetime.date(2024, 2, 29)
+    assert metadata.image == "https://blog.example.com/images/cover.png"
+    assert metadata.favicon == "https://blog.example.com/static/favicon.svg"
+
+
+def test_microdata():
+    metadata = extract_structured_metadata(
+        YOUTUBE_HTML, base_url="https://www.youtube.com/watch?v=abc"
+    )
+
+    assert metadata.title == "Video Title"
+    assert metadata.author == "Channel Name"
+    assert metadata.published_date == datetime.date(2023, 11, 5)
+    assert metadata.image == "https://i.ytimg.com/vi/abc/maxresdefault.jpg"
+    assert metadata.favicon is None
+
+
+def test_page_without_metadata():
+    metadata = extract_structured_metadata(
+        "<html><head><title>Page</title></head></html>"
+    )
+
+    assert metadata.title is None
+    assert metadata.author is None
+    assert metadata.published_date is None
@@ -0,0 +1,74 @@
+from app.lib.article_content import _article_to_markdown_prompt
+from app.lib.llm_client import (
+    LLMClient,
+    Models,
+    count_tokens,
+    truncate_to_tokens,
+)
+from app.lib.llm_router import RoutingLLMClient
+from app.lib.summarization import _split_content
+
+# GPT-4o Mini has a 128k context window, GPT-4.1 Mini a 1M one
+SMALL_CONTEXT_MODEL = Models.GPT_4O_MINI
+LARGE_CONTEXT_MODEL = Models.GPT_4_1_MINI_2025_04_14
+
+LONG_TEXT = "\n\n".join(
+    f"Paragraph {i} talks about tokens, context windows and budgets. " * 20
+    for i in range(1000)
+)
+
+
+def test_truncate_to_tokens():
+    truncated = truncate_to_tokens(LONG_TEXT, 100)
+
+    assert LONG_TEXT.startswith(truncated)
+    assert count_tokens(truncated) <= 100
+    assert truncate_to_tokens("short", 100) == "short"
+
+
+def test_plan_request():
+    llm_client = LLMClient(model=SMALL_CONTEXT_MODEL, system_prompt="Summarize.")
+
+    small_plan = llm_client.plan_request("Summarize this.")
+    large_plan = llm_client.plan_request(LONG_TEXT)
+
+    assert small_plan.fits
+    assert small_plan.cost > 0
+    assert not large_plan.fits
+    assert large_plan.input_tokens > 128_000
+
+
+def test_router_skips_models_too_small_for_the_prompt():
+    router = RoutingLLMClient(
+        models=[SMALL_CONTEXT_MODEL, LARGE_CONTEXT_MODEL],
+        system_prompt="Summarize.",
+        hedge=False,
+    )
+
+    assert [client.model for client in router._ordered_clients("hi")] == [
+        SMALL_CONTEXT_MODEL,
+        LARGE_CONTEXT_MODEL,
+    ]
+    assert [client.model for client in router._ordered_clients(LONG_TEXT)] == [
+        LARGE_CONTEXT_MODEL
+    ]
+    assert router.plan_request(LONG_TEXT).model == LARGE_CONTEXT_MODEL
+
+
+def test_split_content():
+    parts = _split_content(LONG_TEXT, 10_000)
+
+    assert len(parts) > 1
+    assert all(count_tokens(part) <= 10_000 for part in parts)
+    assert "\n\n".join(parts) == LONG_TEXT
+
+
+def test_article_prompt_is_truncated_to_the_output_limit():
+    # GPT-4o Mini can only write 16k tokens, far less than the article's Markdown
+    llm_client = LLMClient(model=SMALL_CONTEXT_MODEL, system_prompt="Convert.")
+    html = "<article>" + "".join(f"<p>{LONG_TEXT[:2000]}</p>" for _ in range(200))
+
+    prompt = _article_to_markdown_prompt(llm_client, "https://example.com", html)
+
+    assert count_tokens(prompt) < llm_client.max_output_tokens * 1.1
+    assert prompt.startswith("Convert the following article HTML")
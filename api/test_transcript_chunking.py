@@ -0,0 +1,54 @@
+import app.lib.transcript_chunking
+from app.lib.transcript_chunking import (
+    join_transcript_chunks,
+    normalize_header_levels,
+    split_transcript,
+)
+
+
+SENTENCES = [f"This is sentence number {i} of the podcast." for i in range(200)]
+
+
+def test_split_transcript():
+    transcript = " ".join(SENTENCES)
+    chunks = split_transcript(transcript, chunk_tokens=100, context_tokens=20)
+
+    assert len(chunks) > 1
+    assert " ".join(chunk.text for chunk in chunks) == transcript
+    assert chunks[0].context == ""
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk.context and previous.text.endswith(chunk.context)
+        assert chunk.text.startswith("This is sentence")
+
+
+def test_split_unpunctuated_transcript():
+    transcript = " ".join(f"word{i}" for i in range(2000))
+    chunks = split_transcript(transcript, chunk_tokens=100, context_tokens=20)
+
+    assert len(chunks) > 1
+    assert " ".join(chunk.text for chunk in chunks) == transcript
+
+
+def test_split_transcript_counts_tokens_with_the_tokenizer(monkeypatch):
+    # A tokenizer that sees every word as one token, unlike the ~4 characters estimate
+    monkeypatch.setattr(
+        app.lib.transcript_chunking, "count_tokens", lambda text: len(text.split())
+    )
+    chunks = split_transcript(" ".join(SENTENCES), chunk_tokens=100, context_tokens=20)
+
+    # 8 words per sentence plus a separator token: 11 sentences per chunk
+    assert [chunk.text.count(".") for chunk in chunks[:-1]] == [11] * (len(chunks) - 1)
+    assert all(chunk.context.count(".") == 2 for chunk in chunks[1:])
+
+
+def test_join_transcript_chunks():
+    chunks = [
+        "# Intro\nHello there.\n\n## Background\nSome context.",
+        "Continuing the background.\n\n### Main Point #1: Habits\nText.",
+    ]
+
+    assert join_transcript_chunks(chunks) == (
+        "## Intro\nHello there.\n\n### Background\nSome context.\n\n"
+        "Continuing the background.\n\n## Main Point #1: Habits\nText."
+    )
+    assert normalize_header_levels("No headers here.") == "No headers here."
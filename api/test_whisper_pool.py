@@ -0,0 +1,68 @@
+import multiprocessing
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from app.lib.whisper_pool import TranscriptionPoolFullError, WhisperWorkerPool
+
+
+def test_rejects_transcriptions_beyond_workers_and_queue():
+    pool = WhisperWorkerPool(workers=1, queue_depth=1)
+
+    first = pool.reserve()
+    pool.reserve()
+    with pytest.raises(TranscriptionPoolFullError):
+        pool.reserve()
+
+    # A slot exited without submitting anything is given back
+    with first:
+        pass
+    pool.reserve()
+
+
+def test_slot_is_released_when_its_transcription_finishes(monkeypatch):
+    pool = WhisperWorkerPool(workers=1, queue_depth=0)
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(pool, "_get_executor", lambda: executor)
+
+    with pool.reserve() as slot:
+        future = slot.submit(np.zeros(16000, dtype=np.float32))
+        with pytest.raises(RuntimeError, match="can only be used once"):
+            slot.submit(np.zeros(16000, dtype=np.float32))
+
+    # No model is loaded in this process, so the transcription fails, but still releases
+    with pytest.raises(RuntimeError, match="not initialized"):
+        future.result()
+    executor.shutdown()
+    pool.reserve()
+
+
+def test_replaces_the_workers_after_one_dies(monkeypatch):
+    pool = WhisperWorkerPool(workers=1, queue_depth=0)
+    # Workers without a model, so the test doesn't need to load Whisper
+    monkeypatch.setattr(
+        pool,
+        "_new_executor",
+        lambda: ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context("spawn")
+        ),
+    )
+    audio = np.zeros(16000, dtype=np.float32)
+    try:
+        executor = pool._get_executor()
+        os.kill(executor.submit(os.getpid).result(), signal.SIGKILL)
+        deadline = time.time() + 10
+        while not executor._broken:
+            assert time.time() < deadline
+            time.sleep(0.01)
+
+        # The transcription reaches a new worker, which has no model loaded
+        with pytest.raises(RuntimeError, match="not initialized"):
+            pool.transcribe(audio)
+        assert pool._executor is not executor
+    finally:
+        pool.close()
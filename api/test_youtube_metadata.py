@@ -0,0 +1,39 @@
+from app.lib.youtube_metadata import VideoMetadata, YoutubeMetadataProvider
+
+
+def test_caches_per_video_id(monkeypatch):
+    provider = YoutubeMetadataProvider(ttl_seconds=60, max_entries=2)
+    fetched = []
+
+    def fetch(video_id: str) -> VideoMetadata:
+        fetched.append(video_id)
+        return VideoMetadata(title=f"Video {video_id}")
+
+    monkeypatch.setattr(provider, "_fetch", fetch)
+
+    assert provider.get("https://www.youtube.com/watch?v=aaaaaaaaaaa").title == (
+        "Video aaaaaaaaaaa"
+    )
+    provider.get("https://youtu.be/aaaaaaaaaaa")
+    assert fetched == ["aaaaaaaaaaa"]
+
+    # The least recently used video is evicted once the cache is full
+    provider.get("https://youtu.be/bbbbbbbbbbb")
+    provider.get("https://youtu.be/ccccccccccc")
+    provider.get("https://youtu.be/aaaaaaaaaaa")
+    assert fetched == ["aaaaaaaaaaa", "bbbbbbbbbbb", "ccccccccccc", "aaaaaaaaaaa"]
+
+
+def test_expired_entries_are_refetched(monkeypatch):
+    provider = YoutubeMetadataProvider(ttl_seconds=0, max_entries=2)
+    fetched = []
+
+    def fetch(video_id: str) -> VideoMetadata:
+        fetched.append(video_id)
+        return VideoMetadata(title="Video")
+
+    monkeypatch.setattr(provider, "_fetch", fetch)
+
+    provider.get("https://youtu.be/aaaaaaaaaaa")
+    provider.get("https://youtu.be/aaaaaaaaaaa")
+    assert fetched == ["aaaaaaaaaaa", "aaaaaaaaaaa"]
@@ -0,0 +1,85 @@
+import asyncio
+import os
+
+from app.features.job_store import Job, JobStatus, JobStore
+from app.features.transcription import YoutubeVideoTranscriber
+from app.features.whisper_pool import TranscriptionPoolFullError
+from app.utils import normalize_youtube_url
+
+# How long a job waits before trying again when every transcription worker is busy
+TRANSCRIPTION_RETRY_DELAY_SECONDS = float(
+    os.environ.get("ORION_JOB_RETRY_DELAY_SECONDS", "10")
+)
+
+
+class TranscriptionJobRunner:
+    """
+    Transcribes YouTube videos in the background for the /jobs endpoints. Jobs are persisted
+    in a JobStore, so unfinished jobs are picked up again after a restart, and a submission
+    for a video that already has an unfinished job returns that job. Jobs wait for a free
+    transcription worker instead of failing when the pool is full.
+    """
+
+    def __init__(self, store: JobStore):
+        self.store = store
+        self._tasks: set[asyncio.Task] = set()
+
+    def start(self):
+        """
+        Resume the jobs that were queued or running when the process last stopped.
+        Must be called from the event loop.
+        """
+        for job in self.store.active():
+            self._schedule(job)
+
+    async def close(self):
+        # Cancelled jobs stay unfinished in the store and are resumed on the next start
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def submit(self, url: str) -> tuple[Job, bool]:
+        """
+        Submit a transcription job, or join the unfinished job for the same video.
+        The second value tells whether a new job was created.
+        """
+        url = normalize_youtube_url(url)
+        job, created = self.store.get_or_create(key=url, url=url, params={})
+        if created:
+            self._schedule(job)
+        return job, created
+
+    def get(self, job_id: str) -> Job | None:
+        return self.store.get(job_id)
+
+    def _schedule(self, job: Job):
+        task = asyncio.create_task(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, job: Job):
+        while True:
+            try:
+                self.store.update(job.id, status=JobStatus.RUNNING)
+                transcription = await YoutubeVideoTranscriber().transcribe_video(
+                    job.url
+                )
+            except TranscriptionPoolFullError:
+                self.store.update(job.id, status=JobStatus.QUEUED)
+                await asyncio.sleep(TRANSCRIPTION_RETRY_DELAY_SECONDS)
+                continue
+            except Exception as e:
+                self.store.update(job.id, status=JobStatus.FAILED, error=str(e))
+                return
+
+            self.store.update(
+                job.id,
+                status=JobStatus.SUCCEEDED,
+                progress=1.0,
+                result={"transcription": transcription},
+            )
+            return
+
+
+# Process-wide job runner, started by the FastAPI lifespan hook in app.main
+TRANSCRIPTION_JOB_RUNNER = TranscriptionJobRunner(store=JobStore.from_env("ORION"))
@@ -1,4 +1,5 @@
 import sys
+from contextlib import asynccontextmanager
 
 from dotenv import load_dotenv
 from fastapi import FastAPI
@@ -6,7 +7,21 @@ from fastapi import FastAPI
 sys.dont_write_bytecode = True  # Disable .pyc file generation
 load_dotenv()  # Load environment variables from .env file
 
+from app.features.jobs import TRANSCRIPTION_JOB_RUNNER  # noqa: E402
+from app.features.whisper_pool import WHISPER_WORKER_POOL  # noqa: E402
 from app.routes import router  # noqa: E402
 
-app = FastAPI(title="orion", version="0.1.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Start the transcription workers up front so requests never pay the model load time
+    WHISPER_WORKER_POOL.load()
+    # Pick up the background jobs that were interrupted by the last shutdown
+    TRANSCRIPTION_JOB_RUNNER.start()
+    yield
+    await TRANSCRIPTION_JOB_RUNNER.close()
+    WHISPER_WORKER_POOL.close()
+
+
+app = FastAPI(title="orion", version="0.1.0", lifespan=lifespan)
 app.include_router(router)
@@ -1,10 +1,14 @@
 from fastapi import APIRouter, status
 from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from app.features.jobs import TRANSCRIPTION_JOB_RUNNER
 
 from app.features.transcription import YoutubeVideoTranscriber
+from app.features.whisper_pool import TranscriptionPoolFullError
+from app.features.youtube_metadata import YOUTUBE_METADATA_PROVIDER
 from app.utils import (
     extract_article_metadata,
-    extract_youtube_metadata,
     get_clean_html,
     is_youtube_url,
     normalize_youtube_url,
@@ -21,9 +25,7 @@ def index():
 
 @router.get("/clean-html", description="Returns cleaned HTML content from a URL.")
 def clean_html(url: str):
-    return JSONResponse(
-        content=get_clean_html(url), status_code=status.HTTP_200_OK
-    )
+    return JSONResponse(content=get_clean_html(url), status_code=status.HTTP_200_OK)
 
 
 @router.get("/article-metadata", description="Returns metadata for an article.")
@@ -41,8 +43,8 @@ def youtube_metadata(url: str):
             content={"error": "Invalid YouTube URL"},
             status_code=status.HTTP_400_BAD_REQUEST,
         )
-    
-    metadata = extract_youtube_metadata(url)
+
+    metadata = YOUTUBE_METADATA_PROVIDER.get(url)
     return JSONResponse(
         content=metadata.model_dump(mode="json"), status_code=status.HTTP_200_OK
     )
@@ -52,7 +54,7 @@ def youtube_metadata(url: str):
     "/youtube-transcription",
     description="Returns the transcription of a YouTube video.",
 )
-def youtube_transcription(url: str):
+async def youtube_transcription(url: str):
     if not is_youtube_url(url):
         return JSONResponse(
             content={"error": "Invalid YouTube URL"},
@@ -61,7 +63,50 @@ def youtube_transcription(url: str):
 
     url = normalize_youtube_url(url)
     transcriber = YoutubeVideoTranscriber()
+    try:
+        transcription = await transcriber.transcribe_video(url)
+    except TranscriptionPoolFullError as e:
+        return JSONResponse(
+            content={"error": str(e)},
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={"Retry-After": "30"},
+        )
+
     return JSONResponse(
-        content={"transcription": transcriber.transcribe_video(url)},
+        content={"transcription": transcription},
         status_code=status.HTTP_200_OK,
     )
+
+
+class TranscriptionJobRequest(BaseModel):
+    url: str
+
+
+@router.post(
+    "/jobs",
+    description="Starts transcribing a YouTube video in the background and returns the job.",
+)
+async def submit_transcription_job(request: TranscriptionJobRequest):
+    if not is_youtube_url(request.url):
+        return JSONResponse(
+            content={"error": "Invalid YouTube URL"},
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
+
+    job, created = TRANSCRIPTION_JOB_RUNNER.submit(request.url)
+    return JSONResponse(
+        content=job.to_response(),
+        status_code=status.HTTP_202_ACCEPTED if created else status.HTTP_200_OK,
+    )
+
+
+@router.get("/jobs/{job_id}", description="Returns the status and result of a job.")
+def get_transcription_job(job_id: str):
+    job = TRANSCRIPTION_JOB_RUNNER.get(job_id)
+    if job is None:
+        return JSONResponse(
+            content={"error": "Job not found"},
+            status_code=status.HTTP_404_NOT_FOUND,
+        )
+
+    return JSONResponse(content=job.to_response(), status_code=status.HTTP_200_OK)
@@ -1,21 +1,20 @@
 import datetime
 import re
-import urllib.parse
 
-import requests
 from dateutil import parser
-from lxml import html
 from lxml.html.clean import Cleaner
 from newspaper import Article
 from pydantic import BaseModel
 
+from app.features.http_client import HTTP_CLIENT
+
 
 def get_clean_html(url: str) -> str:
     """
     Fetches the HTML content from the specified URL and returns a cleaned version of the HTML.
     """
     try:
-        html = requests.get(url, headers={"User-Agent": "Mozilla/5.0"}).text
+        html = HTTP_CLIENT.get(url).text
         cleaner = Cleaner()
         cleaned_html = cleaner.clean_html(html)
         # Remove all empty lines and trim all lines
@@ -32,7 +31,7 @@ def get_json_from_url(url: str) -> dict[str, str]:
     Fetch JSON data from a URL.
     """
     try:
-        response = requests.get(url)
+        response = HTTP_CLIENT.get(url)
         response.raise_for_status()
         return response.json()
     except Exception as e:
@@ -118,7 +117,7 @@ def extract_article_metadata(url: str) -> ArticleMetadata:
     Extract metadata from an article using Newspaper3k.
     """
     article = Article(url)
-    article.download()
+    article.download(input_html=HTTP_CLIENT.get(url).text)
     article.parse()
 
     published_date = article.publish_date
@@ -142,87 +141,3 @@ def extract_article_metadata(url: str) -> ArticleMetadata:
         favicon=f"https://{url.split('/')[2]}/favicon.ico",
         meta_image=article.meta_img,
     )
-
-
-###############################################################################
-
-
-class YoutubeMetadata(BaseModel):
-    title: str
-    channel: str | None = None
-    published_date: str | None = None
-    thumbnail_url: str | None = None
-
-
-def extract_youtube_metadata(url: str) -> YoutubeMetadata:
-    """
-    Extract metadata from a YouTube video URL. This function assumes the URL is a valid YouTube video link.
-    """
-
-    video_id = parse_youtube_video_id(url)
-    if not video_id:
-        raise ValueError("Invalid YouTube video URL")
-
-    x = get_json_from_url(
-        f"https://www.youtube.com/oembed?url={urllib.parse.quote(url)}&format=json"
-    )
-
-    title = x["title"]
-    channel = x.get("author_name", None)
-    thumbnail_url = x.get("thumbnail_url", None)
-    published_date = None
-    try:
-        published_date = _get_youtube_video_publish_date(url)
-    except Exception:
-        pass
-
-    return YoutubeMetadata(
-        title=title,
-        channel=channel,
-        published_date=published_date,
-        thumbnail_url=thumbnail_url,
-    )
-
-
-def _get_youtube_video_publish_date(yt_url: str) -> str:
-    """
-    Extract the publish date from a YouTube video URL.
-
-    Args:
-        video_url (str): YouTube video URL
-
-    Returns:
-        str: Publish date in ISO format, or None if not found
-
-    Raises:
-        requests.RequestException: If the HTTP request fails
-        ValueError: If the URL is invalid or date cannot be extracted
-    """
-    try:
-        # Add headers to avoid being blocked
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
-
-        response = requests.get(yt_url, headers=headers)
-        response.raise_for_status()  # Raise an exception for bad status codes
-
-        # Parse HTML with lxml
-        tree = html.fromstring(response.text)
-
-        # Find the publish date meta tag using XPath
-        date_elements = tree.xpath('//meta[@itemprop="datePublished"]/@content')
-
-        if date_elements:
-            # Parse the date string using dateutil for flexibility
-            date_str = date_elements[0]
-            from dateutil import parser
-
-            return parser.parse(date_str).date().isoformat()
-        else:
-            raise ValueError("Publish date not found in the video page")
-
-    except requests.RequestException as e:
-        raise requests.RequestException(f"Failed to fetch video page: {e}")
-    except Exception as e:
-        raise ValueError(f"Error extracting publish date: {e}")